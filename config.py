@@ -7,6 +7,11 @@ PLAYER_2_NAME = "B"
 PLAYER_2_PATH = "./python_skeleton" # Change this to './player_chatbot' to interact with your own bot!
 # GAME PROGRESS IS RECORDED HERE
 GAME_LOG_FILENAME = "gamelog"
+# PER-QUERY LATENCY TRACES ARE WRITTEN TO <LATENCY_TRACE_FILENAME>_<PLAYER_NAME>.csv WHEN ENABLED
+WRITE_LATENCY_TRACE = False
+LATENCY_TRACE_FILENAME = "latency"
+# SET RANDOM_SEED TO AN INT TO REPLAY THE SAME CARDS AND BOUNTIES, NONE FOR A FRESH GAME EVERY RUN
+RANDOM_SEED = None
 # PLAYER_LOG_SIZE_LIMIT IS IN BYTES
 PLAYER_LOG_SIZE_LIMIT = 524288
 # STARTING_GAME_CLOCK AND TIMEOUTS ARE IN SECONDS
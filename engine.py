@@ -3,9 +3,7 @@
 DO NOT REMOVE, RENAME, OR EDIT THIS FILE
 '''
 from collections import namedtuple
-from threading import Thread
-from queue import Queue
-import time
+import asyncio
 import math
 import json
 import subprocess
@@ -14,6 +12,8 @@ import eval7
 import sys
 import os
 import random
+import shutil
+import tempfile
 
 sys.path.append(os.getcwd())
 from config import *
@@ -24,13 +24,20 @@ CheckAction = namedtuple('CheckAction', [])
 # we coalesce BetAction and RaiseAction for convenience
 RaiseAction = namedtuple('RaiseAction', ['amount'])
 TerminalState = namedtuple('TerminalState', ['deltas', 'bounty_hits', 'previous_state'])
+# one timed request/response exchange between the engine and a bot
+QueryRecord = namedtuple('QueryRecord', ['round_num', 'street', 'action', 'bytes_sent', 'bytes_received', 'seconds'])
 
 STREET_NAMES = ['Flop', 'Turn', 'River']
+# labels used for latency records, keyed by street (None is the end-of-round ack)
+QUERY_LABELS = {0: 'Preflop', 3: 'Flop', 4: 'Turn', 5: 'River', None: 'Ack'}
+LATENCY_PERCENTILES = [50, 90, 99]
 DECODE = {'F': FoldAction, 'C': CallAction, 'K': CheckAction, 'R': RaiseAction}
 CCARDS = lambda cards: ','.join(map(str, cards))
 PCARDS = lambda cards: '[{}]'.format(' '.join(map(str, cards)))
 PVALUE = lambda name, value: ', {} ({})'.format(name, value)
 STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
+# transports a bot may request with the optional "transport" key in commands.json
+TRANSPORTS = ['tcp', 'unix']
 
 # Socket encoding scheme:
 #
@@ -47,6 +54,7 @@ STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
 # Y## (both numbers 0 or 1 (or # which means masked): first is player hit bounty, second is opponent hit bounty)
 #       Note: only winning player bounty hit is revealed (or both if split pot)
 # Q game over
+# N new game: a persistent pokerbot starts over without restarting, and acks with K
 #
 # Clauses are separated by spaces
 # Messages end with '\n'
@@ -242,19 +250,29 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
 class Player():
     '''
     Handles subprocess and socket interactions with one player's pokerbot.
+
+    All I/O runs on an asyncio event loop (asyncio subprocesses and stream readers), so one
+    engine process can referee many players at once without a thread per pokerbot.
     '''
 
-    def __init__(self, name, path):
+    def __init__(self, name, path, log_filename=None):
         self.name = name
         self.path = path
         self.game_clock = STARTING_GAME_CLOCK
         self.bankroll = 0
         self.commands = None
+        self.transport = 'tcp'
+        self.persistent = False  # kept running between games, see reset
         self.bot_subprocess = None
-        self.socketfile = None
-        self.bytes_queue = Queue()
-
-    def build(self):
+        self.reader = None
+        self.writer = None
+        self.output = []  # chunks of the pokerbot's output, for its log file
+        self.output_task = None
+        self.round_num = 1
+        self.query_records = []
+        self.log_filename = name + '.txt' if log_filename is None else log_filename
+
+    async def build(self):
         '''
         Loads the commands file and builds the pokerbot.
         '''
@@ -271,94 +289,184 @@ class Player():
             print(self.name, 'commands.json not found - check PLAYER_PATH')
         except json.decoder.JSONDecodeError:
             print(self.name, 'commands.json misformatted')
+        if self.commands is not None:
+            transport = self.commands.get('transport', 'tcp')
+            if transport not in TRANSPORTS:
+                print(self.name, 'unknown transport', transport, '- falling back to tcp')
+            elif transport == 'unix' and not hasattr(socket, 'AF_UNIX'):
+                print(self.name, 'unix sockets unsupported on this platform - falling back to tcp')
+            else:
+                self.transport = transport
+            self.persistent = self.commands.get('persistent', False) is True
         if self.commands is not None and len(self.commands['build']) > 0:
             try:
-                proc = subprocess.run(self.commands['build'],
-                                      stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                      cwd=self.path, timeout=BUILD_TIMEOUT, check=False)
-                self.bytes_queue.put(proc.stdout)
-            except subprocess.TimeoutExpired as timeout_expired:
-                error_message = 'Timed out waiting for ' + self.name + ' to build'
-                print(error_message)
-                self.bytes_queue.put(timeout_expired.stdout)
-                self.bytes_queue.put(error_message.encode())
+                proc = await asyncio.create_subprocess_exec(*self.commands['build'],
+                                                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                                            cwd=self.path)
+                try:
+                    stdout, _ = await asyncio.wait_for(proc.communicate(), BUILD_TIMEOUT)
+                    self.output.append(stdout)
+                except asyncio.TimeoutError:
+                    proc.kill()
+                    stdout, _ = await proc.communicate()
+                    error_message = 'Timed out waiting for ' + self.name + ' to build'
+                    print(error_message)
+                    self.output.append(stdout)
+                    self.output.append(error_message.encode())
             except (TypeError, ValueError):
                 print(self.name, 'build command misformatted')
             except OSError:
                 print(self.name, 'build failed - check "build" in commands.json')
 
-    def run(self):
+    def listen(self):
+        '''
+        Opens the server socket for the requested transport.
+
+        Returns:
+            tuple: The listening socket, the arguments telling the bot where to connect,
+            and a temporary directory to remove once the bot has connected (or None).
+        '''
+        if self.transport == 'unix':
+            socket_dir = tempfile.mkdtemp(prefix='pokerbots-')
+            socket_path = os.path.join(socket_dir, 'engine.sock')
+            server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server_socket.bind(socket_path)
+            return server_socket, ['--unix', socket_path], socket_dir
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.bind(('', 0))
+        return server_socket, [str(server_socket.getsockname()[1])], None
+
+    async def enqueue_output(self, out):
+        '''
+        Collects the pokerbot's output as it arrives, so its pipe never fills up.
+        '''
+        async for line in out:
+            if self.path == r"./player_chatbot":
+                print(line.strip().decode("utf-8"))
+            else:
+                self.output.append(line)
+
+    async def run(self):
         '''
         Runs the pokerbot and establishes the socket connection.
         '''
         if self.commands is not None and len(self.commands['run']) > 0:
+            socket_dir = None
+            connected = asyncio.get_running_loop().create_future()
+
+            def on_connect(reader, writer):
+                if connected.done():
+                    writer.close()
+                else:
+                    connected.set_result((reader, writer))
+
             try:
-                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                with server_socket:
-                    server_socket.bind(('', 0))
-                    server_socket.settimeout(CONNECT_TIMEOUT)
-                    server_socket.listen()
-                    port = server_socket.getsockname()[1]
-                    proc = subprocess.Popen(self.commands['run'] + [str(port)],
-                                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                            cwd=self.path)
+                server_socket, address_args, socket_dir = self.listen()
+                start_server = asyncio.start_unix_server if self.transport == 'unix' else asyncio.start_server
+                async with await start_server(on_connect, sock=server_socket):
+                    proc = await asyncio.create_subprocess_exec(*self.commands['run'], *address_args,
+                                                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                                                cwd=self.path)
                     self.bot_subprocess = proc
-                    # function for bot listening
-                    def enqueue_output(out, queue):
-                        try:
-                            for line in out:
-                                if self.path == r"./player_chatbot":
-                                    print(line.strip().decode("utf-8"))
-                                else:
-                                    queue.put(line)
-                        except ValueError:
-                            pass
-                    # start a separate bot listening thread which dies with the program
-                    Thread(target=enqueue_output, args=(proc.stdout, self.bytes_queue), daemon=True).start()
-                    # block until we timeout or the player connects
-                    client_socket, _ = server_socket.accept()
-                    with client_socket:
-                        if self.path == r"./player_chatbot":
-                            client_socket.settimeout(PLAYER_TIMEOUT)
-                        else:
-                            client_socket.settimeout(CONNECT_TIMEOUT)
-                        sock = client_socket.makefile('rw')
-                        self.socketfile = sock
-                        print(self.name, 'connected successfully')
+                    self.output_task = asyncio.create_task(self.enqueue_output(proc.stdout))
+                    # block until we timeout or the player connects (asyncio already turns Nagle off on TCP)
+                    self.reader, self.writer = await asyncio.wait_for(connected, CONNECT_TIMEOUT)
+                    print(self.name, 'connected successfully over', self.transport)
             except (TypeError, ValueError):
                 print(self.name, 'run command misformatted')
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to connect')
             except OSError:
                 print(self.name, 'run failed - check "run" in commands.json')
-            except socket.timeout:
-                print('Timed out waiting for', self.name, 'to connect')
+            finally:
+                if socket_dir is not None:
+                    shutil.rmtree(socket_dir, ignore_errors=True)
+
+    def response_timeout(self):
+        '''
+        Returns how many seconds to wait for a response: the rest of the game clock (capped at
+        CONNECT_TIMEOUT) when it is enforced, so a slow pokerbot is cut off as soon as it runs out.
+        '''
+        if self.path == r"./player_chatbot":
+            return PLAYER_TIMEOUT
+        if ENFORCE_GAME_CLOCK:
+            return min(self.game_clock, CONNECT_TIMEOUT)
+        return CONNECT_TIMEOUT
+
+    async def reset(self):
+        '''
+        Starts a new game on a running persistent pokerbot by sending N and waiting for its ack,
+        which is not charged to the game clock.
 
-    def stop(self):
+        Returns:
+            bool: Whether the pokerbot acked and can play the new game.
+        '''
+        if not self.persistent or self.writer is None:
+            return False
+        self.output = []  # the previous game's output is already in its log
+        try:
+            self.writer.write(b'N\n')
+            response = await asyncio.wait_for(self.reader.readline(), CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            print('Timed out waiting for', self.name, 'to reset')
+            return False
+        except OSError:
+            print('Disconnected from', self.name, 'while resetting')
+            return False
+        if response.strip() != b'K':
+            print(self.name, 'did not ack the reset')
+            return False
+        return True
+
+    def new_game(self):
+        '''
+        Resets the engine's records of the pokerbot (clock, bankroll, latencies) for a new game.
+        '''
+        self.game_clock = STARTING_GAME_CLOCK
+        self.bankroll = 0
+        self.round_num = 1
+        self.query_records = []
+
+    async def stop(self):
         '''
         Closes the socket connection and stops the pokerbot.
         '''
-        if self.socketfile is not None:
+        if self.writer is not None:
             try:
-                self.socketfile.write('Q\n')
-                self.socketfile.close()
-            except socket.timeout:
-                print('Timed out waiting for', self.name, 'to disconnect')
+                self.writer.write(b'Q\n')
+                self.writer.close()
+                await self.writer.wait_closed()
             except OSError:
                 print('Could not close socket connection with', self.name)
         if self.bot_subprocess is not None:
             try:
-                if self.path == r"./player_chatbot":
-                    outs, _ = self.bot_subprocess.communicate(timeout=PLAYER_TIMEOUT)
-                else:
-                    outs, _ = self.bot_subprocess.communicate(timeout=CONNECT_TIMEOUT)
-                self.bytes_queue.put(outs)
-            except subprocess.TimeoutExpired:
+                timeout = PLAYER_TIMEOUT if self.path == r"./player_chatbot" else CONNECT_TIMEOUT
+                await asyncio.wait_for(self.bot_subprocess.wait(), timeout)
+            except asyncio.TimeoutError:
                 print('Timed out waiting for', self.name, 'to quit')
                 self.bot_subprocess.kill()
-                outs, _ = self.bot_subprocess.communicate()
-                self.bytes_queue.put(outs)
-        with open(self.name + '.txt', 'wb') as log_file:
+                await self.bot_subprocess.wait()
+            await self.output_task
+        self.write_log()
+        self.bot_subprocess = self.reader = self.writer = None
+
+    async def finish(self, stop=True):
+        '''
+        Ends a game: stops the pokerbot, or only writes its log if it is persistent and stop is
+        False, leaving it running for the next game.
+        '''
+        if stop or not self.persistent or self.writer is None:
+            await self.stop()
+        else:
+            self.write_log()
+
+    def write_log(self):
+        '''
+        Writes the pokerbot's output, up to PLAYER_LOG_SIZE_LIMIT bytes, to its log file.
+        '''
+        with open(self.log_filename, 'wb') as log_file:
             bytes_written = 0
-            for output in self.bytes_queue.queue:
+            for output in self.output:
                 try:
                     bytes_written += log_file.write(output)
                     if bytes_written >= PLAYER_LOG_SIZE_LIMIT:
@@ -366,7 +474,7 @@ class Player():
                 except TypeError:
                     pass
 
-    def query(self, round_state, player_message, game_log):
+    async def query(self, round_state, player_message, game_log):
         '''
         Requests one action from the pokerbot over the socket connection.
 
@@ -387,50 +495,126 @@ class Player():
                 - FoldAction if check is not legal
 
         Notes:
-            - The game clock is decremented by the time taken to receive a response
+            - The game clock is decremented by the time taken to receive a response,
+              measured with the event loop's clock
             - Invalid or illegal actions are logged but not executed
             - Bot disconnections or timeouts result in game clock being set to 0
             - At the end of a round, only CheckAction is considered legal
         '''
         legal_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else {CheckAction}
-        if self.socketfile is not None and self.game_clock > 0.:
-            clause = ''
-            try:
-                player_message[0] = 'T{:.3f}'.format(self.game_clock)
-                message = ' '.join(player_message) + '\n'
-                del player_message[1:]  # do not send redundant action history
-                start_time = time.perf_counter()
-                self.socketfile.write(message)
-                self.socketfile.flush()
-                clause = self.socketfile.readline().strip()
-                end_time = time.perf_counter()
-                if ENFORCE_GAME_CLOCK and self.path != r"./player_chatbot":
-                    self.game_clock -= end_time - start_time
-                if self.game_clock <= 0.:
-                    raise socket.timeout
-                action = DECODE[clause[0]]
-                if action in legal_actions:
-                    if clause[0] == 'R':
-                        amount = int(clause[1:])
-                        min_raise, max_raise = round_state.raise_bounds()
-                        if min_raise <= amount <= max_raise:
-                            return action(amount)
-                    else:
-                        return action()
-                game_log.append(self.name + ' attempted illegal ' + action.__name__)
-            except socket.timeout:
-                error_message = self.name + ' ran out of time'
-                game_log.append(error_message)
-                print(error_message)
-                self.game_clock = 0.
-            except OSError:
-                error_message = self.name + ' disconnected'
-                game_log.append(error_message)
-                print(error_message)
-                self.game_clock = 0.
-            except (IndexError, KeyError, ValueError):
-                game_log.append(self.name + ' response misformatted: ' + str(clause))
-        return CheckAction() if CheckAction in legal_actions else FoldAction()
+        try:
+            if self.writer is not None and self.game_clock > 0.:
+                clause = ''
+                try:
+                    player_message[0] = 'T{:.3f}'.format(self.game_clock)
+                    message = ' '.join(player_message) + '\n'
+                    del player_message[1:]  # do not send redundant action history
+                    loop = asyncio.get_running_loop()
+                    start_time = loop.time()
+                    self.writer.write(message.encode())
+                    response = await asyncio.wait_for(self.reader.readline(), self.response_timeout())
+                    end_time = loop.time()
+                    clause = response.decode().strip()
+                    action = self.handle_response(round_state, legal_actions, clause, len(message), len(response), end_time - start_time)
+                    if action is not None:
+                        return action
+                    game_log.append(self.name + ' attempted illegal ' + DECODE[clause[0]].__name__)
+                except (socket.timeout, asyncio.TimeoutError):
+                    error_message = self.name + ' ran out of time'
+                    game_log.append(error_message)
+                    print(error_message)
+                    self.game_clock = 0.
+                except OSError:
+                    error_message = self.name + ' disconnected'
+                    game_log.append(error_message)
+                    print(error_message)
+                    self.game_clock = 0.
+                except (IndexError, KeyError, ValueError):
+                    game_log.append(self.name + ' response misformatted: ' + str(clause))
+            return CheckAction() if CheckAction in legal_actions else FoldAction()
+        finally:
+            if isinstance(round_state, TerminalState):
+                self.round_num += 1  # the end-of-round ack, answered or not, closes the round
+
+    def handle_response(self, round_state, legal_actions, clause, bytes_sent, bytes_received, seconds):
+        '''
+        Records a query, charges its time to the game clock and decodes the response.
+
+        Returns:
+            Action: The action the clause encodes, or None if it is not legal in round_state.
+
+        Raises:
+            socket.timeout: If the pokerbot is out of time.
+            IndexError, KeyError, ValueError: If the clause is misformatted.
+        '''
+        street = round_state.street if isinstance(round_state, RoundState) else None
+        self.query_records.append(QueryRecord(self.round_num, QUERY_LABELS[street], clause[:1],
+                                              bytes_sent, bytes_received, seconds))
+        if ENFORCE_GAME_CLOCK and self.path != r"./player_chatbot":
+            self.game_clock -= seconds
+        if self.game_clock <= 0.:
+            raise socket.timeout
+        return self.parse_action(round_state, legal_actions, clause)
+
+    def parse_action(self, round_state, legal_actions, clause):
+        '''
+        Decodes a response clause from the pokerbot.
+
+        Returns:
+            Action: The action the clause encodes, or None if it is not legal in round_state.
+
+        Raises:
+            IndexError, KeyError, ValueError: If the clause is misformatted.
+        '''
+        action = DECODE[clause[0]]
+        if action in legal_actions:
+            if clause[0] == 'R':
+                amount = int(clause[1:])
+                min_raise, max_raise = round_state.raise_bounds()
+                if min_raise <= amount <= max_raise:
+                    return action(amount)
+            else:
+                return action()
+        return None
+
+    def latency_summary(self):
+        '''
+        Summarizes the recorded query latencies, grouped by street.
+
+        Returns:
+            list: One log line per street (plus a total line) with the query count,
+            total seconds, mean and LATENCY_PERCENTILES in milliseconds, and the maximum.
+        '''
+        groups = {}
+        for record in self.query_records:
+            groups.setdefault(record.street, []).append(record.seconds)
+        lines = []
+        for label in list(QUERY_LABELS.values()) + ['Total']:
+            if label == 'Total':
+                seconds = [record.seconds for record in self.query_records]
+            else:
+                seconds = groups.get(label, [])
+            if not seconds:
+                continue
+            seconds.sort()
+            # nearest-rank percentiles
+            percentiles = ['p{} {:.2f}ms'.format(p, 1000 * seconds[max(0, math.ceil(p / 100 * len(seconds)) - 1)])
+                           for p in LATENCY_PERCENTILES]
+            lines.append('{} {}: {} queries, {:.3f}s total, mean {:.2f}ms, {}, max {:.2f}ms'.format(
+                self.name, label, len(seconds), sum(seconds), 1000 * sum(seconds) / len(seconds),
+                ', '.join(percentiles), 1000 * seconds[-1]))
+        return lines
+
+    def write_latency_trace(self):
+        '''
+        Dumps every recorded query to a csv file named after the player.
+        '''
+        name = '{}_{}.csv'.format(LATENCY_TRACE_FILENAME, self.name)
+        print('Writing', name)
+        with open(name, 'w') as trace_file:
+            trace_file.write(','.join(QueryRecord._fields) + '\n')
+            for record in self.query_records:
+                trace_file.write('{},{},{},{},{},{:.6f}\n'.format(*record))
 
 
 class Game():
@@ -441,6 +625,10 @@ class Game():
     def __init__(self):
         self.log = ['6.9630 MIT Pokerbots - ' + PLAYER_1_NAME + ' vs ' + PLAYER_2_NAME]
         self.player_messages = [[], []]
+        # separate streams so changing how one is consumed doesn't reshuffle the other
+        self.deck_rng = random.Random(None if RANDOM_SEED is None else f'{RANDOM_SEED}/deck')
+        self.bounty_rng = random.Random(None if RANDOM_SEED is None else f'{RANDOM_SEED}/bounty')
+        self.log_filename = GAME_LOG_FILENAME + '.txt'
 
     def log_round_state(self, players, round_state):
         '''
@@ -516,12 +704,15 @@ class Game():
         self.player_messages[0].append('Y' + hit_chars[0] + hit_chars[1])
         self.player_messages[1].append('Y' + hit_chars[1] + hit_chars[0])
 
-    def run_round(self, players, bounties):
+    async def run_round(self, players, bounties):
         '''
         Runs one round of poker.
+
+        Returns:
+            TerminalState: The final state of the round.
         '''
         deck = eval7.Deck()
-        deck.shuffle()
+        self.deck_rng.shuffle(deck.cards)
         hands = [deck.deal(2), deck.deal(2)]
         pips = [SMALL_BLIND, BIG_BLIND]
         stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
@@ -530,54 +721,87 @@ class Game():
             self.log_round_state(players, round_state)
             active = round_state.button % 2
             player = players[active]
-            action = player.query(round_state, self.player_messages[active], self.log)
+            action = await player.query(round_state, self.player_messages[active], self.log)
             bet_override = (round_state.pips == [0, 0])
             self.log_action(player.name, action, bet_override)
             round_state = round_state.proceed(action)
         self.log_terminal_state(players, round_state)
         for player, player_message, delta in zip(players, self.player_messages, round_state.deltas):
-            player.query(round_state, player_message, self.log)
+            await player.query(round_state, player_message, self.log)
             player.bankroll += delta
+        return round_state
 
-    def run(self):
+    async def start_players(self, players):
         '''
-        Runs one game of poker.
+        Gets the players' pokerbots ready for a new game: persistent pokerbots that are still
+        running are reset, the others are (re)built and run.
         '''
-        print('   __  _____________  ___       __           __        __    ')
-        print('  /  |/  /  _/_  __/ / _ \\___  / /_____ ____/ /  ___  / /____')
-        print(' / /|_/ // /  / /   / ___/ _ \\/  \'_/ -_) __/ _ \\/ _ \\/ __(_-<')
-        print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
-        print()
-        print('Starting the Pokerbots engine...')
-        players = [
-            Player(PLAYER_1_NAME, PLAYER_1_PATH),
-            Player(PLAYER_2_NAME, PLAYER_2_PATH)
-        ]
+        warm = await asyncio.gather(*(player.reset() for player in players))
+        for player, ready in zip(players, warm):
+            player.new_game()
+            if not ready:
+                if player.bot_subprocess is not None:
+                    await player.stop()
+                await player.build()
+        await asyncio.gather(*(player.run() for player, ready in zip(players, warm) if not ready))
+
+    async def play(self, players=None, stop=True):
+        '''
+        Plays one game of poker between two players (the ones in config.py by default) and
+        writes its game log. Games only await socket I/O, so one event loop can run many at once.
+
+        Args:
+            players (list): The two Players, started (or reset, if they are still running) here.
+            stop (bool): Whether to stop the pokerbots after the game. Persistent pokerbots left
+                running are reset by the next game played with the same Players.
+        '''
+        if players is None:
+            players = [
+                Player(PLAYER_1_NAME, PLAYER_1_PATH),
+                Player(PLAYER_2_NAME, PLAYER_2_PATH)
+            ]
         bounties = [-1, -1]
-        for player in players:
-            player.build()
-            player.run()
+        await self.start_players(players)
         for round_num in range(1, NUM_ROUNDS + 1):
             self.log.append('')
             self.log.append('Round #' + str(round_num) + STATUS(players))
             if round_num % ROUNDS_PER_BOUNTY == 1:
                 cardNames = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-                bounties = [cardNames[random.randint(0, 12)], cardNames[random.randint(0, 12)]]
+                bounties = [cardNames[self.bounty_rng.randint(0, 12)], cardNames[self.bounty_rng.randint(0, 12)]]
                 self.log.append(f"Bounties reset to {bounties[0]} for player {players[0].name} and {bounties[1]} for player {players[1].name}")
-            self.run_round(players, bounties)
+            await self.run_round(players, bounties)
             self.log.append('Winning counts at the end of the round: ' + STATUS(players))
 
             players = players[::-1]
             bounties = bounties[::-1]
         self.log.append('')
         self.log.append('Final' + STATUS(players))
+        await asyncio.gather(*(player.finish(stop) for player in players))
+        self.log.append('')
         for player in players:
-            player.stop()
-        name = GAME_LOG_FILENAME + '.txt'
-        print('Writing', name)
-        with open(name, 'w') as log_file:
+            for line in player.latency_summary():
+                self.log.append(line)
+                print(line)
+            if WRITE_LATENCY_TRACE:
+                player.write_latency_trace()
+        print('Writing', self.log_filename)
+        with open(self.log_filename, 'w') as log_file:
             log_file.write('\n'.join(self.log))
 
+    def run(self):
+        '''
+        Runs one game of poker.
+        '''
+        print('   __  _____________  ___       __           __        __    ')
+        print('  /  |/  /  _/_  __/ / _ \\___  / /_____ ____/ /  ___  / /____')
+        print(' / /|_/ // /  / /   / ___/ _ \\/  \'_/ -_) __/ _ \\/ _ \\/ __(_-<')
+        print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
+        print()
+        print('Starting the Pokerbots engine...')
+        if RANDOM_SEED is not None:
+            print('Random seed:', RANDOM_SEED)
+        asyncio.run(self.play())
+
 
 if __name__ == '__main__':
     Game().run()
@@ -7,6 +7,7 @@ from .actions import FoldAction, CallAction, CheckAction, RaiseAction
 from .states import GameState, TerminalState, RoundState
 from .states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from .bot import Bot
+from .profiler import CallbackProfiler
 
 
 class Runner():
@@ -14,9 +15,18 @@ class Runner():
     Interacts with the engine.
     '''
 
-    def __init__(self, pokerbot, socketfile):
+    def __init__(self, pokerbot, socketfile, profiler=None):
         self.pokerbot = pokerbot
         self.socketfile = socketfile
+        self.profiler = profiler
+
+    def call(self, callback, *args):
+        '''
+        Invokes one of the pokerbot's callbacks, timing it if profiling is enabled.
+        '''
+        if self.profiler is None:
+            return getattr(self.pokerbot, callback)(*args)
+        return self.profiler.call(callback, getattr(self.pokerbot, callback), *args)
 
     def receive(self):
         '''
@@ -70,16 +80,19 @@ class Runner():
                     round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
                                              round_state.hands, bounties, round_state.deck, round_state.previous_state)
                     if round_flag:
-                        self.pokerbot.handle_new_round(game_state, round_state, active)
+                        self.call('handle_new_round', game_state, round_state, active)
                         round_flag = False
-                elif clause[0] == 'F':
-                    round_state = round_state.proceed(FoldAction())
-                elif clause[0] == 'C':
-                    round_state = round_state.proceed(CallAction())
-                elif clause[0] == 'K':
-                    round_state = round_state.proceed(CheckAction())
-                elif clause[0] == 'R':
-                    round_state = round_state.proceed(RaiseAction(int(float(clause[1:]))))
+                elif clause[0] in 'FCKR':
+                    if clause[0] == 'F':
+                        action = FoldAction()
+                    elif clause[0] == 'C':
+                        action = CallAction()
+                    elif clause[0] == 'K':
+                        action = CheckAction()
+                    else:
+                        action = RaiseAction(int(float(clause[1:])))
+                    self.call('handle_action', game_state, round_state, action, round_state.button % 2, active)
+                    round_state = round_state.proceed(action)
                 elif clause[0] == 'B':
                     round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
                                              round_state.hands, round_state.bounties, clause[1:].split(','), round_state.previous_state)
@@ -105,16 +118,18 @@ class Runner():
                     if active == 1:
                         hero_hit_bounty, opponent_hit_bounty = opponent_hit_bounty, hero_hit_bounty
                     round_state = TerminalState(round_state.deltas, [hero_hit_bounty, opponent_hit_bounty], round_state.previous_state)
-                    self.pokerbot.handle_round_over(game_state, round_state, active)
+                    self.call('handle_round_over', game_state, round_state, active)
                     game_state = GameState(game_state.bankroll, game_state.game_clock, game_state.round_num + 1)
                     round_flag = True
                 elif clause[0] == 'Q':
+                    if self.profiler is not None:
+                        self.profiler.write_summary()
                     return
             if round_flag:  # ack the engine
                 self.send(CheckAction())
             else:
                 assert active == round_state.button % 2
-                action = self.pokerbot.get_action(game_state, round_state, active)
+                action = self.call('get_action', game_state, round_state, active)
                 self.send(action)
 
 
@@ -124,8 +139,32 @@ def parse_args():
     '''
     parser = argparse.ArgumentParser(prog='python3 player.py')
     parser.add_argument('--host', type=str, default='localhost', help='Host to connect to, defaults to localhost')
-    parser.add_argument('port', type=int, help='Port on host to connect to')
-    return parser.parse_args()
+    parser.add_argument('--unix', type=str, default=None, help='Path of a Unix domain socket to connect to instead of host:port')
+    parser.add_argument('--profile', action='store_true', help='Time every bot callback and write a summary when the game ends')
+    parser.add_argument('--profile-slowest', type=int, default=0, help='With --profile, keep cProfile stats for this many of the slowest get_action calls')
+    parser.add_argument('--profile-output', type=str, default='profile.txt', help='File the profiling summary is written to, or - for stdout')
+    parser.add_argument('port', type=int, nargs='?', help='Port on host to connect to')
+    args = parser.parse_args()
+    if args.unix is None and args.port is None:
+        parser.error('a port is required unless --unix is given')
+    return args
+
+def connect(args):
+    '''
+    Opens the socket to the engine over the transport chosen in args.
+    '''
+    if args.unix is not None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(args.unix)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    sock = socket.create_connection((args.host, args.port))
+    # actions are single short lines, so send them without waiting on Nagle
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
 
 def run_bot(pokerbot, args):
     '''
@@ -133,12 +172,18 @@ def run_bot(pokerbot, args):
     '''
     assert isinstance(pokerbot, Bot)
     try:
-        sock = socket.create_connection((args.host, args.port))
+        sock = connect(args)
     except OSError:
-        print('Could not connect to {}:{}'.format(args.host, args.port))
+        if args.unix is not None:
+            print('Could not connect to {}'.format(args.unix))
+        else:
+            print('Could not connect to {}:{}'.format(args.host, args.port))
         return
     socketfile = sock.makefile('rw')
-    runner = Runner(pokerbot, socketfile)
+    profiler = None
+    if args.profile:
+        profiler = CallbackProfiler(args.profile_slowest, None if args.profile_output == '-' else args.profile_output)
+    runner = Runner(pokerbot, socketfile, profiler)
     runner.run()
     socketfile.close()
     sock.close()
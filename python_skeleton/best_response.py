@@ -0,0 +1,246 @@
+from history import NUM_ACTIONS, HOLE_WINRATES_FILENAME, bounty_delta, cached_hole_winrates
+from betting_tree import abstract_tree, CHANCE, TERMINAL, FOLD
+from information_set import InformationSet
+from buckets import get_bucket
+from hand_eval import evaluate_batch
+from skeleton.cards import NUM_CARDS, RANKS
+from skeleton.states import BIG_BLIND
+from rng import RngStream
+
+import argparse
+import time
+import numpy as np
+import multiprocessing as mp
+
+'''
+Best response to a strategy table in the abstracted game, and the exploitability it implies.
+
+Chance is sampled: a batch of deals (hole cards, board and bounties) is walked through the
+abstract betting tree (betting_tree.py) all at once, with one value per deal at every node. The
+opponent plays the table (uniform where an info set is missing); the best responder sees
+the betting so far and its own bucket, and at each (node, bucket) picks the action with the
+highest total value over the deals in that bucket.
+
+Deals are split into chunks that are solved in parallel. Each chunk best-responds on its own
+deals, which overfits them slightly, so more chunks of fewer deals bias the estimate upward.
+'''
+
+STREETS = [0, 3, 4, 5]
+STREET_INDEX = {street: index for index, street in enumerate(STREETS)}
+DEFAULT_DEALS = 2000
+
+class Deals():
+    '''
+    A batch of sampled deals and everything the tree walk needs to know about them.
+
+    @param num_deals Number of deals
+    @param rng RngStream to deal from
+    '''
+
+    def __init__(self, num_deals, rng):
+        self.num_deals = num_deals
+        cards = np.argsort(rng.numpy.random((num_deals, NUM_CARDS)), axis=1)[:, :9]
+        self.hands = [cards[:, 0:2], cards[:, 2:4]]
+        self.board = cards[:, 4:]
+        self.bounties = rng.numpy.integers(len(RANKS), size=(num_deals, 2))
+
+        # buckets[player][street index] = (bucket id of every deal, Bucket of every id)
+        hole_winrates = cached_hole_winrates(HOLE_WINRATES_FILENAME)
+        self.buckets = [[self.bucket_ids(player, street, hole_winrates) for street in STREETS] for player in range(2)]
+
+        # hits[player][street index] = whether each deal hits the player's bounty by that street
+        self.hits = [[self.bounty_hits(player, street) for street in STREETS] for player in range(2)]
+
+        # showdown winner as in History.get_utility: 0, 1 or 2 for a split
+        scores = [evaluate_batch(np.concatenate((hand, self.board), axis=1)) for hand in self.hands]
+        self.winner = np.where(scores[0] > scores[1], 0, np.where(scores[0] < scores[1], 1, 2))
+
+    def bucket_ids(self, player, street, hole_winrates):
+        ids = np.zeros(self.num_deals, dtype=np.int64)
+        index = {}
+        buckets = []
+        for deal in range(self.num_deals):
+            hand = self.hands[player][deal].tolist() + self.board[deal, :street].tolist()
+            bucket = get_bucket(hand, int(self.bounties[deal, player]), hole_winrates)
+            key = (bucket.bounty, bucket.wetness, bucket.preflop, bucket.flop, bucket.turn, bucket.river)
+            if key not in index:
+                index[key] = len(buckets)
+                buckets.append(bucket)
+            ids[deal] = index[key]
+        return ids, buckets
+
+    def bounty_hits(self, player, street):
+        cards = np.concatenate((self.hands[player], self.board[:, :street]), axis=1)
+        return ((cards >> 2) == self.bounties[:, player:player+1]).any(axis=1)
+
+class BestResponse():
+    '''
+    Best response of one player to a strategy table over a batch of deals.
+
+    @param strategy Dict of info set string -> action weights (as saved in strategy.csv)
+    @param deals Deals to evaluate on
+    @param start_player Player History.generate_initial_node starts with
+    @param player Best responding player
+    '''
+
+    def __init__(self, strategy, deals, start_player, player):
+        self.strategy = strategy
+        self.deals = deals
+        self.start_player = start_player
+        self.player = player
+        self.tree = abstract_tree(start_player)
+        self.opponent_cache = {} # (street index, stack buckets, legal actions) -> (buckets, NUM_ACTIONS) strategy
+
+    def value(self):
+        '''
+        Returns:
+            expected chips per round the best response wins
+        '''
+        return float(self.traverse(0, np.ones(self.deals.num_deals)).mean())
+
+    def opponent_strategy(self, node):
+        '''
+        Returns:
+            (number of buckets, NUM_ACTIONS) array of the table's strategy for every bucket of the
+            actor at node, restricted to the legal actions and renormalized
+        '''
+        tree = self.tree
+        actor = tree.player[node]
+        street_index = STREET_INDEX[tree.street[node]]
+        my_stack, opp_stack = int(tree.stacks[node, actor]), int(tree.stacks[node, 1-actor])
+        legal_actions = tree.transitions[node].legal_actions
+        key = (actor, street_index, InformationSet.bucket_stack(my_stack), InformationSet.bucket_stack(opp_stack), legal_actions)
+        if key not in self.opponent_cache:
+            legal = np.array(legal_actions, dtype=float)
+            _, buckets = self.deals.buckets[actor][street_index]
+            probabilities = np.zeros((len(buckets), NUM_ACTIONS))
+            for i, bucket in enumerate(buckets):
+                weights = np.array(self.strategy.get(str(InformationSet(bucket, my_stack, opp_stack)), legal)) * legal
+                probabilities[i] = weights / weights.sum() if weights.sum() > 0 else legal / legal.sum()
+            self.opponent_cache[key] = probabilities
+        return self.opponent_cache[key]
+
+    def terminal_utility(self, node):
+        '''
+        Returns:
+            utility of the best responder in every deal, following History.get_utility
+        '''
+        tree = self.tree
+        stacks = tree.stacks[node].tolist()
+        street_index = STREET_INDEX[tree.street[node]]
+        if tree.terminal[node] != FOLD:
+            winners = self.deals.winner
+        else:
+            # the player who did not fold (the parent's actor) wins, as in History.get_utility
+            winners = np.full(self.deals.num_deals, 1 - tree.player[tree.parent[node]])
+        hits = [self.deals.hits[player][street_index].astype(np.int64) for player in range(2)]
+
+        table = np.zeros((3, 2, 2))
+        for winner in np.unique(winners):
+            for hit_0 in range(2):
+                for hit_1 in range(2):
+                    table[winner, hit_0, hit_1] = bounty_delta(winner, stacks, tree.button[node], (hit_0, hit_1))
+        deltas = table[winners, hits[0], hits[1]]
+        return deltas if self.player == 0 else -deltas
+
+    def traverse(self, node, opp_reach):
+        '''
+        Returns:
+            value of every deal for the best responder at node of the abstract tree, weighted by the opponent's reach
+        '''
+        tree = self.tree
+        node_type = tree.node_type[node]
+        if node_type == TERMINAL:
+            return opp_reach * self.terminal_utility(node)
+        if node_type == CHANCE:
+            return self.traverse(tree.chance_child[node], opp_reach)
+        if not opp_reach.any():
+            return np.zeros_like(opp_reach)
+
+        actor = tree.player[node]
+        children = tree.children[node]
+        actions = np.flatnonzero(tree.legal[node])
+        ids, buckets = self.deals.buckets[actor][STREET_INDEX[tree.street[node]]]
+
+        if actor == self.player:
+            values = np.array([self.traverse(children[action], opp_reach) for action in actions])
+            totals = np.array([np.bincount(ids, weights=action_values, minlength=len(buckets)) for action_values in values])
+            best = totals.argmax(axis=0)
+            return values[best[ids], np.arange(len(ids))]
+
+        probabilities = self.opponent_strategy(node)[ids]
+        values = np.zeros_like(opp_reach)
+        for action in actions:
+            values += self.traverse(children[action], opp_reach * probabilities[:, action])
+        return values
+
+def best_response_value(strategy, seed, start_player, chunk, num_deals):
+    '''
+    Returns:
+        values of the best responses of both players on one chunk of deals
+    '''
+    deals = Deals(num_deals, RngStream(seed).child(start_player).child(chunk))
+    return [BestResponse(strategy, deals, start_player, player).value() for player in range(2)]
+
+def exploitability(strategy, num_deals=DEFAULT_DEALS, chunks=1, seed=None, processes=None):
+    '''
+    Estimates how much a best response wins against the strategy table
+
+    @param strategy Dict of info set string -> action weights
+    @param num_deals Deals sampled per starting player
+    @param chunks Number of chunks the deals are split into and solved in parallel
+    @param seed Root seed of the deals, None for a fresh one
+    @param processes Worker processes, None for one per core
+
+    Returns:
+        dict with the best response values of both players (chips per round, averaged over
+        the starting player) and the exploitability in chips and in mbb/hand
+    '''
+    seed = RngStream(seed).entropy
+    tasks = [(strategy, seed, start_player, chunk, num_deals // chunks) for start_player in range(2) for chunk in range(chunks)]
+    with mp.Pool(min(processes or mp.cpu_count(), len(tasks))) as pool:
+        values = np.array(pool.starmap(best_response_value, tasks))
+    best_responses = values.mean(axis=0)
+    chips = float(best_responses.mean())
+    return {
+        'seed': seed,
+        'best_responses': best_responses.tolist(),
+        'exploitability': chips,
+        'mbb_per_hand': chips / BIG_BLIND * 1000,
+    }
+
+def train_until_converged(trainer, target_mbb, check_every, max_iters, dual_learning=False, **kwargs):
+    '''
+    Trains in rounds of check_every iterations until the average strategy is within target_mbb
+    mbb/hand of a best response or max_iters iterations have been run
+
+    @param trainer CFR_Trainer or Parallel_CFR_Trainer
+    @param kwargs Passed through to exploitability
+
+    Returns:
+        list of (iterations, mbb/hand) after every round
+    '''
+    curve = []
+    while trainer.iters_done < max_iters:
+        trainer.solve(min(check_every, max_iters - trainer.iters_done), dual_learning)
+        mbb = exploitability(trainer.get_equilibrium_strategy(), **kwargs)['mbb_per_hand']
+        curve.append((trainer.iters_done, mbb))
+        print(f'Exploitability after {trainer.iters_done} iterations: {mbb:.1f} mbb/hand')
+        if mbb <= target_mbb:
+            break
+    return curve
+
+if __name__ == '__main__':
+    from cfr import CFR_Trainer
+
+    parser = argparse.ArgumentParser(prog='python3 python_skeleton/best_response.py')
+    parser.add_argument('strategy', help='Strategy table csv, as saved by CFR_Trainer.save_to_csv')
+    parser.add_argument('--deals', type=int, default=DEFAULT_DEALS, help='Deals sampled per starting player')
+    parser.add_argument('--chunks', type=int, default=1, help='Chunks the deals are split into for parallel workers')
+    parser.add_argument('--seed', type=int, default=None, help='Root seed of the deals')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = exploitability(CFR_Trainer.load_from_csv(args.strategy), args.deals, args.chunks, args.seed)
+    print(f"Best responses: {result['best_responses'][0]:.3f}, {result['best_responses'][1]:.3f} chips per round (seed {result['seed']})")
+    print(f"Exploitability: {result['mbb_per_hand']:.1f} mbb/hand in {time.perf_counter() - start:.1f}s")
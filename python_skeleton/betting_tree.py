@@ -0,0 +1,138 @@
+from history import NUM_ACTIONS, betting_transitions
+from skeleton.states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
+
+from functools import lru_cache
+import numpy as np
+
+'''
+The abstract betting tree History walks (fold, call, check, all in and the RAISES sizes on
+every street), built once and stored as flat arrays indexed by node id, so traversals can
+look nodes up instead of rediscovering the tree with generate_action_outcome.
+'''
+
+# node types, in the order of the characters History.get_node_type returns
+DECISION = 0
+CHANCE = 1
+TERMINAL = 2
+NODE_TYPE_CHARS = 'DCT'
+
+# terminal types (same values as the resolver's)
+NOT_TERMINAL = 0
+FOLD = 1
+SHOWDOWN = 2
+
+class AbstractBettingTree():
+    '''
+    Abstract betting tree of a round started by start_player, in breadth first order (so
+    parents always come before their children). Node 0 is the root.
+
+    Arrays, indexed by node id:
+        node_type: DECISION, CHANCE or TERMINAL
+        terminal: NOT_TERMINAL, FOLD or SHOWDOWN
+        player: History's active player at decision nodes, -1 elsewhere
+        button, street, pips (num_nodes, 2), stacks (num_nodes, 2), pot: betting state of the node.
+            Terminal nodes hold the state before the round ended (TerminalState.previous_state)
+        deltas: (num_nodes, 2) chips won by each player at FOLD terminals, 0 elsewhere
+        parent, parent_action, depth: position in the tree (-1 parent at the root)
+        children: (num_nodes, NUM_ACTIONS) child of every legal action, -1 for illegal actions
+        chance_child: node after the cards are dealt at chance nodes, -1 elsewhere
+        legal: (num_nodes, NUM_ACTIONS) bool, children >= 0
+    Decision nodes also keep their History Transitions in transitions (None elsewhere).
+
+    @param start_player Player History.generate_initial_node starts with
+    '''
+
+    def __init__(self, start_player):
+        self.start_player = start_player
+        pips = (SMALL_BLIND, BIG_BLIND) if start_player == 0 else (BIG_BLIND, SMALL_BLIND)
+        stacks = (STARTING_STACK - pips[0], STARTING_STACK - pips[1])
+
+        node_type = []
+        terminal = []
+        player = []
+        button = []
+        street = []
+        node_pips = []
+        node_stacks = []
+        deltas = []
+        parent = []
+        parent_action = []
+        depth = []
+        children = []
+        chance_child = []
+        transitions = []
+
+        def add_node(kind, state, active, parent_node, action, terminal_type=NOT_TERMINAL, node_deltas=(0, 0)):
+            node_type.append(kind)
+            terminal.append(terminal_type)
+            player.append(active if kind == DECISION else -1)
+            button.append(state[0])
+            street.append(state[1])
+            node_pips.append(state[2])
+            node_stacks.append(state[3])
+            deltas.append(node_deltas)
+            parent.append(parent_node)
+            parent_action.append(action)
+            depth.append(depth[parent_node] + 1 if parent_node >= 0 else 0)
+            children.append([-1] * NUM_ACTIONS)
+            chance_child.append(-1)
+            transitions.append(betting_transitions(*state) if kind == DECISION else None)
+            return len(node_type) - 1
+
+        add_node(DECISION, (0, 0, pips, stacks), start_player, -1, -1)
+
+        node = 0
+        while node < len(node_type):
+            state = (button[node], street[node], node_pips[node], node_stacks[node])
+            if node_type[node] == CHANCE:
+                # History.generate_chance_outcome: player 1 (the button) acts first after the deal
+                chance_child[node] = add_node(DECISION, (1,) + state[1:], 1, node, -1)
+            elif node_type[node] == DECISION:
+                for action, legal in enumerate(transitions[node].legal_actions):
+                    if not legal:
+                        continue
+                    states, terminal_outcome = transitions[node].successors[action]
+                    last = states[-1] if states else state
+                    if terminal_outcome is not None:
+                        outcome_deltas, folded = terminal_outcome
+                        child = add_node(TERMINAL, last, -1, node, action, FOLD if folded else SHOWDOWN, outcome_deltas if folded else (0, 0))
+                    elif last[1] != street[node]:
+                        child = add_node(CHANCE, last, -1, node, action)
+                    else:
+                        child = add_node(DECISION, last, 1 - player[node], node, action)
+                    children[node][action] = child
+            node += 1
+
+        self.num_nodes = len(node_type)
+        self.node_type = np.array(node_type)
+        self.terminal = np.array(terminal)
+        self.player = np.array(player)
+        self.button = np.array(button)
+        self.street = np.array(street)
+        self.pips = np.array(node_pips)
+        self.stacks = np.array(node_stacks)
+        self.pot = 2 * STARTING_STACK - self.stacks.sum(axis=1)
+        self.deltas = np.array(deltas)
+        self.parent = np.array(parent)
+        self.parent_action = np.array(parent_action)
+        self.depth = np.array(depth)
+        self.children = np.array(children)
+        self.chance_child = np.array(chance_child)
+        self.legal = self.children >= 0
+        self.transitions = transitions
+
+        # plain lists for the per-node lookups of History walks, which are faster than NumPy scalars
+        self.child_list = self.children.tolist()
+        self.chance_child_list = self.chance_child.tolist()
+        self.node_type_chars = [NODE_TYPE_CHARS[kind] for kind in node_type]
+
+    def __reduce__(self):
+        # rebuild (from the per-process cache) instead of pickling every array to worker processes
+        return abstract_tree, (self.start_player,)
+
+@lru_cache(maxsize=None)
+def abstract_tree(start_player):
+    '''
+    Returns the AbstractBettingTree of start_player, built once per process
+    '''
+    return AbstractBettingTree(start_player)
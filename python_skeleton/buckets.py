@@ -1,5 +1,10 @@
-import eval7
+from skeleton.cards import RANKS, SUITS, card_rank, card_suit, parse_cards, parse_rank
 from calculate_winrates import load_hole_winrates
+from ranges import hole_winrate
+from hand_eval import evaluate, hand_type
+
+NUM_RANKS = len(RANKS)
+NUM_SUITS = len(SUITS)
 
 class Bucket:
     def __init__(self):
@@ -18,34 +23,39 @@ class Bucket:
                 '\nturn: ' + str(self.turn) + 
                 '\nriver: ' + str(self.river) + '\n')
 
-def is_high_potential(eval7_hand):
+# rank masks of the 10 straights, the wheel (A2345) included
+STRAIGHT_MASKS = [0b11111 << low for low in range(NUM_RANKS - 4)] + [(1 << 12) | 0b1111]
+# rank mask -> whether adding one more rank makes a straight
+STRAIGHT_DRAWS = [any(bin(mask & straight).count('1') == 4 for straight in STRAIGHT_MASKS) for mask in range(1 << NUM_RANKS)]
+
+def is_high_potential(hand):
     """
     Arguments:
-        hand: list of cards in eval7 format
+        hand: list of cards as ints
     
     Returns:
         0 if hand is not low-strength-high-potential
         1 if hand is High Card and a Straight/Flush draw
         2 if hand is Pair and a Straight/Flush draw
     """
-    handtype = eval7.handtype(eval7.evaluate(eval7_hand))
-
-    deck = eval7.Deck()
-    for card in eval7_hand:
-        deck.cards.remove(card)
+    handtype = hand_type(evaluate(hand))
 
     if handtype == 'Pair' or handtype == 'High Card':
-        for card in deck:
-            newHandtype = eval7.handtype(eval7.evaluate(eval7_hand + [card]))
-            if newHandtype == 'Flush' or newHandtype == 'Straight':
-                return 2 if handtype == 'Pair' else 1
+        # one more card makes a flush with 4 of a suit, or a straight with 4 of its 5 ranks
+        rank_mask = 0
+        suit_counts = [0] * NUM_SUITS
+        for card in hand:
+            rank_mask |= 1 << card_rank(card)
+            suit_counts[card_suit(card)] += 1
+        if max(suit_counts) >= 4 or STRAIGHT_DRAWS[rank_mask]:
+            return 2 if handtype == 'Pair' else 1
 
     return 0
 
 def get_bucket(hand, bounty, hole_winrates):
     """
     Arguments:
-        hand; list of cards in string format
+        hand; list of cards as ints
         bounty: rank of current bounty
         hole_winrates: dictionary of hole winrates from csv
     
@@ -63,69 +73,57 @@ def get_bucket(hand, bounty, hole_winrates):
     bucket = Bucket()
 
     # Calculate bounty bucket
-    if bounty in ''.join(hand):
+    if bounty in [card >> 2 for card in hand]:
         bucket.bounty = 1
 
     # Calculate preflop bucket
     if len(hand) == 2:
-        rank_1 = hand[0][0]
-        rank_2 = hand[1][0]
-        suited = '1' if hand[0][1] == hand[1][1] else '0'
-
-        if rank_1 + rank_2 + suited in hole_winrates:
-            hole_winrate = hole_winrates[rank_1 + rank_2 + suited]
-        else:
-            hole_winrate = hole_winrates[rank_2 + rank_1 + suited]
-
+        winrate = hole_winrate(hole_winrates, hand)
         for i, threshhold in enumerate(PREFLOP_RANGES):
-            if hole_winrate <= threshhold:
+            if winrate <= threshhold:
                 bucket.preflop = i + 1
                 break
-        hand = [eval7.Card(card) for card in hand]
     # Calculate flop bucket
     elif len(hand) == 5:
-        hand = [eval7.Card(card) for card in hand]
         potential = is_high_potential(hand)
         if potential:
             bucket.flop = len(FLOP_RANGES) + potential
         else:
-            score = eval7.evaluate(hand)
+            score = evaluate(hand)
             for i, threshhold in enumerate(FLOP_RANGES):
                 if score <= threshhold:
                     bucket.flop = i + 1
                     break
     # Calculate turn bucket
     elif len(hand) == 6:
-        hand = [eval7.Card(card) for card in hand]
         potential = is_high_potential(hand)
         if potential:
             bucket.turn = len(TURN_RANGES) + potential
         else:
-            score = eval7.evaluate(hand)
+            score = evaluate(hand)
             for i, threshhold in enumerate(TURN_RANGES):
                 if score <= threshhold:
                     bucket.turn = i + 1
                     break
     # Calculate river bucket
     else: # len(hand) == 7
-        hand = [eval7.Card(card) for card in hand]
-        score = eval7.evaluate(hand)
+        score = evaluate(hand)
         for i, threshhold in enumerate(RIVER_RANGES):
             if score <= threshhold:
                 bucket.river = i + 1
                 break
 
     # Calculate wetness
-    handtype = eval7.handtype(eval7.evaluate(hand))
-    if handtype != eval7.handtype(eval7.evaluate(hand[1:])):
+    handtype = hand_type(evaluate(hand))
+    if handtype != hand_type(evaluate(hand[1:])):
         bucket.wetness += 1
-    if handtype != eval7.handtype(eval7.evaluate(hand[0:1] + hand[2:])):
+    if handtype != hand_type(evaluate(hand[0:1] + hand[2:])):
         bucket.wetness += 1
     
     return bucket
 
 if __name__ == '__main__':
-    hand = ['Ac', 'Kd', '2c', '3c', '4d', 'Kh']
-    bounty = '2'
+    hand = parse_cards(['Ac', 'Kd', '2c', '3c', '4d', 'Kh'])
+    bounty = parse_rank('2')
     hole_winrates = load_hole_winrates('hole_winrates.csv')
     print(get_bucket(hand, bounty, hole_winrates))
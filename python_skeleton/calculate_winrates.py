@@ -1,51 +1,138 @@
-import eval7
 import csv
+import math
+import time
+import numpy as np
 # import os
 # import itertools
 # from math import comb
-import pandas as pd
 # from tqdm import tqdm
+from skeleton.cards import NUM_CARDS
+from ranges import COMBOS
+from hand_eval import evaluate_batch
 
-def monte_carlo(visible_cards, iters):
+COMBO_ARRAY = np.array(COMBOS)
+
+def monte_carlo(visible_cards, iters, rng=None):
     """
     Calculates win probability given your hole and current community cards
 
     Args:
         visible_cards: list of 2 hole cards + current community cards
         iters: num iterations to sim
+        rng: RngStream to draw from (NumPy's global generator if None)
 
     Returns:
         winrate
     """
-    deck = eval7.Deck()
+    win_count, _ = simulate(*setup_simulation(visible_cards), iters, rng=rng)
+    return win_count / iters
 
-    visible_cards = [eval7.Card(card) for card in visible_cards]
-    my_hole = visible_cards[:2]
-    current_community_cards = visible_cards[3:]
+def setup_simulation(visible_cards):
+    """
+    Converts visible cards into the pieces needed by simulate
 
-    num_community_cards_to_draw = 5 - len(current_community_cards)
+    Args:
+        visible_cards: list of 2 hole cards + current community cards as ints
 
-    for card in visible_cards:
-        deck.cards.remove(card)
+    Returns:
+        (my hole, current community cards, remaining deck)
+    """
+    visible_cards = list(visible_cards)
+    remaining = [card for card in range(NUM_CARDS) if card not in visible_cards]
+    return visible_cards[:2], visible_cards[2:], remaining
 
-    win_count = 0.0
+def draw_without_replacement(cards, rows, k, blocked=None, rng=None):
+    """
+    Draws k distinct cards per row by taking the k smallest of one random key per card
 
-    for _ in range(iters):
-        deck.shuffle()
+    Args:
+        cards: array of cards to draw from
+        rows: number of independent draws
+        blocked: optional (rows, len(cards)) mask of cards that can't be drawn in that row
+        rng: RngStream to draw from (NumPy's global generator if None)
 
-        hidden_cards = deck.peek(2 + num_community_cards_to_draw)
-        opp_hole = hidden_cards[:2]
-        community_cards = current_community_cards + hidden_cards[3:]
+    Returns:
+        (rows, k) array of cards
+    """
+    keys = (rng.numpy if rng is not None else np.random).random((rows, len(cards)))
+    if blocked is not None:
+        keys[blocked] = 2.0
+    if k == 0:
+        return np.empty((rows, 0), dtype=cards.dtype)
+    return cards[np.argpartition(keys, k - 1, axis=1)[:, :k]]
+
+def simulate(my_hole, current_community_cards, remaining, iters, opp_range=None, rng=None):
+    """
+    Plays out iters random opponent holes and boards, dealt and scored as NumPy batches
 
-        my_score = eval7.evaluate(my_hole + community_cards)
-        opp_score = eval7.evaluate(opp_hole + community_cards)
+    Args:
+        opp_range: OpponentRange to draw opponent holes from (uniform if None).
+                   Must already have our cards and the board removed
+        rng: RngStream to draw from (the global generators if None)
 
-        if my_score > opp_score:
-            win_count += 1
-        elif my_score == opp_score:
-            win_count += 0.5
+    Returns:
+        (sum of outcomes, sum of squared outcomes) where a win is 1, a tie 0.5 and a loss 0
+    """
+    num_board = len(current_community_cards)
+    remaining = np.asarray(remaining)
+
+    # rows 0..iters-1 are our hands, rows iters.. the opponent's, on the same boards
+    hands = np.empty((2 * iters, 7), dtype=np.int64)
+    hands[:iters, :2] = my_hole
+    if opp_range is None:
+        hidden = draw_without_replacement(remaining, iters, 2 + 5 - num_board, rng=rng)
+        hands[iters:, :2] = hidden[:, :2]
+        runouts = hidden[:, 2:]
+    else:
+        hands[iters:, :2] = COMBO_ARRAY[opp_range.sample(iters, rng)]
+        # deal the board around the sampled opponent hole
+        blocked = (remaining == hands[iters:, :1]) | (remaining == hands[iters:, 1:2])
+        runouts = draw_without_replacement(remaining, iters, 5 - num_board, blocked, rng)
+    hands[:, 2:2 + num_board] = current_community_cards
+    hands[:iters, 2 + num_board:] = runouts
+    hands[iters:, 2 + num_board:] = runouts
+
+    scores = evaluate_batch(hands)
+    wins = np.count_nonzero(scores[:iters] > scores[iters:])
+    ties = np.count_nonzero(scores[:iters] == scores[iters:])
+    return float(wins + 0.5 * ties), float(wins + 0.25 * ties)
+
+def monte_carlo_until(visible_cards, time_budget, target_stderr=0.01, min_iters=50, max_iters=5000, batch_size=50, opp_range=None, rng=None):
+    """
+    Anytime version of monte_carlo: keeps simulating in batches until the time budget
+    is used up, the standard error of the estimate drops below target_stderr, or max_iters is hit
 
-    return win_count / iters
+    Args:
+        visible_cards: list of 2 hole cards + current community cards
+        time_budget: seconds the estimate may take (min_iters are always run)
+        target_stderr: stop once the standard error of the winrate is below this
+        min_iters: iterations to run regardless of the budget
+        max_iters: hard cap on iterations
+        batch_size: iterations between checks of the clock and the standard error
+        opp_range: OpponentRange to weight opponent holes by (uniform if None)
+        rng: RngStream to draw from (the global generators if None)
+
+    Returns:
+        (winrate, iterations run)
+    """
+    deadline = time.perf_counter() + time_budget
+    my_hole, current_community_cards, remaining = setup_simulation(visible_cards)
+
+    total, total_sq = simulate(my_hole, current_community_cards, remaining, min_iters, opp_range, rng)
+    iters = min_iters
+
+    while iters < max_iters and time.perf_counter() < deadline:
+        mean = total / iters
+        variance = max(total_sq / iters - mean * mean, 0.0)
+        if math.sqrt(variance / iters) < target_stderr:
+            break
+        batch = min(batch_size, max_iters - iters)
+        batch_total, batch_total_sq = simulate(my_hole, current_community_cards, remaining, batch, opp_range, rng)
+        total += batch_total
+        total_sq += batch_total_sq
+        iters += batch
+
+    return total / iters, iters
 
 # def make_csv(num_community_cards, iters):
 #     """
@@ -96,6 +183,8 @@ def load_csv(filename):
     Returns
         dictionary where the keys are frozensets of the visible hand and the values are winrates
     """
+    import pandas as pd # only needed to build tables offline, so bots don't pay for the import
+
     df = pd.read_csv(filename)
 
     lookup_table = {
@@ -106,6 +195,8 @@ def load_csv(filename):
     return lookup_table
 
 def condense_hole_lookup(filename):
+    import pandas as pd
+
     df = pd.read_csv(filename)
 
     condensed_holes = {}
@@ -137,12 +228,11 @@ def condense_hole_lookup(filename):
         writer.writerows(processed_winrates)
 
 def load_hole_winrates(filename):
-    df = pd.read_csv(filename)
-
-    lookup_table = {
-        str(row['rank 1']) + str(row['rank 2']) + str(row['suited']) : float(row['winrate'])
-        for _, row in df.iterrows()
-    }
+    with open(filename, newline='') as csvfile:
+        lookup_table = {
+            row['rank 1'] + row['rank 2'] + row['suited'] : float(row['winrate'])
+            for row in csv.DictReader(csvfile)
+        }
 
     return lookup_table
 
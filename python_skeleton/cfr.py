@@ -1,5 +1,9 @@
 from information_set import InformationSet
 from history import History, NUM_ACTIONS
+from betting_tree import abstract_tree
+from rng import RngStream
+from checkpoint import Checkpointer, latest_checkpoint, load_metadata, table_filenames
+from tables import ArrayTable, save_strategy
 import csv
 import os
 from datetime import datetime
@@ -7,34 +11,53 @@ import pandas as pd
 from tqdm import tqdm
 import multiprocessing as mp
 import queue
-from time import sleep
+import numpy as np
+from time import perf_counter
 
 PLAYERS = 2
 POLLING_RATE = 0.01 # sec
+FLUSH_EVERY = 2000 # nodes a parallel worker visits between flushes of its buffers
+WORKER_STATS = {'nodes': 0, 'ipc_time': 0.0, 'node_budget': float('inf')} # per worker process, see run_traversal
+WORKER_BUFFERS = {'regret': {}, 'strategy': {}, 'rows': {}, 'last_flush': 0} # per worker process, see run_traversal
+
+class NodeBudgetExhausted(Exception):
+    """
+    Raised inside a traversal once the trainer has visited its node budget, unwinding it early
+    """
 
 class CFR_Trainer:
-    def __init__(self, cumulative_regret_filename='', cumulative_strategy_filename='', current_profile_filename=''):
+    def __init__(self, cumulative_regret_filename='', cumulative_strategy_filename='', current_profile_filename='', seed=None, dtype=np.float32, profile_dtype=None):
         """
         Initializes trainer for CFR algo. Can either continue training on existing weights or train from scratch
-        Dict tables are key = hashed info set, value = list of 10 numbers indexed by action
+        Tables are ArrayTables with key = hashed info set, value = row of NUM_ACTIONS numbers indexed by action
 
         Args:
             cumulative_regret_filename: csv file containing existing cumulative regret table, or empty to train from scratch
             cumulative_strategy_filename: csv file containing existing cumulative strategy table, or empty to train from scratch
             current_profile_filename: csv file containing existing current profile table, or empty to train from scratch
+            seed: root seed of the deals, or None for a fresh one (printed so the run can be replayed)
+            dtype: NumPy dtype of the cumulative regret and strategy tables
+            profile_dtype: NumPy dtype of the current profile table (e.g. np.float16), dtype if None
         """
+        self.rng = RngStream(seed)
+        print(f'Random seed: {self.rng.entropy}')
+        self.trees = [abstract_tree(player) for player in range(PLAYERS)] # built up front, not in the first traversal
+        profile_dtype = profile_dtype or dtype
         if cumulative_regret_filename and cumulative_strategy_filename and current_profile_filename:
-            self.cumulative_regret = CFR_Trainer.load_from_csv(cumulative_regret_filename)
-            self.cumulative_strategy = CFR_Trainer.load_from_csv(cumulative_strategy_filename)
-            self.current_profile = CFR_Trainer.load_from_csv(current_profile_filename)
+            self.cumulative_regret = CFR_Trainer.load_table(cumulative_regret_filename, dtype)
+            self.cumulative_strategy = CFR_Trainer.load_table(cumulative_strategy_filename, dtype)
+            self.current_profile = CFR_Trainer.load_table(current_profile_filename, profile_dtype)
         elif cumulative_strategy_filename or cumulative_strategy_filename or current_profile_filename:
             raise Exception('Need all 3 files to continue training on existing weights.')
         else:
-            self.cumulative_regret = {}
-            self.cumulative_strategy = {} 
-            self.current_profile = {}
+            self.cumulative_regret = ArrayTable(NUM_ACTIONS, dtype)
+            self.cumulative_strategy = ArrayTable(NUM_ACTIONS, dtype)
+            self.current_profile = ArrayTable(NUM_ACTIONS, profile_dtype)
 
         self.regrets = [] # used for checking if we converged
+        self.iters_done = 0 # so repeated solves keep dealing new rounds
+        self.nodes_touched = 0 # CFR calls (decision, chance and terminal nodes) over all solves
+        self.node_budget = None # nodes_touched at which the current solve stops, None for no limit
 
     def update_cumulative_regret(self, hashable_info_set, action, actual_utility, expected_utility, opp_reach_prob):
         """
@@ -91,13 +114,10 @@ class CFR_Trainer:
         Returns:
             normalized strategy if sum of cumulative regrets is > 0, else uniform strategy
         """
-        positive_regrets = [max(regret, 0.0) for regret in self.cumulative_regret[hashable_info_set]]
+        positive_regrets = np.maximum(self.cumulative_regret[hashable_info_set], 0.0)
         
-        if sum(positive_regrets) > 0:
-            self.current_profile[hashable_info_set] = [
-                float(regret) / sum(positive_regrets)
-                for regret in positive_regrets
-            ]
+        if positive_regrets.sum() > 0:
+            self.current_profile[hashable_info_set] = positive_regrets / positive_regrets.sum()
         else:
             self.current_profile[hashable_info_set] = self.generate_uniform_strategy(history)
 
@@ -115,6 +135,10 @@ class CFR_Trainer:
         Returns:
             utility of current node (actual utility if terminal node, expected utility if decision node)
         """
+        self.nodes_touched += 1
+        if self.node_budget is not None and self.nodes_touched > self.node_budget:
+            raise NodeBudgetExhausted()
+
         # Deal with terminal and chance nodes
         if history.get_node_type() == 'T':
             return history.get_utility(player, dual_learning)
@@ -154,7 +178,7 @@ class CFR_Trainer:
             if not legal:
                 continue
             new_history = history.generate_action_outcome(action)
-            action_weight = self.current_profile[hashable_info_set][action]
+            action_weight = float(self.current_profile[hashable_info_set][action])
             
             if history.get_active_player() == 0:
                 actual_utilities[action] = self.CFR(new_history, player, t, (action_weight*reach_probs[0], reach_probs[1]), dual_learning)
@@ -176,7 +200,7 @@ class CFR_Trainer:
                 if not legal:
                     continue
 
-                action_weight = self.current_profile[hashable_info_set][action]
+                action_weight = float(self.current_profile[hashable_info_set][action])
 
                 if dual_learning:
                     self.update_cumulative_regret(hashable_info_set, action, actual_utilities[action][active_player], expected_utility[active_player], reach_probs[1-active_player])
@@ -188,16 +212,37 @@ class CFR_Trainer:
         
         return expected_utility
                 
-    def solve(self, iters, dual_learning=False):
+    def solve(self, iters, dual_learning=False, node_budget=None, checkpointer=None):
         """
         Runs the CFR algorithm
 
         Args:
             iters: num iterations of self-play
+            node_budget: stop (possibly mid-traversal) after visiting this many nodes, or None to run every iteration
+            checkpointer: Checkpointer to save the tables in the background as training goes, or None
+        """
+        self.node_budget = self.nodes_touched + node_budget if node_budget is not None else None
+        if checkpointer is not None:
+            checkpointer.begin(self)
+        try:
+            for t in tqdm(range(self.iters_done, self.iters_done + iters), desc='Training', unit='iteration', total=iters):
+                for player in [0, 1]:
+                    self.CFR(History.generate_initial_node(player, rng=self.deal_rng(t, player), tree=self.trees[player]), player, t, (1.0, 1.0), dual_learning)
+                self.iters_done = t + 1
+                if checkpointer is not None:
+                    checkpointer.step(self)
+        except NodeBudgetExhausted:
+            self.nodes_touched -= 1 # the node that raised wasn't visited
+            print(f'Node budget of {node_budget} used up.')
+        finally:
+            self.node_budget = None
+
+    def deal_rng(self, t, player):
+        """
+        Returns:
+            stream for the deal of iteration t for player, the same however iterations are scheduled
         """
-        for t in tqdm(range(iters), desc='Training', unit='iteration', total=iters):
-            for player in [0, 1]:
-                self.CFR(History.generate_initial_node(player), player, t, (1.0, 1.0), dual_learning)
+        return self.rng.child(t).child(player)
 
     def get_equilibrium_strategy(self):
         """
@@ -205,14 +250,63 @@ class CFR_Trainer:
             average strategy in the form of a dict with key = info set as string 
             and value = list of weights for each of the 10 actions
         """
+        return self.normalize_strategy(self.cumulative_strategy)
+
+    @staticmethod
+    def normalize_strategy(cumulative_strategy):
+        """
+        Returns:
+            average strategy of a cumulative strategy table (see get_equilibrium_strategy)
+        """
         return {
             information_set: [weight / sum(strategy) if weight else 0.0 for weight in strategy]
-            for information_set, strategy in self.cumulative_strategy.items()
+            for information_set, strategy in cumulative_strategy.items()
         }
+
+    def snapshot_tables(self):
+        """
+        Returns:
+            copies of the cumulative regret, cumulative strategy and current profile tables,
+            taken now so training can keep updating the originals while a checkpoint is written.
+            Only the blocks are copied here; each copy is a callable that builds the info set ->
+            row dict in the checkpoint writer thread, off the training loop
+        """
+        snapshots = [table.to_array() for table in (self.cumulative_regret, self.cumulative_strategy, self.current_profile)]
+        return [lambda keys=keys, values=values: dict(zip(keys, values.tolist())) for keys, values in snapshots]
+
+    @classmethod
+    def resume(cls, directory, **kwargs):
+        """
+        Continues training from the latest checkpoint in directory, with the same deals the
+        original run would have used next
+
+        Args:
+            directory: Checkpointer directory
+            kwargs: passed through to the constructor (e.g. workers)
+        """
+        path = latest_checkpoint(directory)
+        if path is None:
+            raise FileNotFoundError(f'No checkpoint in {directory}.')
+        metadata = load_metadata(path)
+        print(f'Resuming from {path} after {metadata["iters_done"]} iterations.')
+        trainer = cls(*table_filenames(path), seed=metadata['seed'], **kwargs)
+        trainer.iters_done = metadata['iters_done']
+        trainer.nodes_touched = metadata['nodes_touched']
+        return trainer
     
+    @classmethod
+    def load_table(cls, filename, dtype=np.float32):
+        """
+        Returns:
+            ArrayTable of dtype holding a table saved by save_to_csv
+        """
+        table = ArrayTable(NUM_ACTIONS, dtype)
+        table.update(cls.load_from_csv(filename))
+        return table
+
     @classmethod
     def load_from_csv(cls, filename):
-        df = pd.read_csv(filename)
+        df = pd.read_csv(filename, float_precision='round_trip') # exact, so resumed tables match the saved ones
 
         table = {
             str(row['information set']) : [float(row[f'action {i}']) for i in range(NUM_ACTIONS)]
@@ -232,13 +326,34 @@ class CFR_Trainer:
         print(f'Saved data to {filename}.')
 
 class Parallel_CFR_Trainer(CFR_Trainer):
-    def __init__(self, cumulative_regret_filename='', cumulative_strategy_filename='', current_profile_filename='', workers=mp.cpu_count()-3):
+    def __init__(self, cumulative_regret_filename='', cumulative_strategy_filename='', current_profile_filename='', workers=mp.cpu_count()-3, seed=None, flush_every=FLUSH_EVERY, dtype=np.float32, profile_dtype=None):
+        """
+        The tables live in this (parent) process, which is their only writer. Workers traverse
+        against a read-only copy of the regrets and profiles in a Manager dict, accumulate their
+        updates in private sparse buffers, and send them to the parent every flush_every nodes,
+        where they are reduced into the tables in one vectorized pass. Larger flush_every means
+        fewer IPC round trips but staler regrets in the workers.
+
+        Args:
+            workers: cores to use for worker processes (3 are always left free)
+            seed: root seed of the deals, or None for a fresh one
+            flush_every: nodes a worker visits between flushes of its buffers
+            dtype: NumPy dtype of the cumulative regret and strategy tables
+            profile_dtype: NumPy dtype of the current profile table, dtype if None
+        """
         # should use os.process_cpu_count() on python 3.13+ because it is safer, but both say 10 on my MacBook
         # leave 1 core for os, 1 core for parent process, and 1 core for shared memory manager
         self.num_cores = min(mp.cpu_count()-3, workers)
         print(f'Using {self.num_cores} cpu cores for worker processes.')
+        self.rng = RngStream(seed)
+        print(f'Random seed: {self.rng.entropy}')
+        self.trees = [abstract_tree(player) for player in range(PLAYERS)] # built up front, not in the first traversal
+        self.flush_every = flush_every
+        self.iters_done = 0
+        self.nodes_touched = 0
+        self.ipc_time = 0.0 # seconds workers spent fetching rows and flushing buffers, summed over workers
         self.manager = mp.Manager()
-        self.new_info_sets = mp.Queue(maxsize=1)
+        self.flushes = mp.Queue()
 
         if cumulative_regret_filename and cumulative_strategy_filename and current_profile_filename:
             print(f'Loading existing weights...')
@@ -247,34 +362,24 @@ class Parallel_CFR_Trainer(CFR_Trainer):
                 cumulative_strategy_filename,
                 current_profile_filename
             ]
-            dicts = [self.load_from_csv(filename) for filename in tqdm(filenames, desc='Loading', unit='dict')]
-            self.cumulative_regret, self.cumulative_strategy, self.current_profile = dicts
-            print('Generating key-wise locks...')
-            self.locks = self.manager.dict({
-                info_set: self.manager.Lock()
-                for info_set in tqdm(self.cumulative_strategy.keys(), desc='Generating', unit='locks')
-            })
+            dtypes = [dtype, dtype, profile_dtype or dtype]
+            tables = [self.load_table(filename, table_dtype) for filename, table_dtype in tqdm(zip(filenames, dtypes), total=3, desc='Loading', unit='table')]
+            self.cumulative_regret, self.cumulative_strategy, self.current_profile = tables
         elif cumulative_strategy_filename or cumulative_strategy_filename or current_profile_filename:
             raise Exception('Need all 3 files to continue training on existing weights.')
         else:
             print(f'Training from scratch. Initializing empty tables...')
-
-            self.cumulative_regret = self.manager.dict()
-            self.cumulative_strategy = self.manager.dict()
-            self.current_profile = self.manager.dict()
-            self.locks = self.manager.dict()
-
+            self.cumulative_regret = ArrayTable(NUM_ACTIONS, dtype)
+            self.cumulative_strategy = ArrayTable(NUM_ACTIONS, dtype)
+            self.current_profile = ArrayTable(NUM_ACTIONS, profile_dtype or dtype)
+
+        # info set -> (cumulative regret, current profile), what the workers read
+        self.shared_rows = self.manager.dict({
+            information_set: (regrets.tolist(), self.current_profile[information_set].tolist())
+            for information_set, regrets in self.cumulative_regret.items()
+        })
         print('Trainer initialized.')
 
-    @classmethod
-    def update_cumulative_regret(cls, hashable_info_set, action, actual_utility, expected_utility, opp_reach_prob, cumulative_regret):
-        regret = opp_reach_prob * (actual_utility - expected_utility)
-        cumulative_regret[hashable_info_set][action] += regret
-
-    @classmethod
-    def update_cumulative_strategy(cls, hashable_info_set, action, my_reach_prob, action_weight, cumulative_strategy):           
-        cumulative_strategy[hashable_info_set][action] += my_reach_prob * action_weight
-
     @classmethod
     def generate_uniform_strategy(cls, history):
  
@@ -286,46 +391,64 @@ class Parallel_CFR_Trainer(CFR_Trainer):
         ]
 
     @classmethod
-    def update_current_profile(cls, hashable_info_set, history, cumulative_regret, current_profile):
-        positive_regrets = [max(regret, 0.0) for regret in cumulative_regret[hashable_info_set]]
-
-        if sum(positive_regrets) > 0:
-            new_profile = [
-                float(regret) / sum(positive_regrets)
-                for regret in positive_regrets
-            ]
-        else:
-            new_profile = Parallel_CFR_Trainer.generate_uniform_strategy(history)
+    def get_row(cls, hashable_info_set, history, shared_rows):
+        """
+        Returns:
+            the worker's [cumulative regret, current profile] for an info set, fetched from the
+            shared rows (or started uniform) the first time it is needed after each flush
+        """
+        rows = WORKER_BUFFERS['rows']
+        if hashable_info_set not in rows:
+            start = perf_counter()
+            shared = shared_rows.get(hashable_info_set)
+            WORKER_STATS['ipc_time'] += perf_counter() - start
+            if shared is None: # new info set: flush it even if it never gets updated, like CFR_Trainer tables it
+                shared = ([0.0] * NUM_ACTIONS, Parallel_CFR_Trainer.generate_uniform_strategy(history))
+                WORKER_BUFFERS['regret'].setdefault(hashable_info_set, [0.0] * NUM_ACTIONS)
+                WORKER_BUFFERS['strategy'].setdefault(hashable_info_set, [0.0] * NUM_ACTIONS)
+            rows[hashable_info_set] = [list(shared[0]), list(shared[1])]
+        return rows[hashable_info_set]
 
-        for action in range(NUM_ACTIONS):
-            current_profile[hashable_info_set][action] = new_profile[action]
+    @classmethod
+    def flush(cls, flushes):
+        """
+        Sends the worker's buffered deltas (and the profiles they led to) to the parent and
+        forgets its rows, so they are fetched again with everyone's updates merged in
+        """
+        buffers = WORKER_BUFFERS
+        if buffers['regret']:
+            start = perf_counter()
+            profiles = {information_set: buffers['rows'][information_set][1] for information_set in buffers['regret']}
+            flushes.put((buffers['regret'], buffers['strategy'], profiles))
+            WORKER_STATS['ipc_time'] += perf_counter() - start
+        buffers.update(regret={}, strategy={}, rows={})
+        buffers['last_flush'] = WORKER_STATS['nodes']
 
     @classmethod
-    def CFR(cls, history, player, t, reach_probs, new_info_sets, cumulative_regret, cumulative_strategy, current_profile, locks, dual_learning=False):
+    def CFR(cls, history, player, t, reach_probs, flushes, shared_rows, flush_every, dual_learning=False):
+        WORKER_STATS['nodes'] += 1
+        if WORKER_STATS['nodes'] > WORKER_STATS['node_budget']:
+            raise NodeBudgetExhausted()
+        if WORKER_STATS['nodes'] - WORKER_BUFFERS['last_flush'] >= flush_every:
+            Parallel_CFR_Trainer.flush(flushes)
+
         # Deal with terminal and chance nodes
         if history.get_node_type() == 'T':
             return history.get_utility(player, dual_learning)
         elif history.get_node_type() == 'C':
             new_history = history.generate_chance_outcome()
-            return Parallel_CFR_Trainer.CFR(new_history, player, t, reach_probs,
-                                            new_info_sets, cumulative_regret, cumulative_strategy, current_profile, locks, dual_learning)
+            return Parallel_CFR_Trainer.CFR(new_history, player, t, reach_probs, flushes, shared_rows, flush_every, dual_learning)
         
-        # Get information set and set it up in the cumulative tables if not seen yet
+        # Get information set and its row, local to this worker until the next flush
         information_set = history.get_player_info(history.get_active_player())
         hashable_info_set = str(information_set)
 
-        if hashable_info_set not in locks:
-            new_info_sets.put((hashable_info_set, Parallel_CFR_Trainer.generate_uniform_strategy(history)))
-            while hashable_info_set not in locks:
-                sleep(POLLING_RATE)
+        legal_actions = history.get_legal_actions()
+        current_strategy = list(Parallel_CFR_Trainer.get_row(hashable_info_set, history, shared_rows)[1])
 
         # Calculate utilities
         expected_utility = [0.0, 0.0] if dual_learning else 0.0
         actual_utilities = [(0.0, 0.0)] * NUM_ACTIONS if dual_learning else [0.0] * NUM_ACTIONS
-        legal_actions = history.get_legal_actions()
-        with locks[hashable_info_set]:
-            current_strategy = list(current_profile[hashable_info_set])
-            
         for action, legal in enumerate(legal_actions):
             if not legal:
                 continue
@@ -334,10 +457,10 @@ class Parallel_CFR_Trainer(CFR_Trainer):
             
             if history.get_active_player() == 0:
                 actual_utilities[action] = Parallel_CFR_Trainer.CFR(new_history, player, t, (action_weight*reach_probs[0], reach_probs[1]),
-                                                                    new_info_sets, cumulative_regret, cumulative_strategy, current_profile, locks, dual_learning)
+                                                                    flushes, shared_rows, flush_every, dual_learning)
             else:
                 actual_utilities[action] = Parallel_CFR_Trainer.CFR(new_history, player, t, (reach_probs[0], action_weight*reach_probs[1]), 
-                                                                    new_info_sets, cumulative_regret, cumulative_strategy, current_profile, locks, dual_learning)
+                                                                    flushes, shared_rows, flush_every, dual_learning)
 
             if dual_learning:
                 expected_utility[0] += action_weight*actual_utilities[action][0]
@@ -349,78 +472,163 @@ class Parallel_CFR_Trainer(CFR_Trainer):
         if history.get_active_player() == player or dual_learning:
             
             active_player = history.get_active_player()
+            # the row may have been flushed by a descendant, so fetch it again
+            row = Parallel_CFR_Trainer.get_row(hashable_info_set, history, shared_rows)
+            regret_deltas = WORKER_BUFFERS['regret'].setdefault(hashable_info_set, [0.0] * NUM_ACTIONS)
+            strategy_deltas = WORKER_BUFFERS['strategy'].setdefault(hashable_info_set, [0.0] * NUM_ACTIONS)
 
-            with locks[hashable_info_set]:
-                for action, legal in enumerate(legal_actions):
-                    if not legal:
-                        continue
-
-                    action_weight = current_strategy[action]
+            for action, legal in enumerate(legal_actions):
+                if not legal:
+                    continue
 
-                    if dual_learning:
-                        Parallel_CFR_Trainer.update_cumulative_regret(hashable_info_set, action, actual_utilities[action][active_player], expected_utility[active_player], reach_probs[1-active_player], cumulative_regret)
-                    else:
-                        Parallel_CFR_Trainer.update_cumulative_regret(hashable_info_set, action, actual_utilities[action], expected_utility, reach_probs[1-active_player], cumulative_regret)
+                action_weight = current_strategy[action]
 
-                    Parallel_CFR_Trainer.update_cumulative_strategy(hashable_info_set, action, reach_probs[active_player], action_weight, cumulative_strategy)
-                Parallel_CFR_Trainer.update_current_profile(hashable_info_set, history, cumulative_regret, current_profile)
+                if dual_learning:
+                    regret = reach_probs[1-active_player] * (actual_utilities[action][active_player] - expected_utility[active_player])
+                else:
+                    regret = reach_probs[1-active_player] * (actual_utilities[action] - expected_utility)
+                row[0][action] += regret
+                regret_deltas[action] += regret
+                strategy_deltas[action] += reach_probs[active_player] * action_weight
+
+            positive_regrets = [max(regret, 0.0) for regret in row[0]]
+            if sum(positive_regrets) > 0:
+                row[1] = [regret / sum(positive_regrets) for regret in positive_regrets]
+            else:
+                row[1] = Parallel_CFR_Trainer.generate_uniform_strategy(history)
         
         return expected_utility
+
+    @classmethod
+    def run_traversal(cls, stats, node_budget, history, player, t, reach_probs, flushes, shared_rows, flush_every, dual_learning=False):
+        """
+        Worker process entry point: runs one CFR traversal, flushes what is left in its buffers
+        and reports how it went
+
+        Args:
+            stats: mp.Array of 2 doubles that receives (nodes visited, seconds spent on IPC)
+            node_budget: nodes this worker may visit before it stops early
+        """
+        WORKER_STATS.update(nodes=0, ipc_time=0.0, node_budget=node_budget)
+        WORKER_BUFFERS.update(regret={}, strategy={}, rows={}, last_flush=0)
+        try:
+            Parallel_CFR_Trainer.CFR(history, player, t, reach_probs, flushes, shared_rows, flush_every, dual_learning)
+        except NodeBudgetExhausted:
+            WORKER_STATS['nodes'] -= 1 # the node that raised wasn't visited
+        Parallel_CFR_Trainer.flush(flushes)
+        stats[0] = WORKER_STATS['nodes']
+        stats[1] = WORKER_STATS['ipc_time']
+
+    def reduce(self, flushes):
+        """
+        Adds the flushed buffers of any number of workers to the tables in one vectorized pass
+        and publishes the merged rows to the workers
+
+        Args:
+            flushes: list of (regret deltas, strategy deltas, profiles) dicts from Parallel_CFR_Trainer.flush
+        """
+        information_sets = list({information_set: None for regrets, _, _ in flushes for information_set in regrets})
+        index = {information_set: i for i, information_set in enumerate(information_sets)}
+        zeros = [0.0] * NUM_ACTIONS
+        regrets = np.array([self.cumulative_regret.get(information_set, zeros) for information_set in information_sets])
+        strategies = np.array([self.cumulative_strategy.get(information_set, zeros) for information_set in information_sets])
+        profiles = {}
+        for regret_deltas, strategy_deltas, worker_profiles in flushes:
+            regrets[[index[information_set] for information_set in regret_deltas]] += np.array(list(regret_deltas.values()))
+            strategies[[index[information_set] for information_set in strategy_deltas]] += np.array(list(strategy_deltas.values()))
+            profiles.update(worker_profiles) # used where no regret is positive, i.e. the uniform strategy over legal actions
+
+        positive_regrets = np.maximum(regrets, 0.0)
+        totals = positive_regrets.sum(axis=1, keepdims=True)
+        fallback = np.array([profiles[information_set] for information_set in information_sets])
+        new_profiles = np.where(totals > 0, positive_regrets / np.where(totals > 0, totals, 1.0), fallback)
+
+        regrets, strategies, new_profiles = regrets.tolist(), strategies.tolist(), new_profiles.tolist()
+        self.cumulative_regret.update(zip(information_sets, regrets))
+        self.cumulative_strategy.update(zip(information_sets, strategies))
+        self.current_profile.update(zip(information_sets, new_profiles))
+        self.shared_rows.update(zip(information_sets, zip(regrets, new_profiles)))
+
+    def drain(self, timeout=None):
+        """
+        Reduces every flush waiting in the queue, waiting up to timeout seconds for the first one
+
+        Returns:
+            whether anything was reduced
+        """
+        flushes = []
+        try:
+            flushes.append(self.flushes.get(timeout=timeout) if timeout else self.flushes.get(block=False))
+            while True:
+                flushes.append(self.flushes.get(block=False))
+        except queue.Empty:
+            pass
+        if flushes:
+            self.reduce(flushes)
+        return bool(flushes)
                 
-    def solve(self, iters, dual_learning=False):
+    def solve(self, iters, dual_learning=False, node_budget=None, checkpointer=None):
+        """
+        Runs the CFR algorithm with one worker process per (iteration, player) in each batch
+
+        Args:
+            iters: num iterations of self-play
+            node_budget: total nodes to visit (split evenly over the workers of each batch), or None to run every iteration
+            checkpointer: Checkpointer to save the tables in the background as training goes, or None
+        """
         parallel_factor = self.num_cores // PLAYERS
+        if checkpointer is not None:
+            checkpointer.begin(self)
+        remaining_nodes = node_budget if node_budget is not None else float('inf')
         print(f'Training {parallel_factor} iterations in parallel per player...')
         with tqdm(total=iters, desc='Training', unit='iteration') as pbar:
-            for iter in range(0, iters, parallel_factor):
+            end = self.iters_done + iters
+            for iter in range(self.iters_done, end, parallel_factor):
+                if remaining_nodes <= 0:
+                    print(f'Node budget of {node_budget} used up.')
+                    break
+                batch = [(player, t) for player in range(PLAYERS) for t in range(iter, min(end, iter + parallel_factor))]
+                worker_budget = max(1, remaining_nodes // len(batch)) if node_budget is not None else float('inf')
+                stats = [mp.Array('d', 2, lock=False) for _ in batch]
                 processes = [
                     mp.Process(
-                        target=Parallel_CFR_Trainer.CFR, 
+                        target=Parallel_CFR_Trainer.run_traversal,
                         args=(
-                            History.generate_initial_node(player), 
+                            worker_stats,
+                            worker_budget,
+                            History.generate_initial_node(player, rng=self.deal_rng(t, player), tree=self.trees[player]), 
                             player, 
                             t, 
                             (1.0, 1.0),
-                            self.new_info_sets,
-                            self.cumulative_regret,
-                            self.cumulative_strategy,
-                            self.current_profile,
-                            self.locks,
+                            self.flushes,
+                            self.shared_rows,
+                            self.flush_every,
                             dual_learning
                         )
                     )
-                    for player in range(PLAYERS)
-                    for t in range(iter, min(iters, iter + parallel_factor)) 
+                    for (player, t), worker_stats in zip(batch, stats)
                 ]
 
                 for process in processes:
                     process.start()
                 
                 while any(map(lambda process: process.is_alive(), processes)):
-                    try:
-                        new_info_set, uniform_strategy = self.new_info_sets.get(block=False)
-                        if new_info_set not in self.locks:
-                            self.cumulative_regret[new_info_set] = self.manager.list([0.0] * NUM_ACTIONS)
-                            self.cumulative_strategy[new_info_set] = self.manager.list([0.0] * NUM_ACTIONS)
-                            self.current_profile[new_info_set] = self.manager.list(uniform_strategy)
-                            self.locks[new_info_set] = self.manager.Lock()
-                    except queue.Empty:
-                        sleep(POLLING_RATE)
+                    if not self.drain(timeout=POLLING_RATE) and checkpointer is not None:
+                        checkpointer.step(self)
 
                 for process in processes:
                     process.join()
-                
+                self.drain()
+
+                batch_nodes = int(sum(worker_stats[0] for worker_stats in stats))
+                self.nodes_touched += batch_nodes
+                self.ipc_time += sum(worker_stats[1] for worker_stats in stats)
+                remaining_nodes -= batch_nodes
+                self.iters_done = min(end, iter + parallel_factor)
+                if checkpointer is not None:
+                    checkpointer.step(self)
                 pbar.update(parallel_factor)
 
-    def load_from_csv(self, filename):
-        df = pd.read_csv(filename)
-
-        table = self.manager.dict({
-            str(row['information set']) : self.manager.list([float(row[f'action {i}']) for i in range(NUM_ACTIONS)])
-            for _, row in df.iterrows()
-        })
-
-        return table
-
 if __name__ == '__main__':
     # trainer = CFR_Trainer()
     # trainer.solve(5, dual_learning=True)
@@ -446,13 +654,20 @@ if __name__ == '__main__':
     #     writer.writerow(trainer.regrets)
     # print(f'Saved data to {save_directory}\regrets.csv')
 
-    latest = '2025-01-22 18:34:31.998252'
-    trainer = Parallel_CFR_Trainer(
-        f'./CFR_TRAIN_DATA/{latest}/cumulative_regret.csv', 
-        f'./CFR_TRAIN_DATA/{latest}/cumulative_strategy.csv', 
-        f'./CFR_TRAIN_DATA/{latest}/current_profile.csv'
-    )
-    trainer.solve(iters=120, dual_learning=True)
+    # checkpoints every 10 iterations or 15 minutes; rerunning picks up from the latest one
+    checkpointer = Checkpointer('./CFR_TRAIN_DATA/checkpoints', every_iters=10, every_seconds=15*60)
+    if latest_checkpoint(checkpointer.directory):
+        trainer = Parallel_CFR_Trainer.resume(checkpointer.directory)
+    else:
+        latest = '2025-01-22 18:34:31.998252'
+        trainer = Parallel_CFR_Trainer(
+            f'./CFR_TRAIN_DATA/{latest}/cumulative_regret.csv', 
+            f'./CFR_TRAIN_DATA/{latest}/cumulative_strategy.csv', 
+            f'./CFR_TRAIN_DATA/{latest}/current_profile.csv'
+        )
+    trainer.solve(iters=120 - trainer.iters_done, dual_learning=True, checkpointer=checkpointer)
+    checkpointer.save(trainer) # final state, once any checkpoint still being written is done
+    checkpointer.wait()
     strategy = trainer.get_equilibrium_strategy()
     data_folder = './CFR_TRAIN_DATA'
     if not os.path.exists(data_folder):
@@ -461,8 +676,9 @@ if __name__ == '__main__':
     # os.mkdir(save_directory)
     save_directory = data_folder
 
-    # Save equilibrium strategy
+    # Save equilibrium strategy (and the 8-bit copy the bot loads)
     Parallel_CFR_Trainer.save_to_csv(f'{save_directory}/strategy.csv', strategy)
+    save_strategy(f'{save_directory}/strategy.npz', strategy)
 
     # Save tables for future training
     Parallel_CFR_Trainer.save_to_csv(f'{save_directory}/cumulative_strategy.csv', trainer.cumulative_strategy)
@@ -0,0 +1,147 @@
+from cfr import CFR_Trainer, Parallel_CFR_Trainer, PLAYERS
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+import multiprocessing as mp
+
+'''
+Benchmarks the CFR trainers on fixed-seed workloads so changes to the training stack can be
+compared objectively. Every run visits the same node budget from the same deals, and the
+results (nodes/sec, info sets touched, peak RSS, IPC time, scaling efficiency) are written
+as JSON. Run it from the repository root, like training:
+
+    python3 python_skeleton/cfr_benchmark.py --nodes 2000 --workers 2 4 8 --output benchmark.json
+'''
+
+DEFAULT_SEED = 2025
+DEFAULT_NODES = 2000
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024 # ru_maxrss is in bytes on macOS, KiB on Linux
+
+def peak_rss(who=resource.RUSAGE_SELF):
+    """
+    Returns:
+        peak resident set size in bytes of this process (RUSAGE_SELF) or its waited-for children (RUSAGE_CHILDREN)
+    """
+    return resource.getrusage(who).ru_maxrss * RSS_UNIT
+
+def benchmark_serial(nodes, seed, dual_learning=False):
+    """
+    Args:
+        nodes: node budget of the run
+        seed: root seed of the deals
+        dual_learning: passed through to solve
+
+    Returns:
+        dict of measurements of a CFR_Trainer run
+    """
+    trainer = CFR_Trainer(seed=seed)
+    start = time.perf_counter()
+    trainer.solve(iters=sys.maxsize, dual_learning=dual_learning, node_budget=nodes)
+    elapsed = time.perf_counter() - start
+    return {
+        'trainer': 'CFR_Trainer',
+        'workers': 1,
+        'nodes': trainer.nodes_touched,
+        'seconds': elapsed,
+        'nodes_per_sec': trainer.nodes_touched / elapsed,
+        'info_sets': len(trainer.cumulative_regret),
+        'ipc_seconds': 0.0,
+        'peak_rss_bytes': peak_rss(),
+    }
+
+def benchmark_parallel(nodes, seed, workers, dual_learning=False):
+    """
+    Runs one batch of Parallel_CFR_Trainer workers (one traversal per iteration and player)
+
+    Args:
+        nodes: node budget of the run, split evenly over the workers
+        seed: root seed of the deals
+        workers: cores to ask the trainer for (it keeps 3 free, so it may use fewer)
+        dual_learning: passed through to solve
+
+    Returns:
+        dict of measurements of the run, None if the machine has too few cores for it
+    """
+    if min(mp.cpu_count() - 3, workers) < PLAYERS:
+        print(f'Skipping {workers} workers: not enough cores.')
+        return None
+    start = time.perf_counter()
+    trainer = Parallel_CFR_Trainer(workers=workers, seed=seed)
+    solve_start = time.perf_counter()
+    trainer.solve(iters=trainer.num_cores // PLAYERS, dual_learning=dual_learning, node_budget=nodes)
+    elapsed = time.perf_counter() - solve_start
+    result = {
+        'trainer': 'Parallel_CFR_Trainer',
+        'workers': trainer.num_cores // PLAYERS * PLAYERS,
+        'nodes': trainer.nodes_touched,
+        'seconds': elapsed,
+        'setup_seconds': solve_start - start,
+        'nodes_per_sec': trainer.nodes_touched / elapsed,
+        'info_sets': len(trainer.cumulative_regret),
+        'ipc_seconds': trainer.ipc_time,
+        'peak_rss_bytes': peak_rss(),
+        'peak_worker_rss_bytes': peak_rss(resource.RUSAGE_CHILDREN),
+    }
+    trainer.manager.shutdown()
+    return result
+
+def add_scaling_efficiency(results):
+    """
+    Sets 'speedup' and 'scaling_efficiency' (speedup per worker) of every result relative to the serial run
+    """
+    baseline = results[0]['nodes_per_sec']
+    for result in results:
+        result['speedup'] = result['nodes_per_sec'] / baseline
+        result['scaling_efficiency'] = result['speedup'] / result['workers']
+
+def run(nodes=DEFAULT_NODES, seed=DEFAULT_SEED, workers=(), dual_learning=False):
+    """
+    Benchmarks the serial trainer, then the parallel trainer at every worker count
+
+    Returns:
+        JSON-serializable report with the machine, the workload and one result per run
+    """
+    results = [benchmark_serial(nodes, seed, dual_learning)]
+    for count in workers:
+        result = benchmark_parallel(nodes, seed, count, dual_learning)
+        if result is not None:
+            results.append(result)
+    add_scaling_efficiency(results)
+    return {
+        'date': datetime.now().isoformat(),
+        'machine': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': mp.cpu_count(),
+        },
+        'workload': {'nodes': nodes, 'seed': seed, 'dual_learning': dual_learning},
+        'results': results,
+    }
+
+def print_report(report):
+    print(f"{'trainer':<22}{'workers':>8}{'nodes':>9}{'nodes/s':>11}{'info sets':>11}{'ipc s':>9}{'rss MiB':>9}{'eff':>7}")
+    for result in report['results']:
+        print(f"{result['trainer']:<22}{result['workers']:>8}{result['nodes']:>9}{result['nodes_per_sec']:>11.1f}"
+              f"{result['info_sets']:>11}{result['ipc_seconds']:>9.2f}{result['peak_rss_bytes'] / 2**20:>9.1f}"
+              f"{result['scaling_efficiency']:>7.2f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 python_skeleton/cfr_benchmark.py')
+    parser.add_argument('--nodes', type=int, default=DEFAULT_NODES, help='Node budget of every run')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Root seed of the deals')
+    parser.add_argument('--workers', type=int, nargs='*', default=[], help='Worker counts to run the parallel trainer with')
+    parser.add_argument('--dual-learning', action='store_true', help='Train with dual_learning=True')
+    parser.add_argument('--output', default='', help='JSON file to write the report to')
+    args = parser.parse_args()
+
+    report = run(args.nodes, args.seed, args.workers, args.dual_learning)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'Saved results to {args.output}.')
@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+'''
+Periodic checkpoints of the CFR tables, written from a background thread so training keeps
+going during the write. Every checkpoint is a directory that is fully written under a temp
+name and then renamed into place, and LATEST_FILENAME is swapped atomically to point at it,
+so a crash mid-write never leaves a half-written checkpoint behind.
+'''
+
+TABLE_NAMES = ['cumulative_regret', 'cumulative_strategy', 'current_profile']
+STRATEGY_NAME = 'strategy'
+METADATA_FILENAME = 'checkpoint.json'
+LATEST_FILENAME = 'LATEST'
+
+def atomic_write(filename, text):
+    '''
+    Writes text to filename through a temp file and a rename
+    '''
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'w') as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_filename, filename)
+
+def latest_checkpoint(directory):
+    '''
+    Returns:
+        path of the newest complete checkpoint in directory, None if there isn't one
+    '''
+    try:
+        with open(os.path.join(directory, LATEST_FILENAME)) as file:
+            path = os.path.join(directory, file.read().strip())
+    except FileNotFoundError:
+        return None
+    return path if os.path.exists(os.path.join(path, METADATA_FILENAME)) else None
+
+def load_metadata(path):
+    with open(os.path.join(path, METADATA_FILENAME)) as file:
+        return json.load(file)
+
+def table_filenames(path):
+    '''
+    Returns:
+        csv filenames of the 3 training tables in a checkpoint, in the order the trainers take them
+    '''
+    return [os.path.join(path, f'{name}.csv') for name in TABLE_NAMES]
+
+class Checkpointer():
+    '''
+    Decides when to checkpoint a trainer and writes checkpoints in a background thread.
+
+    @param directory Directory holding the checkpoints (created if needed)
+    @param every_iters Checkpoint every this many iterations, None to not checkpoint on iterations
+    @param every_seconds Checkpoint every this many seconds, None to not checkpoint on time
+    @param keep Number of most recent checkpoints to keep
+    '''
+
+    def __init__(self, directory, every_iters=None, every_seconds=None, keep=3):
+        self.directory = directory
+        self.every_iters = every_iters
+        self.every_seconds = every_seconds
+        self.keep = keep
+        self.last_iters = None
+        self.last_time = time.monotonic()
+        self.writer = None
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory): # temp directories of checkpoints that never finished
+            if name.startswith('.checkpoint_'):
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    def begin(self, trainer):
+        '''
+        Called when a solve starts: iterations are counted from here
+        '''
+        if self.last_iters is None:
+            self.last_iters = trainer.iters_done
+
+    def due(self, trainer):
+        if self.every_iters is not None and trainer.iters_done - self.last_iters >= self.every_iters:
+            return True
+        return self.every_seconds is not None and time.monotonic() - self.last_time >= self.every_seconds
+
+    def step(self, trainer):
+        '''
+        Called by the trainers' solve loops: starts a checkpoint if one is due and the
+        previous one has finished writing (otherwise it waits for the next call)
+        '''
+        if self.error is not None:
+            raise self.error
+        self.begin(trainer)
+        if not self.due(trainer) or self.busy():
+            return
+        self.save(trainer)
+
+    def busy(self):
+        return self.writer is not None and self.writer.is_alive()
+
+    def save(self, trainer):
+        '''
+        Snapshots the trainer and writes the checkpoint in the background
+        '''
+        self.wait()
+        self.last_iters = trainer.iters_done
+        self.last_time = time.monotonic()
+        metadata = {
+            'trainer': type(trainer).__name__,
+            'iters_done': trainer.iters_done,
+            'nodes_touched': trainer.nodes_touched,
+            'seed': trainer.rng.entropy,
+            'time': time.time(),
+        }
+        tables = trainer.snapshot_tables()
+        self.writer = threading.Thread(target=self.write, args=(trainer, tables, metadata), daemon=True)
+        self.writer.start()
+
+    def wait(self):
+        '''
+        Blocks until the checkpoint being written (if any) is on disk
+        '''
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+        if self.error is not None:
+            raise self.error
+
+    def write(self, trainer, tables, metadata):
+        try:
+            tables = [table() if callable(table) else table for table in tables]
+            name = f"checkpoint_{metadata['iters_done']:08d}_{int(metadata['time'])}"
+            temp_path = tempfile.mkdtemp(prefix='.' + name, dir=self.directory)
+            for filename, table in zip(table_filenames(temp_path), tables):
+                trainer.save_to_csv(filename, table)
+            trainer.save_to_csv(os.path.join(temp_path, f'{STRATEGY_NAME}.csv'), trainer.normalize_strategy(tables[1]))
+            atomic_write(os.path.join(temp_path, METADATA_FILENAME), json.dumps(metadata, indent=2))
+            os.rename(temp_path, os.path.join(self.directory, name))
+            atomic_write(os.path.join(self.directory, LATEST_FILENAME), name)
+            print(f'Checkpointed {metadata["iters_done"]} iterations to {name}.')
+            self.prune()
+        except Exception as error:
+            self.error = error
+
+    def prune(self):
+        checkpoints = sorted(name for name in os.listdir(self.directory) if name.startswith('checkpoint_'))
+        for name in checkpoints[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
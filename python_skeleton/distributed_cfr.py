@@ -0,0 +1,383 @@
+from cfr import CFR_Trainer
+from history import History, NUM_ACTIONS
+from rng import RngStream
+from checkpoint import Checkpointer, latest_checkpoint, load_metadata, table_filenames
+
+import argparse
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+import zlib
+import multiprocessing as mp
+
+'''
+Distributed CFR: a coordinator owns the global tables and hands out iterations, and workers
+(on any number of hosts) run traversals against their own local copy of the tables. Every
+sync_every iterations a worker pushes the regret and strategy it accumulated since its last
+sync (zlib-compressed JSON over TCP) and pulls back every row the other workers changed in
+the meantime, so the only shared state is the coordinator's.
+
+On one machine, run_local starts a coordinator thread and local worker processes:
+
+    python3 python_skeleton/distributed_cfr.py local --workers 4 --iters 8
+Across machines, start the coordinator and then point workers at it:
+
+    python3 python_skeleton/distributed_cfr.py coordinator --port 5555 --iters 1000 --checkpoints ./CFR_TRAIN_DATA/checkpoints
+    python3 python_skeleton/distributed_cfr.py worker --host <coordinator host> --port 5555
+'''
+
+DEFAULT_PORT = 5555
+DEFAULT_SYNC_EVERY = 1 # iterations between syncs
+WAIT_SECONDS = 0.05 # how long a worker with nothing to do waits before syncing again
+HEADER = struct.Struct('!I') # length of the compressed message that follows
+
+def send_message(connection, message):
+    payload = zlib.compress(json.dumps(message).encode())
+    connection.sendall(HEADER.pack(len(payload)) + payload)
+
+def receive_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Connection closed.')
+        data += chunk
+    return bytes(data)
+
+def receive_message(connection):
+    size, = HEADER.unpack(receive_exactly(connection, HEADER.size))
+    return json.loads(zlib.decompress(receive_exactly(connection, size)))
+
+class Coordinator():
+    '''
+    Holds the global tables and the iteration schedule, and merges what workers push.
+    Quacks like a trainer for Checkpointer (iters_done, nodes_touched, rng, snapshot_tables).
+
+    @param iters Total number of iterations to train
+    @param seed Root seed of the deals, None for a fresh one
+    @param dual_learning Passed through to the workers' CFR
+    @param sync_every Iterations a worker runs between syncs
+    @param checkpointer Checkpointer to save the global tables with, or None
+    '''
+
+    save_to_csv = CFR_Trainer.save_to_csv
+    normalize_strategy = staticmethod(CFR_Trainer.normalize_strategy)
+
+    def __init__(self, iters, seed=None, dual_learning=False, sync_every=DEFAULT_SYNC_EVERY, checkpointer=None):
+        self.rng = RngStream(seed)
+        print(f'Random seed: {self.rng.entropy}')
+        self.iters = iters
+        self.dual_learning = dual_learning
+        self.sync_every = sync_every
+        self.checkpointer = checkpointer
+        self.cumulative_regret = {}
+        self.cumulative_strategy = {}
+        self.current_profile = {}
+        self.change_log = [] # info sets changed by every merge, in version order
+        self.log_start = 0 # version before change_log[0]; older syncs get every row
+        self.synced = {} # connection -> version its worker last synced at
+        self.version = 0
+        self.next_iter = 0
+        self.retry = [] # iterations handed to workers that disconnected before finishing them
+        self.completed = set()
+        self.iters_done = 0 # every iteration below this one is completed
+        self.nodes_touched = 0
+        self.lock = threading.Lock()
+        self.checkpoint_lock = threading.Lock() # Checkpointer isn't thread safe and every handler thread steps it
+        self.finished = threading.Event()
+        self.active_workers = 0
+
+    @classmethod
+    def resume(cls, directory, iters, **kwargs):
+        '''
+        Continues from the latest checkpoint in a Checkpointer directory
+        '''
+        path = latest_checkpoint(directory)
+        if path is None:
+            raise FileNotFoundError(f'No checkpoint in {directory}.')
+        metadata = load_metadata(path)
+        coordinator = cls(iters, seed=metadata['seed'], **kwargs)
+        tables = [CFR_Trainer.load_from_csv(filename) for filename in table_filenames(path)]
+        coordinator.cumulative_regret, coordinator.cumulative_strategy, coordinator.current_profile = tables
+        coordinator.version = coordinator.log_start = 1 # every loaded row counts as changed at version 1
+        coordinator.next_iter = coordinator.iters_done = metadata['iters_done']
+        coordinator.nodes_touched = metadata['nodes_touched']
+        print(f'Resuming from {path} after {coordinator.iters_done} iterations.')
+        return coordinator
+
+    def snapshot_tables(self):
+        with self.lock:
+            return [
+                {information_set: list(values) for information_set, values in table.items()}
+                for table in (self.cumulative_regret, self.cumulative_strategy, self.current_profile)
+            ]
+
+    def assign(self):
+        '''
+        Returns:
+            next iterations for a worker, empty while every iteration is handed out (the worker
+            waits and syncs again, in case a disconnected worker's iterations come back)
+        '''
+        batch = self.retry[:self.sync_every]
+        del self.retry[:len(batch)]
+        while len(batch) < self.sync_every and self.next_iter < self.iters:
+            batch.append(self.next_iter)
+            self.next_iter += 1
+        return batch
+
+    def changed_since(self, version):
+        '''
+        Returns:
+            info sets changed after version (every info set if the log no longer goes back that far)
+        '''
+        if version < self.log_start:
+            return list(self.cumulative_regret)
+        return list({information_set: None for changes in self.change_log[version - self.log_start:] for information_set in changes})
+
+    def trim_change_log(self):
+        '''
+        Drops the changes every connected worker has already pulled
+        '''
+        oldest = min(self.synced.values(), default=self.version)
+        if oldest > self.log_start:
+            del self.change_log[:oldest - self.log_start]
+            self.log_start = oldest
+
+    def merge(self, message, connection=None):
+        '''
+        Adds a worker's deltas to the global tables
+
+        Returns:
+            reply with the rows changed since the worker's last sync, its next iterations and
+            whether training is finished
+        '''
+        with self.lock:
+            self.version += 1
+            self.change_log.append(list(message['regret']))
+            for information_set, deltas in message['regret'].items():
+                row = self.cumulative_regret.setdefault(information_set, [0.0] * NUM_ACTIONS)
+                for action, delta in enumerate(deltas):
+                    row[action] += delta
+                # regret match the merged row; the worker's profile (uniform over the legal
+                # actions when no regret is positive) is only the fallback
+                positive_regrets = [max(regret, 0.0) for regret in row]
+                total = sum(positive_regrets)
+                if total > 0:
+                    self.current_profile[information_set] = [regret / total for regret in positive_regrets]
+                else:
+                    self.current_profile[information_set] = message['profile'][information_set]
+            for information_set, deltas in message['strategy'].items():
+                row = self.cumulative_strategy.setdefault(information_set, [0.0] * NUM_ACTIONS)
+                for action, delta in enumerate(deltas):
+                    row[action] += delta
+
+            self.nodes_touched += message['nodes']
+            self.completed.update(message['done'])
+            while self.iters_done in self.completed:
+                self.completed.remove(self.iters_done)
+                self.iters_done += 1
+            if self.iters_done >= self.iters:
+                self.finished.set()
+
+            changed = self.changed_since(message['since'])
+            self.synced[connection] = self.version
+            self.trim_change_log()
+            reply = {
+                'version': self.version,
+                'regret': {information_set: list(self.cumulative_regret[information_set]) for information_set in changed},
+                'profile': {information_set: list(self.current_profile[information_set]) for information_set in changed
+                            if information_set in self.current_profile},
+                'iters': self.assign(),
+                'finished': self.finished.is_set(),
+            }
+        if self.checkpointer is not None:
+            with self.checkpoint_lock:
+                self.checkpointer.step(self)
+        return reply
+
+    def handle(self, connection):
+        '''
+        Serves one worker until it disconnects
+        '''
+        outstanding = []
+        with self.lock:
+            self.active_workers += 1
+        try:
+            hello = receive_message(connection)
+            print(f"Worker {hello['name']} connected.")
+            send_message(connection, {'seed': self.rng.entropy, 'dual_learning': self.dual_learning})
+            while True:
+                message = receive_message(connection)
+                reply = self.merge(message, connection)
+                outstanding = reply['iters']
+                send_message(connection, reply)
+                if reply['finished']:
+                    break
+        except (ConnectionError, OSError):
+            with self.lock:
+                self.retry.extend(outstanding)
+        finally:
+            with self.lock:
+                self.active_workers -= 1
+                self.synced.pop(connection, None)
+
+    def serve(self, host='', port=DEFAULT_PORT):
+        '''
+        Accepts workers until every iteration is completed
+
+        Returns:
+            the (host, port) the coordinator listened on and the thread serving it, whose
+            join returns once training is done
+        '''
+        coordinator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                coordinator.handle(self.request)
+
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def wait():
+            self.finished.wait()
+            while self.active_workers > 0: # let the last workers get their final replies
+                time.sleep(0.01)
+            server.shutdown()
+            server.server_close()
+            if self.checkpointer is not None:
+                with self.checkpoint_lock:
+                    self.checkpointer.save(self)
+                    self.checkpointer.wait()
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        return server.server_address, thread
+
+class ShardTrainer(CFR_Trainer):
+    '''
+    Worker side: a CFR_Trainer on the worker's local copy of the tables that also records
+    what it changed since the last sync.
+    '''
+
+    def __init__(self, seed):
+        super().__init__(seed=seed)
+        self.regret_deltas = {}
+        self.strategy_deltas = {}
+        self.version = 0
+        self.synced_nodes = 0
+
+    def update_cumulative_regret(self, hashable_info_set, action, actual_utility, expected_utility, opp_reach_prob):
+        regret = opp_reach_prob * (actual_utility - expected_utility)
+        self.cumulative_regret[hashable_info_set][action] += regret
+        self.regret_deltas.setdefault(hashable_info_set, [0.0] * NUM_ACTIONS)[action] += regret
+
+    def update_cumulative_strategy(self, hashable_info_set, action, my_reach_prob, action_weight):
+        self.cumulative_strategy[hashable_info_set][action] += my_reach_prob * action_weight
+        self.strategy_deltas.setdefault(hashable_info_set, [0.0] * NUM_ACTIONS)[action] += my_reach_prob * action_weight
+
+    def sync_message(self, done):
+        '''
+        Returns:
+            message pushing everything changed since the last sync (and clears it)
+        '''
+        message = {
+            'regret': self.regret_deltas,
+            'strategy': self.strategy_deltas,
+            'profile': {information_set: self.current_profile[information_set].tolist() for information_set in self.regret_deltas},
+            'nodes': self.nodes_touched - self.synced_nodes,
+            'done': done,
+            'since': self.version,
+        }
+        self.regret_deltas, self.strategy_deltas = {}, {}
+        self.synced_nodes = self.nodes_touched
+        return message
+
+    def apply(self, reply):
+        '''
+        Replaces the local rows with the merged ones from the coordinator
+        '''
+        self.version = reply['version']
+        for information_set, regrets in reply['regret'].items():
+            self.cumulative_regret[information_set] = regrets
+            self.cumulative_strategy.setdefault(information_set, [0.0] * NUM_ACTIONS)
+            positive_regrets = [max(regret, 0.0) for regret in regrets]
+            if sum(positive_regrets) > 0:
+                self.current_profile[information_set] = [regret / sum(positive_regrets) for regret in positive_regrets]
+            elif information_set in reply['profile']:
+                self.current_profile[information_set] = reply['profile'][information_set]
+
+def run_worker(host='localhost', port=DEFAULT_PORT, name=None):
+    '''
+    Trains the iterations a coordinator hands out until training is finished
+    '''
+    with socket.create_connection((host, port)) as connection:
+        send_message(connection, {'name': name or f'{socket.gethostname()}:{mp.current_process().pid}'})
+        config = receive_message(connection)
+        trainer = ShardTrainer(config['seed'])
+        done = []
+        while True:
+            send_message(connection, trainer.sync_message(done))
+            reply = receive_message(connection)
+            trainer.apply(reply)
+            if reply['finished']:
+                break
+            if not reply['iters']: # the rest are running on other workers, which may still drop them
+                time.sleep(WAIT_SECONDS)
+            for t in reply['iters']:
+                for player in [0, 1]:
+                    trainer.CFR(History.generate_initial_node(player, rng=trainer.deal_rng(t, player), tree=trainer.trees[player]), player, t, (1.0, 1.0), config['dual_learning'])
+            done = reply['iters']
+
+def run_local(iters, workers, seed=None, dual_learning=False, sync_every=DEFAULT_SYNC_EVERY, checkpointer=None):
+    '''
+    Trains with a coordinator in this process and local worker processes talking to it over TCP
+
+    Returns:
+        the coordinator, holding the trained tables
+    '''
+    coordinator = Coordinator(iters, seed, dual_learning, sync_every, checkpointer)
+    (_, port), thread = coordinator.serve('localhost', 0)
+    processes = [mp.Process(target=run_worker, args=('localhost', port, f'local-{i}')) for i in range(workers)]
+    for process in processes:
+        process.start()
+    thread.join()
+    for process in processes:
+        process.join()
+    return coordinator
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 python_skeleton/distributed_cfr.py')
+    parser.add_argument('mode', choices=['coordinator', 'worker', 'local'])
+    parser.add_argument('--host', default='localhost', help='Coordinator host (workers)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Coordinator port')
+    parser.add_argument('--iters', type=int, default=100, help='Total iterations (coordinator, local)')
+    parser.add_argument('--workers', type=int, default=2, help='Local worker processes (local)')
+    parser.add_argument('--seed', type=int, default=None, help='Root seed of the deals')
+    parser.add_argument('--sync-every', type=int, default=DEFAULT_SYNC_EVERY, help='Iterations between syncs')
+    parser.add_argument('--dual-learning', action='store_true')
+    parser.add_argument('--checkpoints', default='', help='Checkpointer directory (resumes from it if it has one)')
+    parser.add_argument('--checkpoint-minutes', type=float, default=15.0)
+    args = parser.parse_args()
+
+    checkpointer = Checkpointer(args.checkpoints, every_seconds=args.checkpoint_minutes * 60) if args.checkpoints else None
+    start = time.perf_counter()
+    if args.mode == 'worker':
+        run_worker(args.host, args.port)
+    elif args.mode == 'local':
+        coordinator = run_local(args.iters, args.workers, args.seed, args.dual_learning, args.sync_every, checkpointer)
+        print(f'Trained {coordinator.iters_done} iterations ({coordinator.nodes_touched} nodes, '
+              f'{len(coordinator.cumulative_regret)} info sets) in {time.perf_counter() - start:.1f}s.')
+    else:
+        kwargs = dict(dual_learning=args.dual_learning, sync_every=args.sync_every, checkpointer=checkpointer)
+        if checkpointer is not None and latest_checkpoint(args.checkpoints):
+            coordinator = Coordinator.resume(args.checkpoints, args.iters, **kwargs)
+        else:
+            coordinator = Coordinator(args.iters, args.seed, **kwargs)
+        _, thread = coordinator.serve('', args.port)
+        print(f'Coordinator listening on port {args.port}.')
+        thread.join()
+        print(f'Trained {coordinator.iters_done} iterations in {time.perf_counter() - start:.1f}s.')
@@ -0,0 +1,173 @@
+import os
+import numpy as np
+from functools import lru_cache
+
+'''
+Table-driven hand evaluator that returns exactly eval7.evaluate's scores, so thresholds
+and handtype() keep working. Cards are integers (index in eval7.Deck().cards, i.e. 4 * rank + suit)
+and whole batches of 1 to 7 card hands are scored with a few NumPy gathers.
+
+Two tables are built once with eval7 and memory-mapped from TABLE_FILENAME afterwards:
+    - FLUSH: 13 bit rank mask of one suit -> best flush / straight flush score (0 under 5 cards)
+    - NO_FLUSH: perfect hash of the rank counts -> best score ignoring suits
+A flush can't coexist with quads or a full house in 7 cards, so the score of a hand is
+the larger of its no-flush score and the flush scores of its four suits.
+'''
+
+NUM_RANKS = 13
+NUM_SUITS = 4
+MAX_CARDS = 7
+MAX_COPIES = 4 # of one rank
+NUM_FLUSH_MASKS = 1 << NUM_RANKS
+TABLE_VERSION = 2 # bump whenever the table contents change so stale files are rebuilt
+TABLE_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hand_ranks_{}.npy'.format(TABLE_VERSION))
+HAND_TYPES = ['High Card', 'Pair', 'Two Pair', 'Trips', 'Straight', 'Flush', 'Full House', 'Quads', 'Straight Flush']
+HAND_TYPE_SHIFT = 24 # eval7 keeps the hand type in the top bits of the score
+
+@lru_cache(maxsize=None)
+def count_vectors(num_ranks, max_cards):
+    '''
+    Returns:
+        number of rank count vectors over num_ranks ranks holding at most max_cards cards
+    '''
+    if max_cards < 0:
+        return 0
+    if num_ranks == 0:
+        return 1
+    return sum(count_vectors(num_ranks - 1, max_cards - copies) for copies in range(MAX_COPIES + 1))
+
+def build_offsets():
+    '''
+    The rank counts are hashed by walking the ranks like a state machine whose state is the
+    number of cards still unplaced: OFFSETS[rank, cards_left, copies] is how many count
+    vectors come before the ones with copies of this rank, so summing one entry per rank
+    gives a dense index into NO_FLUSH.
+    '''
+    offsets = np.zeros((NUM_RANKS, MAX_CARDS + 1, MAX_COPIES + 1), dtype=np.int64)
+    for rank in range(NUM_RANKS):
+        for cards_left in range(MAX_CARDS + 1):
+            for copies in range(1, MAX_COPIES + 1):
+                offsets[rank, cards_left, copies] = offsets[rank, cards_left, copies - 1] + \
+                    count_vectors(NUM_RANKS - rank - 1, cards_left - copies + 1)
+    return offsets
+
+OFFSETS = build_offsets()
+OFFSET_LISTS = OFFSETS.tolist() # plain lists are much faster to index one entry at a time
+RANK_POSITIONS = np.arange(NUM_RANKS)
+NUM_COUNT_VECTORS = count_vectors(NUM_RANKS, MAX_CARDS)
+
+def count_index(counts):
+    '''
+    Returns:
+        index of the rank counts (sequence of 13 ints) in NO_FLUSH
+    '''
+    index = 0
+    cards_left = MAX_CARDS
+    for rank, copies in enumerate(counts):
+        index += OFFSET_LISTS[rank][cards_left][copies]
+        cards_left -= copies
+    return index
+
+def build_tables():
+    '''
+    Scores every flush mask and every rank count vector of 1 to 7 cards with eval7
+
+    Returns:
+        one int32 array: FLUSH (8192 entries) followed by NO_FLUSH
+    '''
+    import eval7
+
+    deck = eval7.Deck().cards # eval7 card for every int card (skeleton.cards)
+    flush = np.zeros(NUM_FLUSH_MASKS, dtype=np.int32)
+    for mask in range(NUM_FLUSH_MASKS):
+        ranks = [rank for rank in range(NUM_RANKS) if mask >> rank & 1]
+        if 5 <= len(ranks) <= MAX_CARDS:
+            flush[mask] = eval7.evaluate([deck[NUM_SUITS * rank] for rank in ranks])
+
+    no_flush = np.zeros(NUM_COUNT_VECTORS, dtype=np.int32)
+    def fill(counts, cards_left):
+        if len(counts) == NUM_RANKS:
+            if cards_left < MAX_CARDS:
+                ranks = [rank for rank, copies in enumerate(counts) for _ in range(copies)]
+                # cycling the suits puts at most 2 of 7 cards in any suit, so there is no flush
+                hand = [deck[NUM_SUITS * rank + i % NUM_SUITS] for i, rank in enumerate(ranks)]
+                no_flush[count_index(counts)] = eval7.evaluate(hand)
+            return
+        for copies in range(min(MAX_COPIES, cards_left) + 1):
+            fill(counts + [copies], cards_left - copies)
+    fill([], MAX_CARDS)
+
+    return np.concatenate((flush, no_flush))
+
+def load_tables(filename=TABLE_FILENAME):
+    '''
+    Memory-maps the tables, building and saving them first if the file doesn't exist
+    (or keeping them in memory if it can't be written)
+    '''
+    if os.path.exists(filename):
+        tables = np.load(filename, mmap_mode='r')
+        if len(tables) == NUM_FLUSH_MASKS + NUM_COUNT_VECTORS:
+            return tables
+    tables = build_tables()
+    try:
+        temp_filename = filename + '.tmp.npy'
+        np.save(temp_filename, tables)
+        os.replace(temp_filename, filename)
+        return np.load(filename, mmap_mode='r')
+    except OSError:
+        return tables
+
+TABLES = np.asarray(load_tables()) # plain ndarray view of the mapping, skipping np.memmap's indexing overhead
+FLUSH = TABLES[:NUM_FLUSH_MASKS]
+NO_FLUSH = TABLES[NUM_FLUSH_MASKS:]
+
+def evaluate(cards):
+    '''
+    Scores one hand
+
+    Args:
+        cards: 1 to 7 cards as ints
+
+    Returns:
+        same score as eval7.evaluate
+    '''
+    counts = [0] * NUM_RANKS
+    suit_masks = [0] * NUM_SUITS
+    for card in cards:
+        counts[card >> 2] += 1
+        suit_masks[card & 3] |= 1 << (card >> 2)
+    score = NO_FLUSH.item(count_index(counts))
+    if len(cards) >= 5:
+        score = max(score, max(FLUSH.item(mask) for mask in suit_masks))
+    return score
+
+def evaluate_batch(hands):
+    '''
+    Scores a batch of hands
+
+    Args:
+        hands: int array of shape (number of hands, 1 to 7 cards)
+
+    Returns:
+        int32 array of the eval7 score of every hand
+    '''
+    hands = np.asarray(hands)
+    num_hands = len(hands)
+    ranks = hands >> 2
+    rows = np.arange(num_hands)[:, None]
+
+    counts = np.bincount((rows * NUM_RANKS + ranks).ravel(), minlength=num_hands * NUM_RANKS)
+    counts = counts.reshape(num_hands, NUM_RANKS)
+    cards_left = MAX_CARDS - np.cumsum(counts, axis=1) + counts
+    scores = NO_FLUSH[OFFSETS[RANK_POSITIONS, cards_left, counts].sum(axis=1)]
+
+    # cards are distinct, so summing rank bits per suit gives the suit's rank mask
+    masks = np.bincount((rows * NUM_SUITS + (hands & 3)).ravel(), (1 << ranks).ravel(), num_hands * NUM_SUITS)
+    return np.maximum(scores, FLUSH[masks.astype(np.int64).reshape(num_hands, NUM_SUITS)].max(axis=1))
+
+def hand_type(score):
+    '''
+    Returns:
+        same string as eval7.handtype(score)
+    '''
+    return HAND_TYPES[score >> HAND_TYPE_SHIFT]
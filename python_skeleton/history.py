@@ -1,19 +1,126 @@
 from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
 from skeleton.states import TerminalState, RoundState
 from skeleton.states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
+from skeleton.cards import NUM_CARDS, RANKS, parse_cards, format_cards
 from buckets import get_bucket
 from calculate_winrates import load_hole_winrates
+from hand_eval import evaluate
 
 from information_set import InformationSet
 
 import random
 import math
-import eval7
+from collections import namedtuple
+from functools import lru_cache
 
 RAISES = [20, 40, 80]
 NUM_ACTIONS = 4 + len(RAISES)
 BOUNTY_RATIO = 1.5
 BOUNTY_CONSTANT = 10
+HOLE_WINRATES_FILENAME = 'python_skeleton/hole_winrates.csv'
+
+@lru_cache(maxsize=None)
+def cached_hole_winrates(filename):
+    '''
+    Loads the hole winrate table once per process instead of once per History node
+    '''
+    return load_hole_winrates(filename)
+
+def bounty_delta(winner_index, stacks, button, bounty_hits):
+    '''
+    Returns player 0's delta after bounty rules are applied (see History.get_delta)
+
+    @param winner_index 0 (player A), 1 (player B) or 2 (split pot)
+    @param stacks Stacks of the last RoundState before the terminal
+    @param button Button of that RoundState
+    @param bounty_hits Whether each player hit their bounty
+    '''
+    bounty_hit_0, bounty_hit_1 = bounty_hits
+
+    delta = 0
+    if winner_index == 2:
+        # Case of split pots
+        assert(stacks[0] == stacks[1]) # split pots only happen on the river + equal stacks
+        delta = STARTING_STACK - stacks[0]
+        if bounty_hit_0 and not bounty_hit_1:
+            delta = delta * (BOUNTY_RATIO - 1) / 2 + BOUNTY_CONSTANT
+        elif not bounty_hit_0 and bounty_hit_1:
+            delta = -(delta * (BOUNTY_RATIO - 1) / 2 + BOUNTY_CONSTANT)
+        else:
+            delta = 0
+    else:
+        # Case of one player winning
+        if winner_index == 0:
+            delta = STARTING_STACK - stacks[1]
+            if bounty_hit_0:
+                delta = delta * BOUNTY_RATIO + BOUNTY_CONSTANT
+        else:
+            delta = stacks[0] - STARTING_STACK
+            if bounty_hit_1:
+                delta = delta * BOUNTY_RATIO - BOUNTY_CONSTANT
+
+    # if delta is not an integer, round it down or up depending on who's in position
+    if abs(delta - math.floor(delta)) > 1e-6:
+        delta = math.floor(delta) if button % 2 == 0 else math.ceil(delta)
+    return int(delta)
+
+Transitions = namedtuple('Transitions', ['legal_mask', 'legal_actions', 'successors'])
+
+@lru_cache(maxsize=None)
+def betting_transitions(button, street, pips, stacks):
+    '''
+    Returns the Transitions of a betting state: which actions are legal and where each one leads.
+    Both only depend on (button, street, pips, stacks), so they are worked out once per betting
+    state and every History at that state looks them up.
+
+    @param pips Tuple of both players' pips
+    @param stacks Tuple of both players' stacks
+
+    Transitions fields:
+        legal_mask: int with bit i set if action i is legal (actions as in History.get_legal_actions)
+        legal_actions: tuple of NUM_ACTIONS bools
+        successors: (states, terminal) for every action, where states are the (button, street, pips, stacks)
+            of the RoundStates the action chains after the current one, and terminal is None if the last
+            of them is the new state, else (deltas, folded) of the TerminalState that ends the round
+    '''
+    # cards don't matter for betting; they are filled in from the real state in generate_action_outcome
+    state = RoundState(button, street, list(pips), list(stacks), [[], []], [0, 0], [], None)
+
+    legal_actions = [False for _ in range(NUM_ACTIONS)]
+    actions = state.legal_actions()
+    min_raise, max_raise = state.raise_bounds()
+
+    for i, action in enumerate((FoldAction, CallAction, CheckAction)):
+        if action in actions:
+            legal_actions[i] = True
+
+    if RaiseAction in actions:
+        legal_actions[3] = True
+
+        for i, bet in enumerate(RAISES):
+            if min_raise < bet and max_raise > bet:
+                legal_actions[i+4] = True
+
+    successors = []
+    for action in [FoldAction(), CallAction(), CheckAction(), RaiseAction(max_raise)] + [RaiseAction(bet) for bet in RAISES]:
+        if isinstance(action, CallAction) and button == 0:
+            # sb call bb: the abstraction skips the bb's preflop option and goes straight to the flop
+            successors.append((((1, 3, (BIG_BLIND, BIG_BLIND), (STARTING_STACK - BIG_BLIND, STARTING_STACK - BIG_BLIND)),), None))
+            continue
+
+        outcome = state.proceed(action)
+        terminal = None
+        if isinstance(outcome, TerminalState):
+            terminal = (tuple(outcome.deltas), outcome.bounty_hits is not None)
+            outcome = outcome.previous_state
+        states = []
+        while outcome is not state:
+            states.append((outcome.button, outcome.street, tuple(outcome.pips), tuple(outcome.stacks)))
+            outcome = outcome.previous_state
+        successors.append((tuple(reversed(states)), terminal))
+
+    legal_mask = sum(1 << i for i, legal in enumerate(legal_actions) if legal)
+    return Transitions(legal_mask, tuple(legal_actions), tuple(successors))
 
 class History():
     '''
@@ -24,35 +131,43 @@ class History():
     @param roundState Representation of round state used by states.py and runner.py
         TODO: can maybe use engine.py? figure out engine.py vs states.py
     @param in_deck List representing input community cards (round_state has in_hand player 0 cards in this case)
+    @param rng RngStream (or anything with random.Random's methods) to deal cards with, the global random module if None
+    @param tree AbstractBettingTree (betting_tree.py) of the round to look nodes up in, or None to work them out
+    @param node Id of this node in tree
     '''
 
-    def __init__(self, active, round_state, set_deck=None):
+    def __init__(self, active, round_state, set_deck=None, rng=None, tree=None, node=0):
         self.set_deck = set_deck
+        self.rng = rng if rng is not None else random
         self.active = active # 0 or 1
         self.round_state = round_state
-        self.hole_winrates = load_hole_winrates('python_skeleton/hole_winrates.csv')
+        self.tree = tree
+        self.node = node
+        self.hole_winrates = cached_hole_winrates(HOLE_WINRATES_FILENAME)
         # RoundState: ['button', 'street', 'pips', 'stacks', 'hands', 'bounties', 'deck', 'previous_state']
 
     @classmethod
-    def generate_initial_node(cls, start_player, set_cards=None, set_buckets=None):
+    def generate_initial_node(cls, start_player, set_cards=None, set_buckets=None, rng=None, tree=None):
         '''
         Return History representative of beginning of round
 
-        @param set_cards List of specific cards to play this round ([0:2] player, [2:7] community)
+        @param set_cards List of specific cards in string format to play this round ([0:2] player, [2:7] community)
         @param set_buckets Gives bucket in form of string: 'bounty|preflop|flop|turn|river'
+        @param rng RngStream to deal this round (and everything below it) from, the global random module if None
+        @param tree abstract_tree(start_player) to walk the round on, or None
         '''
+        rng = rng if rng is not None else random
 
         # pick bounties at random
-        bounty_chars = [str(i) for i in range(2, 10)] + ['T', 'J', 'Q', 'K', 'A']
-        bounties = [bounty_chars[random.randint(0, 12)], bounty_chars[random.randint(0, 12)]]
+        bounties = [rng.randrange(len(RANKS)), rng.randrange(len(RANKS))]
 
         # set stacks and set pips based on start player
         pips = [SMALL_BLIND, BIG_BLIND] if start_player == 0 else [BIG_BLIND, SMALL_BLIND]
         stacks = [STARTING_STACK - pips[0], STARTING_STACK - pips[1]]
         deck = [] # unlike engine structure, we fill this as we reach chance nodes
 
-        full_deck = eval7.Deck()
-        full_deck.shuffle()
+        full_deck = list(range(NUM_CARDS))
+        rng.shuffle(full_deck)
         
         if set_cards or set_buckets:
             if set_buckets:
@@ -68,25 +183,26 @@ class History():
                 river = int(flags[4])
 
             assert len(set_cards) == 7
+            set_cards = parse_cards(set_cards)
 
             for card in set_cards:
-                full_deck.cards.remove(eval7.Card(card))
+                full_deck.remove(card)
 
             # set player 0's cards based on input and player 1's cards random
             hand0 = set_cards[:2]
-            hand1 = [str(card) for card in full_deck.deal(2)]
+            hand1 = [full_deck.pop(), full_deck.pop()]
             hands = [hand0, hand1]
             set_deck = set_cards[2:]
         
         else:
             # deal two hands at random
-            hand0 = [str(card) for card in full_deck.deal(2)]
-            hand1 = [str(card) for card in full_deck.deal(2)]
+            hand0 = [full_deck.pop(), full_deck.pop()]
+            hand1 = [full_deck.pop(), full_deck.pop()]
             hands = [hand0, hand1]
             set_deck = None
 
         round_state = RoundState(0, 0, pips, stacks, hands, bounties, deck, None)
-        return History(start_player, round_state, set_deck)
+        return History(start_player, round_state, set_deck, rng, tree)
 
     def get_active_player(self):
         '''
@@ -101,6 +217,8 @@ class History():
           'C': chance
           'D': decision
         '''
+        if self.tree is not None:
+            return self.tree.node_type_chars[self.node]
         if isinstance(self.round_state, TerminalState):
             return 'T'
         elif self.round_state.street != len(self.round_state.deck): # proceed_street was just called
@@ -116,16 +234,13 @@ class History():
         '''
         assert isinstance(self.round_state, TerminalState)
 
-        deltas = self.round_state.deltas
         bounty_hits = self.round_state.bounty_hits
 
         # terminal state is result of showdown, not fold, we need to calculate delta and bounty hits
         if bounty_hits == None:
             previous_state = self.round_state.previous_state
-            hand0 = [eval7.Card(s) for s in previous_state.hands[0] + previous_state.deck]
-            hand1 = [eval7.Card(s) for s in previous_state.hands[1] + previous_state.deck]
-            score0 = eval7.evaluate(hand0)
-            score1 = eval7.evaluate(hand1)
+            score0 = evaluate(previous_state.hands[0] + previous_state.deck)
+            score1 = evaluate(previous_state.hands[1] + previous_state.deck)
             if score0 > score1:
                 delta = self.get_delta(0)
             elif score0 < score1:
@@ -134,7 +249,9 @@ class History():
                 # split the pot
                 delta = self.get_delta(2)
         else:
-            delta = self.get_delta(1 if deltas[0] > deltas[1] else 0)
+            # fold: the pot goes to the player after the folder, i.e. this History's active player.
+            # (not the RoundState deltas: when start_player is 1, the RoundState's seats are swapped preflop)
+            delta = self.get_delta(self.active)
         
         # return utility of both players as opposed to just input player
         if dual_learning:
@@ -155,35 +272,7 @@ class History():
         assert winner_index in [0, 1, 2]
         assert isinstance(self.round_state, TerminalState)
         state = self.round_state.previous_state
-
-        bounty_hit_0, bounty_hit_1 = state.get_bounty_hits()
-
-        delta = 0
-        if winner_index == 2:
-            # Case of split pots
-            assert(state.stacks[0] == state.stacks[1]) # split pots only happen on the river + equal stacks
-            delta = STARTING_STACK - state.stacks[0]
-            if bounty_hit_0 and not bounty_hit_1:
-                delta = delta * (BOUNTY_RATIO - 1) / 2 + BOUNTY_CONSTANT
-            elif not bounty_hit_0 and bounty_hit_1:
-                delta = -(delta * (BOUNTY_RATIO - 1) / 2 + BOUNTY_CONSTANT)
-            else:
-                delta = 0
-        else:
-            # Case of one player winning
-            if winner_index == 0:
-                delta = STARTING_STACK - state.stacks[1]
-                if bounty_hit_0:
-                    delta = delta * BOUNTY_RATIO + BOUNTY_CONSTANT
-            else:
-                delta = state.stacks[0] - STARTING_STACK
-                if bounty_hit_1:
-                    delta = delta * BOUNTY_RATIO - BOUNTY_CONSTANT
-
-        # if delta is not an integer, round it down or up depending on who's in position
-        if abs(delta - math.floor(delta)) > 1e-6:
-            delta = math.floor(delta) if state.button % 2 == 0 else math.ceil(delta)
-        return int(delta)
+        return bounty_delta(winner_index, state.stacks, state.button, state.get_bounty_hits())
 
     def generate_chance_outcome(self):
         '''
@@ -195,25 +284,18 @@ class History():
             new_deck = self.set_deck[:self.round_state.street] # reveal cards based on pre-set deck
         else:
             # get deck of remaining cards
-            full_deck = eval7.Deck()
-            full_deck.shuffle()
-
             dealt_cards = self.round_state.hands[0] + self.round_state.hands[1] + self.round_state.deck
-            for card in dealt_cards:
-                full_deck.cards.remove(eval7.Card(card))
+            remaining = [card for card in range(NUM_CARDS) if card not in dealt_cards]
 
             # reveal new community cards at random
             new_deck = list(self.round_state.deck)
-            if self.round_state.street == 3:
-                for _ in range(3):
-                    new_deck.append(str(full_deck.cards.pop()))
-            else:
-                new_deck.append(str(full_deck.cards.pop()))
+            new_deck += self.rng.sample(remaining, 3 if self.round_state.street == 3 else 1)
 
         new_pips = list(self.round_state.pips)
         new_stacks = list(self.round_state.stacks)
         state = RoundState(1, self.round_state.street, new_pips, new_stacks, self.round_state.hands, self.round_state.bounties, new_deck, self.round_state)
-        return History(1, state, self.set_deck) # active = button % 2
+        node = self.tree.chance_child_list[self.node] if self.tree is not None else 0
+        return History(1, state, self.set_deck, self.rng, self.tree, node) # active = button % 2
 
     def get_legal_actions(self):
         '''
@@ -228,23 +310,22 @@ class History():
             3  - All In
             4+ - Raises
         '''
-        output = [False for _ in range(NUM_ACTIONS)]
+        return list(self.get_transitions().legal_actions)
 
-        legal_actions = self.round_state.legal_actions()
-        min_raise, max_raise = self.round_state.raise_bounds()
-
-        for i, action in enumerate((FoldAction, CallAction, CheckAction)):
-            if action in legal_actions:
-                output[i] = True
-
-        if RaiseAction in legal_actions:
-            output[3] = True
-
-            for i, bet in enumerate(RAISES):
-                if min_raise < bet and max_raise > bet:
-                    output[i+4] = True
+    def get_legal_mask(self):
+        '''
+        Returns int with bit i set if action i is legal (same actions as get_legal_actions)
+        '''
+        return self.get_transitions().legal_mask
 
-        return output
+    def get_transitions(self):
+        '''
+        Returns the memoized Transitions of the current betting state (see betting_transitions)
+        '''
+        if self.tree is not None:
+            return self.tree.transitions[self.node]
+        rs = self.round_state
+        return betting_transitions(rs.button, rs.street, tuple(rs.pips), tuple(rs.stacks))
     
     def generate_action_outcome(self, action_index):
         '''
@@ -259,19 +340,17 @@ class History():
             4+ - Raises
         '''
 
-        min_raise, max_raise = self.round_state.raise_bounds()
-        actions = [FoldAction, CallAction, CheckAction, max_raise] + RAISES
-
-        # sb call bb
-        if action_index == 1 and self.round_state.button == 0:
-            rs = RoundState(1, 3, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.round_state.hands, self.round_state.bounties, self.round_state.deck, self.round_state)
-            return History(1-self.active, rs, self.set_deck)
-
         # TODO: should maybe check if input action is legal when debugging
-        if action_index < 3:
-            return History(1-self.active, self.round_state.proceed(actions[action_index]()), self.set_deck)
-        else:
-            return History(1-self.active, self.round_state.proceed(RaiseAction(actions[action_index])), self.set_deck)
+        states, terminal = self.get_transitions().successors[action_index]
+
+        state = self.round_state
+        for button, street, pips, stacks in states:
+            state = RoundState(button, street, list(pips), list(stacks), state.hands, state.bounties, state.deck, state)
+        if terminal is not None:
+            deltas, folded = terminal
+            state = TerminalState(list(deltas), state.get_bounty_hits() if folded else None, state)
+        node = self.tree.child_list[self.node][action_index] if self.tree is not None else 0
+        return History(1-self.active, state, self.set_deck, self.rng, self.tree, node)
 
     def get_player_info(self, player_id):
         '''
@@ -285,7 +364,7 @@ class History():
     def __str__(self):
         if isinstance(self.round_state, TerminalState):
             return 'Deltas: ' + str(self.round_state.deltas) + '\nBounty Hits: ' + str(self.round_state.bounty_hits) + "\n_____________"
-        return 'Active: ' + str(self.active) +'\nButton: ' + str(self.round_state.button) + '\nStreet: ' + str(self.round_state.street) + '\nPips: ' + str(self.round_state.pips)  + '\nStacks: ' + str(self.round_state.stacks)  + '\nHands: ' + str(self.round_state.hands)  + '\nBounties: ' + str(self.round_state.bounties)  + '\nCommunity: ' + str(self.round_state.deck) + "\n_____________"
+        return 'Active: ' + str(self.active) +'\nButton: ' + str(self.round_state.button) + '\nStreet: ' + str(self.round_state.street) + '\nPips: ' + str(self.round_state.pips)  + '\nStacks: ' + str(self.round_state.stacks)  + '\nHands: ' + str([format_cards(hand) for hand in self.round_state.hands])  + '\nBounties: ' + str([RANKS[bounty] for bounty in self.round_state.bounties])  + '\nCommunity: ' + str(format_cards(self.round_state.deck)) + "\n_____________"
 
 # if __name__ == '__main__':
 #     set_cards = ['As', 'Ks', 'Qs', 'Js', 'Ts', '2d', '2c']
@@ -0,0 +1,126 @@
+from skeleton.actions import FoldAction, RaiseAction
+
+'''
+Opponent model built from exponentially decayed sufficient statistics
+'''
+
+STREETS = [0, 3, 4, 5]
+DECAY = 0.98 # weight kept by old observations per new one (~50 observation memory)
+SHOWDOWN_MIN_STRENGTH = 0.5 # weaker showdown hands tell us nothing about raising thresholds
+
+class DecayedMean():
+    '''
+    Running mean where each observation scales the weight of the previous ones by decay.
+
+    @param prior Value returned before anything is observed
+    @param prior_weight How many observations the prior is worth
+    '''
+
+    def __init__(self, prior, prior_weight=1.0, decay=DECAY):
+        self.decay = decay
+        self.total = prior * prior_weight
+        self.weight = prior_weight
+
+    def update(self, value):
+        self.total = self.decay * self.total + value
+        self.weight = self.decay * self.weight + 1.0
+
+    def mean(self):
+        return self.total / self.weight
+
+class OpponentModel():
+    '''
+    Tracks how the opponent plays. Every observation is an O(1) update and every query is
+    a division, so it is cheap enough to consult on every get_action.
+
+    Lines are strings with one character per street: 'R' if the opponent bet or raised on
+    that street, '.' otherwise (e.g. 'R.R.' = raised preflop and on the turn).
+
+    @param min_threshold Prior for the opponent's raising threshold
+    '''
+
+    def __init__(self, min_threshold):
+        self.fold_to_raise = {street: DecayedMean(0.3) for street in STREETS}
+        self.aggression = {street: DecayedMean(0.25) for street in STREETS}
+        self.all_in = DecayedMean(0.0)
+        self.threshold = DecayedMean(min_threshold)
+        self.showdown_strength = {} # line -> DecayedMean of revealed hole strengths
+        self.bounty_aggression = {True: DecayedMean(0.25), False: DecayedMean(0.25)}
+
+        self.hand_raises = [False] * len(STREETS)
+        self.hand_all_in = False
+
+    def start_hand(self):
+        self.hand_raises = [False] * len(STREETS)
+        self.hand_all_in = False
+
+    def observe_action(self, round_state, action, opp):
+        '''
+        Called with every opponent action before it is applied to round_state
+
+        @param round_state RoundState the opponent acted in
+        @param action Action the opponent took
+        @param opp Opponent's player index
+        '''
+        street = round_state.street
+        continue_cost = round_state.pips[1-opp] - round_state.pips[opp]
+        opening_blind = street == 0 and round_state.button == 0
+        if continue_cost > 0 and not opening_blind:
+            self.fold_to_raise[street].update(isinstance(action, FoldAction))
+        raised = isinstance(action, RaiseAction)
+        self.aggression[street].update(raised)
+        if raised:
+            self.hand_raises[STREETS.index(street)] = True
+            if action.amount == round_state.pips[opp] + round_state.stacks[opp]:
+                self.hand_all_in = True
+
+    def line(self):
+        return ''.join('R' if raised else '.' for raised in self.hand_raises)
+
+    def end_hand(self, showdown_strength=None, bounty_hit=None):
+        '''
+        Called once per hand after the last action
+
+        @param showdown_strength Preflop winrate of the opponent's revealed hole, or None if not shown
+        @param bounty_hit Whether the opponent hit their bounty, or None if it was masked
+        '''
+        self.all_in.update(self.hand_all_in)
+        if showdown_strength is not None:
+            line = self.line()
+            if line not in self.showdown_strength:
+                self.showdown_strength[line] = DecayedMean(showdown_strength)
+            else:
+                self.showdown_strength[line].update(showdown_strength)
+            if showdown_strength > SHOWDOWN_MIN_STRENGTH:
+                self.threshold.update(showdown_strength)
+        if bounty_hit is not None:
+            self.bounty_aggression[bounty_hit].update(any(self.hand_raises))
+
+    def fold_to_raise_rate(self, street):
+        return self.fold_to_raise[street].mean()
+
+    def aggression_rate(self, street):
+        return self.aggression[street].mean()
+
+    def all_in_rate(self):
+        '''
+        Decayed fraction of hands in which the opponent shoved
+        '''
+        return self.all_in.mean()
+
+    def raise_threshold(self):
+        '''
+        Decayed mean of the opponent's showdown hole strengths, i.e. how strong they tend to be when they continue
+        '''
+        return self.threshold.mean()
+
+    def line_strength(self, line):
+        '''
+        Decayed mean hole strength shown down after the given line, or the overall threshold if never seen
+        '''
+        if line in self.showdown_strength:
+            return self.showdown_strength[line].mean()
+        return self.raise_threshold()
+
+    def bounty_aggression_rate(self, bounty_hit):
+        return self.bounty_aggression[bounty_hit].mean()
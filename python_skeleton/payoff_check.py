@@ -0,0 +1,87 @@
+from history import History
+from betting_tree import abstract_tree, TERMINAL, FOLD
+from best_response import Deals, BestResponse
+from rng import RngStream
+
+import argparse
+import sys
+
+'''
+Checks the fold payoffs CFR trains on (History.get_utility) and the best response evaluator
+uses (BestResponse.terminal_utility) for both start players, since the RoundState History
+walks swaps its seats preflop when start_player is 1. Run it from the repository root:
+
+    python3 python_skeleton/payoff_check.py
+'''
+
+DEFAULT_DEALS = 200
+DEFAULT_SEED = 2025
+
+class AlwaysFold():
+    '''
+    Strategy table that folds whenever it can (the evaluator falls back to uniform over the
+    legal actions when it can't)
+    '''
+
+    def get(self, information_set, default=None):
+        return [1.0] + [0.0] * (len(default) - 1)
+
+def fold_terminals(tree):
+    return [node for node in range(tree.num_nodes) if tree.node_type[node] == TERMINAL and tree.terminal[node] == FOLD]
+
+def replay(start_player, tree, node, rng):
+    '''
+    Returns:
+        History of a random deal at node, reached by replaying the actions from the root
+    '''
+    path = []
+    while tree.parent[node] >= 0:
+        path.append(node)
+        node = tree.parent[node]
+    history = History.generate_initial_node(start_player, rng=rng, tree=tree)
+    for node in reversed(path):
+        if history.get_node_type() == 'C':
+            history = history.generate_chance_outcome()
+        else:
+            folder = history.get_active_player()
+            history = history.generate_action_outcome(tree.parent_action[node])
+    return history, folder
+
+def check(num_deals=DEFAULT_DEALS, seed=DEFAULT_SEED):
+    '''
+    Returns:
+        list of failure messages, empty if every fold pays the player who did not fold
+    '''
+    failures = []
+    rng = RngStream(seed)
+    for start_player in range(2):
+        tree = abstract_tree(start_player)
+        for node in fold_terminals(tree):
+            history, folder = replay(start_player, tree, node, rng)
+            if history.get_utility(folder) >= 0:
+                failures.append(f'start player {start_player}: History pays the folder at node {node}')
+                break
+
+        # against a table that folds whenever it can, both best responses win chips
+        deals = Deals(num_deals, RngStream(seed).child(start_player))
+        for player in range(2):
+            response = BestResponse(AlwaysFold(), deals, start_player, player)
+            folds = [node for node in fold_terminals(tree) if tree.player[tree.parent[node]] != player]
+            if any((response.terminal_utility(node) <= 0).any() for node in folds):
+                failures.append(f'start player {start_player}: the evaluator pays player {1-player} for folding')
+            value = response.value()
+            if value <= 0:
+                failures.append(f'start player {start_player}: best response of player {player} to always folding is {value:.2f} chips')
+    return failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 python_skeleton/payoff_check.py')
+    parser.add_argument('--deals', type=int, default=DEFAULT_DEALS, help='Deals the best responses are evaluated on')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Root seed of the deals')
+    args = parser.parse_args()
+
+    failures = check(args.deals, args.seed)
+    for failure in failures:
+        print(failure)
+    print('Fold payoffs OK.' if not failures else f'{len(failures)} fold payoff checks failed.')
+    sys.exit(1 if failures else 0)
@@ -6,16 +6,23 @@ from skeleton.states import GameState, TerminalState, RoundState
 from skeleton.states import NUM_ROUNDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from skeleton.bot import Bot
 from skeleton.runner import parse_args, run_bot
+from skeleton.cards import RANKS, card_rank
 
-from calculate_winrates import *
-from buckets import *
-from history import RAISES, NUM_ACTIONS, BOUNTY_CONSTANT, BOUNTY_RATIO
-from cfr import CFR_Trainer
+from calculate_winrates import monte_carlo_until
+from buckets import get_bucket
+from history import RAISES, NUM_ACTIONS, BOUNTY_CONSTANT, BOUNTY_RATIO, cached_hole_winrates
+from tables import cached_strategy
 from information_set import InformationSet
+from time_budget import TimeBudget
+from ranges import OpponentRange, hole_winrate
+from hand_eval import evaluate, hand_type as get_hand_type
+from opponent_model import OpponentModel
+from resolver import Resolver, to_action
+from rng import RngStream
 
 import random
 import math
-import eval7
+import time
 
 
 class Player(Bot):
@@ -25,7 +32,8 @@ class Player(Bot):
 
     def __init__(self):
         '''
-        Called when a new game starts. Called exactly once.
+        Called when a new game starts. Called once per game (a persistent bot is created again
+        in the same process for every game).
 
         Arguments:
         Nothing.
@@ -33,12 +41,14 @@ class Player(Bot):
         Returns:
         Nothing.
         '''
-        self.hole_winrates = load_hole_winrates("hole_winrates.csv") # returns a dictionary with frozensets as keys
-        self.strategy = CFR_Trainer.load_from_csv('strategy.csv')
+        self.rng = RngStream() # one stream for every random choice the bot makes, so a game can be replayed from its seed
+        print(f"Random seed: {self.rng.entropy}")
+        # tables are loaded once per process and shared by the bots of later games (persistent mode)
+        self.hole_winrates = cached_hole_winrates("hole_winrates.csv") # returns a dictionary with frozensets as keys
+        self.strategy = cached_strategy('strategy.npz') # 8-bit copy of strategy.csv
         self.post_turn_win_probability = 0
         self.won = False
         self.cheese = False
-        self.all_in_counter = 0
         self.opp_auction_amt = []
         self.opp_auction_amt_logging = []
         self.win_prob_wo_auction = 0
@@ -52,7 +62,11 @@ class Player(Bot):
 
         self.games_won = 0
         self.MIN_HOLE_THRESHOLD = 0.68
-        self.opp_hole_thresholds = [self.MIN_HOLE_THRESHOLD]
+        self.opponent = OpponentModel(self.MIN_HOLE_THRESHOLD)
+        self.MIN_RESOLVE_BUDGET = 0.02 # sec; below this the turn/river fall back to the thresholds
+        self.TURN_EQUITY_SHARE = 0.2 # share of a turn decision's budget spent on the monte carlo equity
+        self.time_budget = TimeBudget(NUM_ROUNDS)
+        self.opp_range = OpponentRange(self.hole_winrates)
 
     def handle_new_round(self, game_state, round_state, active):
         '''
@@ -75,8 +89,12 @@ class Player(Bot):
         print("\n=============\nnew round")
         print(f"Round Number: {round_num}")
         print(f"Game Clock: {game_clock}")
-        print(f"Bounty Rank: {my_bounty}")
-        
+        print(f"Bounty Rank: {RANKS[my_bounty]}")
+        self.time_budget.start_round(game_clock)
+        self.opp_range.reset()
+        self.opp_range.remove_cards(my_cards)
+        self.opponent.start_hand()
+
         if my_bankroll > 3.6 * (1000 - round_num):
             self.won = True
         # elif my_bankroll > 0.75 * (1000 - round_num):
@@ -109,35 +127,114 @@ class Player(Bot):
         opponent_bounty_rank = previous_state.bounties[1-active]  # attempting to grab opponent's bounty rank
 
         print("DID WIN:", my_delta > 0)
-        print("OPP THRESHOLD:", self.opp_hole_thresholds)
+        print("OPP THRESHOLD:", self.opponent.raise_threshold())
 
         if my_delta > 0:
             self.games_won += 1 # not gonna deal with complications of ties/bounty hit tie etc.
         
         # gauging opponents action thresholds
+        opp_hole_strength = None
         if len(opp_cards) != 0:
+            opp_hole_strength = hole_winrate(self.hole_winrates, opp_cards)
 
-            rank_1 = opp_cards[0][0]
-            rank_2 = opp_cards[1][0]
-            suited = '1' if opp_cards[0][1] == opp_cards[1][1] else '0'
-
-            if rank_1 + rank_2 + suited in self.hole_winrates:
-                opp_hole_strength = self.hole_winrates[rank_1 + rank_2 + suited]
-            else:
-                opp_hole_strength = self.hole_winrates[rank_2 + rank_1 + suited]
-
-            if opp_hole_strength > 0.5:
-                self.opp_hole_thresholds.append(opp_hole_strength)
-                
-                if len(self.opp_hole_thresholds) > 50:
-                    self.opp_hole_thresholds.pop(0)
-            
-                print("NEW OPP THRESHOLD:", sum(self.opp_hole_thresholds) / len(self.opp_hole_thresholds))
+        # the opponent's bounty hit is masked unless they won or split the pot
+        self.opponent.end_hand(opp_hole_strength, opponent_bounty_hit if my_delta <= 0 else None)
+        print("NEW OPP THRESHOLD:", self.opponent.raise_threshold())
 
         if my_bounty_hit:
-            print("I hit my bounty of " + bounty_rank + "!")
+            print("I hit my bounty of " + RANKS[bounty_rank] + "!")
         if opponent_bounty_hit:
-            print("Opponent hit their bounty of " + opponent_bounty_rank + "!")
+            print("Opponent hit their bounty!")
+
+    def handle_action(self, game_state, round_state, action, actor, active):
+        '''
+        Called for every action in the round history, before it is applied to round_state.
+
+        Arguments:
+        game_state: the GameState object.
+        round_state: the RoundState object the action was taken in.
+        action: the action taken.
+        actor: index of the player who took the action.
+        active: your player's index.
+
+        Returns:
+        Nothing.
+        '''
+        if actor != active:
+            self.opponent.observe_action(round_state, action, actor)
+            self.observe_opponent_range(round_state, action, actor)
+
+    def observe_opponent_range(self, round_state, action, actor):
+        '''
+        Narrows the opponent's range after each of their bets, raises and calls.
+
+        Arguments:
+        round_state: the RoundState object the action was taken in.
+        action: the opponent's action.
+        actor: the opponent's index.
+
+        Returns:
+        Nothing.
+        '''
+        if isinstance(action, RaiseAction):
+            continue_cost = action.amount - round_state.pips[1-actor]  # what the bet asks us to put in
+            pot = 2 * STARTING_STACK - sum(round_state.stacks) + action.amount - round_state.pips[actor]
+            self.opp_range.observe_raise(self.opponent.raise_threshold(), continue_cost / max(pot - continue_cost, 1))
+        elif isinstance(action, CallAction):
+            self.opp_range.observe_call(self.opponent.raise_threshold())
+
+    def estimate_win_probability(self, game_state, visible_cards, budget=None):
+        '''
+        Runs monte carlo for as long as the time budget allows (or until the estimate is precise enough).
+
+        Arguments:
+        game_state: the GameState object.
+        visible_cards: your hole cards + the board cards.
+        budget: seconds to spend, or None to allocate a decision's budget from the game clock.
+
+        Returns:
+        Estimated win probability.
+        '''
+        if budget is None:
+            budget = self.time_budget.allocate(game_state.game_clock, game_state.round_num)
+        start_time = time.perf_counter()
+        win_probability, iters = monte_carlo_until(visible_cards, budget, opp_range=self.opp_range, rng=self.rng)
+        self.time_budget.record(time.perf_counter() - start_time)
+        print(f"Ran {iters} sims in budget of {budget:.4f}s")
+        return win_probability
+
+    def resolve(self, game_state, round_state, active, budget=None):
+        '''
+        Re-solves the rest of the current street against the opponent's range and samples an action from the solution.
+
+        Arguments:
+        game_state: the GameState object.
+        round_state: the RoundState object.
+        active: your player's index.
+        budget: seconds to spend, or None to allocate a decision's budget from the game clock.
+
+        Returns:
+        Your action, or None if there is not enough time left to re-solve.
+        '''
+        if budget is None:
+            budget = self.time_budget.allocate(game_state.game_clock, game_state.round_num)
+        if budget < self.MIN_RESOLVE_BUDGET:
+            return None
+        start_time = time.perf_counter()
+        ranges = [None, None]
+        ranges[active] = [1.0] * len(self.opp_range.weights) # we don't model how the opponent sees our range
+        ranges[1-active] = self.opp_range.weights
+        resolver = Resolver(round_state, ranges, self.rng)
+        strategy = resolver.solve(budget - (time.perf_counter() - start_time))
+        if strategy is None:
+            self.time_budget.record(time.perf_counter() - start_time)
+            print(f"Re-solving {resolver.tree.num_nodes} nodes does not fit in {budget:.4f}s")
+            return None
+        probabilities = strategy[:, resolver.bucket_of(active, round_state.hands[active])]
+        action_index = self.rng.choices(range(len(probabilities)), weights=probabilities, k=1)[0]
+        self.time_budget.record(time.perf_counter() - start_time)
+        print(f"Re-solved {resolver.tree.num_nodes} nodes for {resolver.iters} iterations: {[round(float(p), 2) for p in probabilities]}")
+        return to_action(round_state, action_index)
 
     def get_action(self, game_state, round_state, active):
         '''
@@ -167,7 +264,7 @@ class Player(Bot):
 
         pot = my_contribution + opp_contribution
 
-        opp_all_in_pct = self.all_in_counter / game_state.round_num
+        opp_all_in_pct = self.opponent.all_in_rate()
         min_raise, max_raise = round_state.raise_bounds()
 
         #print("All in pct: ", opp_all_in_pct)
@@ -177,15 +274,17 @@ class Player(Bot):
                 return FoldAction()
             return CheckAction()
 
+        # the opponent's actions already narrowed their range (handle_action); the board rules out more combos
+        self.opp_range.remove_cards(board_cards)
+
         # determine current state
         card_bucket = get_bucket(my_cards + board_cards, my_bounty, self.hole_winrates)
         info_set = InformationSet(card_bucket, my_stack, opp_stack)
         hashable_info_set = str(info_set)
 
         # calculate hand type
-        hand = [eval7.Card(card) for card in my_cards + board_cards]
-        hand_type = eval7.handtype(eval7.evaluate(hand))
-        hit_bounty = 1 if my_bounty in [card[0] for card in my_cards + board_cards] else 0
+        hand_type = get_hand_type(evaluate(my_cards + board_cards))
+        hit_bounty = 1 if my_bounty in [card_rank(card) for card in my_cards + board_cards] else 0
 
         # strategy = [0] * (NUM_ACTIONS)
         # if hashable_info_set in self.strategy:
@@ -230,17 +329,10 @@ class Player(Bot):
             print("Preflop")
 
             # Lookup strength of hole cards from pre-calculated dictionary
-            rank_1 = my_cards[0][0]
-            rank_2 = my_cards[1][0]
-            suited = '1' if my_cards[0][1] == my_cards[1][1] else '0'
-
-            if rank_1 + rank_2 + suited in self.hole_winrates:
-                self.hole_strength = self.hole_winrates[rank_1 + rank_2 + suited]
-            else:
-                self.hole_strength = self.hole_winrates[rank_2 + rank_1 + suited]
+            self.hole_strength = hole_winrate(self.hole_winrates, my_cards)
             
             print("Initial strength of hand: ", self.hole_strength)
-            if my_cards[0][0] == my_cards[1][0]:
+            if card_rank(my_cards[0]) == card_rank(my_cards[1]):
                 hole_pair = True
             else:
                 hole_pair = False
@@ -249,7 +341,7 @@ class Player(Bot):
             self.cheese = False
             max_preflop_bet = int((my_stack + my_pip) * .2 * self.hole_strength)
 
-            HOLE_STRENGTH_THRESH = max(self.MIN_HOLE_THRESHOLD, sum(self.opp_hole_thresholds) / len(self.opp_hole_thresholds))
+            HOLE_STRENGTH_THRESH = max(self.MIN_HOLE_THRESHOLD, self.opponent.raise_threshold())
             # if self.aggro_playing:
             #     HOLE_STRENGTH_THRESH = 0.69
             
@@ -299,7 +391,7 @@ class Player(Bot):
                         self.preflop_action = CallAction
                         return CallAction()
                     elif ((opp_all_in_pct > 0.6) 
-                          and (self.hole_strength > 0 or (my_cards[0][0] in 'AKQJT98' and my_cards[1][0] in 'AKQJT98') or (my_cards[0][0] in 'AKQJ' or my_cards[1][0] in 'AKQJ')) 
+                          and (self.hole_strength > 0 or (RANKS[card_rank(my_cards[0])] in 'AKQJT98' and RANKS[card_rank(my_cards[1])] in 'AKQJT98') or (RANKS[card_rank(my_cards[0])] in 'AKQJ' or RANKS[card_rank(my_cards[1])] in 'AKQJ')) 
                           and (CallAction in legal_actions)):
                         self.preflop_action = CallAction
                         return CallAction()
@@ -313,8 +405,7 @@ class Player(Bot):
             print("Flop")
 
             # run monte carlo to estimate win rate based on hole cards and flop
-            sim_iterations = 200
-            win_probability = monte_carlo(my_cards + board_cards, sim_iterations)
+            win_probability = self.estimate_win_probability(game_state, my_cards + board_cards)
 
             print("Win probability: ", win_probability)
 
@@ -331,12 +422,22 @@ class Player(Bot):
         elif street == 4:
             print("Turn")
 
-            sim_iterations = 250
-            win_probability = monte_carlo(my_cards + board_cards, sim_iterations)
+            # one budget per decision: the re-solve gets most of it, and monte carlo a slice for the river fallback
+            budget = self.time_budget.allocate(game_state.game_clock, game_state.round_num)
+            resolve_budget = budget * (1 - self.TURN_EQUITY_SHARE)
+            if resolve_budget < self.MIN_RESOLVE_BUDGET:
+                resolve_budget = 0.0
+            start_time = time.perf_counter()
+            win_probability = self.estimate_win_probability(game_state, my_cards + board_cards, budget - resolve_budget)
             self.post_turn_win_probability = win_probability
 
             print("Win probability: ", win_probability)
 
+            if resolve_budget > 0:
+                action = self.resolve(game_state, round_state, active, budget - (time.perf_counter() - start_time))
+                if action is not None:
+                    return action
+
             THRESHOLD_1 = (0.84, 0.77)
             THRESHOLD_2 = (0.66, 0.60)
 
@@ -353,6 +454,10 @@ class Player(Bot):
             win_probability = self.post_turn_win_probability
             print("Win probability: ", win_probability)
 
+            action = self.resolve(game_state, round_state, active)
+            if action is not None:
+                return action
+
             THRESHOLD_1 = (0.84, 0.77)
             THRESHOLD_2 = (0.66, 0.60)
 
@@ -0,0 +1,177 @@
+from skeleton.states import RoundState
+from history import NUM_ACTIONS
+from skeleton.cards import NUM_CARDS, NO_RANK, RANKS, parse_cards
+from ranges import NUM_COMBOS, CARD_COMBOS, hole_combo_index
+from resolver import SubgameTree, FOLD, SHOWDOWN
+from terminal_utility import ShowdownIndex, combo_ranks, bounty_hit_probs, showdown_utility, fold_utility
+
+import random
+import time
+import numpy as np
+from tqdm import tqdm
+
+'''
+Public tree CFR: every node of the public betting tree holds range vectors over all 1326
+combos for both players, so one traversal updates every hand at once. Board cards that
+are not known yet are dealt by public chance sampling (one sample per chance node visit).
+'''
+
+MAX_CACHED_BOARDS = 2048
+
+class PublicTreeCFR():
+    '''
+    CFR+ on the public tree rooted at a RoundState, with range vectors for both players.
+
+    @param round_state RoundState to solve from (board cards in round_state.deck)
+    @param ranges Combo weights (length 1326) for player 0 and player 1
+    @param last_street Last street whose betting is modelled (later streets are checked down)
+    @param rng RngStream to deal future board cards from, the global random module if None
+
+    Terminal payoffs include bounties: each player's bounty comes from round_state.bounties,
+    and a hidden bounty (NO_RANK) is treated as uniform over the 13 ranks.
+    '''
+
+    def __init__(self, round_state, ranges, last_street=5, rng=None):
+        self.rng = rng if rng is not None else random
+        self.tree = SubgameTree(round_state, last_street)
+        self.board = tuple(round_state.deck[:round_state.street])
+        self.ranges = [np.array(r, dtype=float) * self.live_mask(self.board) for r in ranges]
+        self.regrets = {} # (node, board) -> (NUM_ACTIONS, NUM_COMBOS)
+        self.cumulative_strategy = {}
+        self.bounties = round_state.bounties
+        self.terminal_cache = {} # board -> (ShowdownIndex or None, bounty hit probs of both players)
+        self.iters = 0
+        self.legal = self.tree.legal[:, :, None]
+
+    @staticmethod
+    def live_mask(board):
+        mask = np.ones(NUM_COMBOS)
+        for card in board:
+            mask[CARD_COMBOS[card]] = 0.0
+        return mask
+
+    def deal(self, board, num_cards):
+        remaining = [card for card in range(NUM_CARDS) if card not in board]
+        return board + tuple(self.rng.sample(remaining, num_cards))
+
+    def terminal_data(self, board):
+        '''
+        Returns:
+            (ShowdownIndex, bounty hit probs of both players) for the board, where the
+            index is None for boards with fewer than 5 cards (fold terminals only)
+        '''
+        if board not in self.terminal_cache:
+            if len(self.terminal_cache) >= MAX_CACHED_BOARDS:
+                self.terminal_cache.clear()
+            index = ShowdownIndex(combo_ranks(board)) if len(board) == 5 else None
+            hits = [bounty_hit_probs(board, bounty) for bounty in self.bounties]
+            self.terminal_cache[board] = (index, hits)
+        return self.terminal_cache[board]
+
+    def current_strategy(self, key):
+        regrets = self.regrets[key]
+        totals = regrets.sum(axis=0, keepdims=True)
+        node = key[0]
+        uniform = self.legal[node] / self.legal[node].sum()
+        return np.where(totals > 0, regrets / np.where(totals > 0, totals, 1.0), uniform)
+
+    def traverse(self, node, board, reach, player):
+        '''
+        Returns:
+            counterfactual value of every combo of player at node
+        '''
+        tree = self.tree
+        if tree.deals[node]:
+            board = self.deal(board, tree.deals[node])
+            mask = self.live_mask(board[-tree.deals[node]:])
+            reach = (reach[0] * mask, reach[1] * mask)
+
+        opp_reach = reach[1-player]
+        if tree.terminal[node] == FOLD:
+            _, hits = self.terminal_data(board)
+            return fold_utility(tree.contributions[node], tree.folder[node], player, opp_reach,
+                                hits[player], hits[1-player], self.live_mask(board))
+        if tree.terminal[node] == SHOWDOWN:
+            if len(board) < 5:
+                board = self.deal(board, 5 - len(board))
+                mask = self.live_mask(board)
+                opp_reach = opp_reach * mask
+            index, hits = self.terminal_data(board)
+            return showdown_utility(index, tree.contributions[node, player], opp_reach, hits[player], hits[1-player])
+
+        key = (node, board)
+        if key not in self.regrets:
+            self.regrets[key] = np.zeros((NUM_ACTIONS, NUM_COMBOS))
+            self.cumulative_strategy[key] = np.zeros((NUM_ACTIONS, NUM_COMBOS))
+        strategy = self.current_strategy(key)
+        actor = tree.player[node]
+        actions = np.flatnonzero(tree.legal[node])
+
+        values = np.zeros(NUM_COMBOS)
+        if actor == player:
+            action_values = np.zeros((NUM_ACTIONS, NUM_COMBOS))
+            for action in actions:
+                child_reach = list(reach)
+                child_reach[actor] = reach[actor] * strategy[action]
+                action_values[action] = self.traverse(tree.children[node, action], board, child_reach, player)
+                values += strategy[action] * action_values[action]
+            regrets = self.regrets[key]
+            regrets[actions] = np.maximum(regrets[actions] + action_values[actions] - values, 0.0)
+            self.cumulative_strategy[key] += self.iters * reach[actor] * strategy
+        else:
+            for action in actions:
+                child_reach = list(reach)
+                child_reach[actor] = reach[actor] * strategy[action]
+                values += self.traverse(tree.children[node, action], board, child_reach, player)
+        return values
+
+    def iterate(self):
+        '''
+        One CFR+ iteration (alternating updates)
+        '''
+        self.iters += 1
+        for player in range(2):
+            self.traverse(0, self.board, (self.ranges[0], self.ranges[1]), player)
+
+    def solve(self, iters=None, time_budget=None, progress=False):
+        '''
+        Runs CFR+ for iters iterations or until time_budget seconds pass (at least one iteration)
+
+        Returns:
+            average strategy at the root, shape (NUM_ACTIONS, NUM_COMBOS)
+        '''
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        with tqdm(total=iters, desc='Training', unit='iteration', disable=not progress) as pbar:
+            while True:
+                self.iterate()
+                pbar.update(1)
+                if iters is not None and self.iters >= iters:
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+        return self.average_strategy(0, self.board)
+
+    def average_strategy(self, node, board):
+        key = (node, board)
+        uniform = self.legal[node] / self.legal[node].sum()
+        if key not in self.cumulative_strategy:
+            return np.repeat(uniform, NUM_COMBOS, axis=1)
+        cumulative = self.cumulative_strategy[key]
+        totals = cumulative.sum(axis=0, keepdims=True)
+        return np.where(totals > 0, cumulative / np.where(totals > 0, totals, 1.0), uniform)
+
+    def get_equilibrium_strategy(self):
+        '''
+        Returns:
+            average strategy of every visited (node, board) in the form of a dict
+            with value = (NUM_ACTIONS, NUM_COMBOS) array of action weights per combo
+        '''
+        return {key: self.average_strategy(*key) for key in self.cumulative_strategy}
+
+if __name__ == '__main__':
+    board = parse_cards(['2c', '7d', 'Ks', '9h', 'Td'])
+    hole = parse_cards(['Ah', 'Kd'])
+    round_state = RoundState(1, 5, [0, 0], [360, 360], [hole, []], [RANKS.index('A'), NO_RANK], board, None)
+    solver = PublicTreeCFR(round_state, [np.ones(NUM_COMBOS), np.ones(NUM_COMBOS)])
+    strategy = solver.solve(iters=200, progress=True)
+    print('AhKd at the root:', strategy[:, hole_combo_index(hole)])
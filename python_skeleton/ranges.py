@@ -0,0 +1,130 @@
+from skeleton.cards import NUM_CARDS, RANKS, card_rank, card_suit
+
+import math
+import random
+from itertools import combinations
+
+'''
+Weighted opponent ranges over all 1326 hole card combos
+'''
+
+COMBOS = list(combinations(range(NUM_CARDS), 2)) # combo index -> (card, card)
+NUM_COMBOS = len(COMBOS) # 1326
+COMBO_INDEX = {combo: combo_index for combo_index, combo in enumerate(COMBOS)}
+
+# combo removal masks: card index -> indices of the 51 combos that contain that card
+CARD_COMBOS = [[] for _ in range(NUM_CARDS)]
+for combo_index, (a, b) in enumerate(COMBOS):
+    CARD_COMBOS[a].append(combo_index)
+    CARD_COMBOS[b].append(combo_index)
+
+BLUFF_FLOOR = 0.05 # likelihood of any hand taking an action, so nothing is ever ruled out
+RAISE_WIDTH = 0.05 # softness of the raise threshold
+CALL_OFFSET = 0.08 # calls come from a wider range than raises
+
+def hole_combo_index(hole):
+    '''
+    Returns:
+        index of the 2 hole cards (ints, any order) in COMBOS
+    '''
+    a, b = hole
+    return COMBO_INDEX[(a, b) if a < b else (b, a)]
+
+def hole_winrate(hole_winrates, hole):
+    """
+    Args:
+        hole_winrates: dictionary of hole winrates from csv
+        hole: 2 hole cards as ints
+
+    Returns:
+        preflop winrate of the hole
+    """
+    rank_1 = RANKS[card_rank(hole[0])]
+    rank_2 = RANKS[card_rank(hole[1])]
+    suited = '1' if card_suit(hole[0]) == card_suit(hole[1]) else '0'
+    if rank_1 + rank_2 + suited in hole_winrates:
+        return hole_winrates[rank_1 + rank_2 + suited]
+    return hole_winrates[rank_2 + rank_1 + suited]
+
+def combo_strengths(hole_winrates):
+    """
+    Args:
+        hole_winrates: dictionary of hole winrates from csv
+
+    Returns:
+        list of preflop winrates indexed by combo
+    """
+    return [hole_winrate(hole_winrates, combo) for combo in COMBOS]
+
+class OpponentRange():
+    '''
+    Weights for every opponent hole combo, updated in place as cards are revealed and
+    the opponent acts.
+
+    @param hole_winrates Dictionary of hole winrates, used as the strength of each combo
+    '''
+
+    def __init__(self, hole_winrates):
+        self.strengths = combo_strengths(hole_winrates)
+        self.weights = [1.0] * NUM_COMBOS
+        self.removed = set() # card indices whose combos are zeroed
+        self.cum_weights = None # rebuilt lazily after an update
+
+    def reset(self):
+        '''
+        Back to the uniform range at the start of a round
+        '''
+        self.weights = [1.0] * NUM_COMBOS
+        self.removed = set()
+        self.cum_weights = None
+
+    def remove_cards(self, cards):
+        '''
+        Zeroes every combo that uses one of the cards (ours or the board's)
+
+        @param cards List of cards as ints
+        '''
+        for card in cards:
+            if card in self.removed:
+                continue
+            self.removed.add(card)
+            for combo_index in CARD_COMBOS[card]:
+                self.weights[combo_index] = 0.0
+            self.cum_weights = None
+
+    def likelihood(self, strength, threshold):
+        return BLUFF_FLOOR + (1 - BLUFF_FLOOR) / (1 + math.exp((threshold - strength) / RAISE_WIDTH))
+
+    def observe_raise(self, threshold, size=1.0):
+        '''
+        Reweights combos by how likely they are to bet or raise
+
+        @param threshold Hole strength around which the opponent starts raising
+        @param size Raise size as a fraction of the pot; larger raises shift the range further
+        '''
+        threshold += 0.05 * min(size, 2.0)
+        for combo_index, weight in enumerate(self.weights):
+            if weight:
+                self.weights[combo_index] = weight * self.likelihood(self.strengths[combo_index], threshold)
+        self.cum_weights = None
+
+    def observe_call(self, threshold):
+        '''
+        Reweights combos by how likely they are to call
+        '''
+        self.observe_raise(threshold - CALL_OFFSET, 0.0)
+
+    def sample(self, k, rng=None):
+        '''
+        @param rng RngStream to draw from, the global random module if None
+
+        Returns:
+            list of k combo indices drawn in proportion to their weights
+        '''
+        if self.cum_weights is None:
+            total = 0.0
+            self.cum_weights = []
+            for weight in self.weights:
+                total += weight
+                self.cum_weights.append(total)
+        return (rng if rng is not None else random).choices(range(NUM_COMBOS), cum_weights=self.cum_weights, k=k)
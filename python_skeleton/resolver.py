@@ -0,0 +1,376 @@
+from skeleton.actions import FoldAction, CallAction, CheckAction, RaiseAction
+from skeleton.states import TerminalState, STARTING_STACK
+from history import RAISES, NUM_ACTIONS
+from skeleton.cards import NUM_CARDS, card_mask
+from ranges import COMBOS, hole_combo_index
+from hand_eval import evaluate_batch
+from terminal_utility import ShowdownIndex, combo_ranks, blocker_sums, showdown_kernel
+
+import random
+import time
+import numpy as np
+
+'''
+Depth-limited real-time re-solving of the turn/river subgame with vectorized CFR+
+'''
+
+NUM_BUCKETS = 16 # private states per player; every combo in a bucket plays the same strategy
+TURN_RIVER_SAMPLES = 4 # river cards sampled to value turn leaves
+MIN_ITERS = 20
+
+# terminal types
+NOT_TERMINAL = 0
+FOLD = 1
+SHOWDOWN = 2 # river showdown, or the end of the turn betting (depth limit, valued as a check-down)
+
+COMBO_ARRAY = np.array(COMBOS)
+COMBO_MASKS = np.array([(1 << a) | (1 << b) for a, b in COMBOS], dtype=np.uint64)
+
+def abstract_actions(round_state):
+    '''
+    Legal History action indices (0 fold, 1 call, 2 check, 3 all in, 4+ RAISES) in round_state.
+    Folding is dropped when checking is free since it is dominated.
+    '''
+    legal_actions = round_state.legal_actions()
+    actions = []
+    if FoldAction in legal_actions and CheckAction not in legal_actions:
+        actions.append(0)
+    if CallAction in legal_actions:
+        actions.append(1)
+    if CheckAction in legal_actions:
+        actions.append(2)
+    if RaiseAction in legal_actions:
+        min_raise, max_raise = round_state.raise_bounds()
+        actions.append(3)
+        for i, bet in enumerate(RAISES):
+            if min_raise < bet and max_raise > bet:
+                actions.append(4 + i)
+    return actions
+
+def to_action(round_state, action_index):
+    '''
+    Converts a History action index into the engine action for round_state
+    '''
+    if action_index == 0:
+        return FoldAction()
+    if action_index == 1:
+        return CallAction()
+    if action_index == 2:
+        return CheckAction()
+    if action_index == 3:
+        return RaiseAction(round_state.raise_bounds()[1])
+    return RaiseAction(RAISES[action_index - 4])
+
+class SubgameTree():
+    '''
+    Betting tree from a RoundState, stored as flat arrays in breadth first order
+    (so parents always come before their children).
+
+    @param round_state RoundState to build the tree from (its active player acts at the root)
+    @param last_street Last street whose betting is included. Defaults to the current street,
+        in which case the end of the street is a SHOWDOWN leaf. Later streets start at nodes
+        with deals > 0 (the number of board cards dealt on the way into the node)
+    '''
+
+    def __init__(self, round_state, last_street=None):
+        if last_street is None:
+            last_street = round_state.street
+        player = []
+        parent = []
+        parent_action = []
+        depth = []
+        terminal = []
+        folder = []
+        contributions = []
+        children = []
+        street = []
+        deals = []
+
+        states = [round_state]
+        player.append(round_state.button % 2)
+        parent.append(-1)
+        parent_action.append(-1)
+        depth.append(0)
+        terminal.append(NOT_TERMINAL)
+        folder.append(-1)
+        contributions.append([STARTING_STACK - round_state.stacks[0], STARTING_STACK - round_state.stacks[1]])
+        children.append([-1] * NUM_ACTIONS)
+        street.append(round_state.street)
+        deals.append(0)
+
+        node = 0
+        while node < len(states):
+            state = states[node]
+            if terminal[node] == NOT_TERMINAL:
+                for action_index in abstract_actions(state):
+                    child = state.proceed(to_action(state, action_index))
+                    children[node][action_index] = len(states)
+                    states.append(child)
+                    parent.append(node)
+                    parent_action.append(action_index)
+                    depth.append(depth[node] + 1)
+                    children.append([-1] * NUM_ACTIONS)
+                    street.append(street[node])
+                    deals.append(0)
+                    all_in = not isinstance(child, TerminalState) and 0 in child.stacks
+                    if isinstance(child, TerminalState) and child.bounty_hits is not None:
+                        # only folds produce bounty hits in the skeleton's TerminalState
+                        terminal.append(FOLD)
+                        folder.append(player[node])
+                        player.append(-1)
+                        contributions.append(contributions[node])
+                    elif isinstance(child, TerminalState) or (child.street != street[node] and (child.street > last_street or all_in)):
+                        terminal.append(SHOWDOWN)
+                        folder.append(-1)
+                        player.append(-1)
+                        last = child.previous_state if isinstance(child, TerminalState) else child
+                        contributions.append([STARTING_STACK - last.stacks[0], STARTING_STACK - last.stacks[1]])
+                    else:
+                        if child.street != street[node]:
+                            street[-1] = child.street
+                            deals[-1] = child.street - street[node]
+                        terminal.append(NOT_TERMINAL)
+                        folder.append(-1)
+                        player.append(child.button % 2)
+                        contributions.append([STARTING_STACK - child.stacks[0], STARTING_STACK - child.stacks[1]])
+            node += 1
+
+        self.num_nodes = len(states)
+        self.player = np.array(player)
+        self.parent = np.array(parent)
+        self.parent_action = np.array(parent_action)
+        self.depth = np.array(depth)
+        self.terminal = np.array(terminal)
+        self.folder = np.array(folder)
+        self.contributions = np.array(contributions, dtype=float)
+        self.children = np.array(children)
+        self.street = np.array(street)
+        self.deals = np.array(deals)
+        self.legal = self.children >= 0
+        self.levels = [np.flatnonzero(self.depth == d) for d in range(self.depth.max() + 1)]
+
+def combo_scores(live, board, extra=None):
+    '''
+    Returns:
+        eval7 score of every live combo with the board (and extra card), -1 for combos holding the extra card
+    '''
+    cards = list(board)
+    if extra is not None:
+        cards.append(extra)
+    holes = COMBO_ARRAY[live]
+    valid = (holes[:, 0] != extra) & (holes[:, 1] != extra)
+    hands = np.empty((valid.sum(), 2 + len(cards)), dtype=np.int64)
+    hands[:, :2] = holes[valid]
+    hands[:, 2:] = cards
+    scores = np.full(len(live), -1, dtype=np.int64)
+    scores[valid] = evaluate_batch(hands)
+    return scores
+
+def showdown_boards(board, rng=random):
+    '''
+    Returns:
+        the 5 card boards showdowns are valued on: the board itself on the river, and
+        TURN_RIVER_SAMPLES sampled runouts on the turn
+    '''
+    if len(board) == 5:
+        return [list(board)]
+    rivers = rng.sample([card for card in range(NUM_CARDS) if card not in board], TURN_RIVER_SAMPLES)
+    return [list(board) + [river] for river in rivers]
+
+def showdown_strengths(live, board, boards):
+    '''
+    Returns:
+        strength of each live combo used for bucketing: its score on the river, its summed
+        percentile rank over the sampled runouts on the turn
+    '''
+    if len(board) == 5:
+        return combo_scores(live, board).astype(float)
+    strengths = np.zeros(len(live))
+    for runout in boards:
+        scores = combo_scores(live, board, runout[-1])
+        # percentile rank of each combo on this river
+        strengths[np.argsort(scores)] += np.arange(len(live))
+    return strengths
+
+def bucket_matrices(boards, membership):
+    '''
+    Bucket-by-bucket matchup weights, from the O(n) card removal kernels of terminal_utility
+    instead of combo-by-combo matrices
+
+    Args:
+        boards: showdown_boards of the subgame
+        membership: for each player, (1326 combos x NUM_BUCKETS) bucket membership weighted by range
+
+    Returns:
+        (N, S) where N[i, j] is the weight of compatible combo pairs in buckets i and j, and
+        S[i, j] that weight signed by who wins, averaged over the boards
+    '''
+    compatible = np.column_stack([blocker_sums(membership[1][:, j]) for j in range(NUM_BUCKETS)])
+    N = membership[0].T @ compatible
+    S = np.zeros((NUM_BUCKETS, NUM_BUCKETS))
+    for runout in boards:
+        ranks = combo_ranks(runout)
+        index = ShowdownIndex(ranks)
+        dealt = ranks >= 0 # combos holding a sampled river card drop out of that runout
+        signed = np.column_stack([showdown_kernel(index, membership[1][:, j] * dealt) for j in range(NUM_BUCKETS)])
+        S += membership[0].T @ signed
+    return N, S / len(boards)
+
+def bucket_combos(strengths, weights):
+    '''
+    Splits the combos of a range into NUM_BUCKETS buckets of (roughly) equal weight by strength
+
+    Returns:
+        bucket index of every combo
+    '''
+    order = np.argsort(strengths, kind='stable')
+    cumulative = np.cumsum(weights[order])
+    buckets = np.zeros(len(strengths), dtype=np.int64)
+    if cumulative[-1] > 0:
+        buckets[order] = np.minimum((cumulative - weights[order] / 2) / cumulative[-1] * NUM_BUCKETS, NUM_BUCKETS - 1).astype(np.int64)
+    return buckets
+
+class Resolver():
+    '''
+    Solves the rest of the current street with CFR+ over bucketed ranges for both players.
+
+    Utilities are the chips each player ends the round up by (bounties are ignored).
+
+    @param round_state RoundState at our decision
+    @param ranges Combo weights (length 1326) for player 0 and player 1
+    @param rng RngStream to sample turn rivers from, the global random module if None
+    '''
+
+    def __init__(self, round_state, ranges, rng=None):
+        self.tree = SubgameTree(round_state)
+        board = round_state.deck[:round_state.street]
+
+        board_mask = np.uint64(card_mask(board))
+        on_board = (COMBO_MASKS & board_mask) != 0
+        weights = [np.where(on_board, 0.0, np.asarray(r, dtype=float)) for r in ranges]
+
+        # only combos off the board can be dealt
+        self.live = np.flatnonzero(~on_board)
+        weights = [w[self.live] for w in weights]
+        boards = showdown_boards(board, rng if rng is not None else random)
+        strengths = showdown_strengths(self.live, board, boards)
+        self.buckets = [bucket_combos(strengths, w) for w in weights]
+
+        # bucket membership weighted by range: (1326 combos x NUM_BUCKETS), 0 for combos on the board
+        membership = [np.zeros((len(COMBOS), NUM_BUCKETS)) for _ in range(2)]
+        for p in range(2):
+            membership[p][self.live, self.buckets[p]] = weights[p]
+
+        # N[i, j]: weight of compatible combo pairs in buckets i and j; S[i, j]: that weight signed by who wins
+        self.N, self.S = bucket_matrices(boards, membership)
+
+        num_nodes = self.tree.num_nodes
+        self.regrets = np.zeros((num_nodes, NUM_ACTIONS, NUM_BUCKETS))
+        self.cumulative_strategy = np.zeros((num_nodes, NUM_ACTIONS, NUM_BUCKETS))
+        self.iters = 0
+
+        tree = self.tree
+        self.decision = np.flatnonzero(tree.terminal == NOT_TERMINAL)
+        self.folds = np.flatnonzero(tree.terminal == FOLD)
+        self.showdowns = np.flatnonzero(tree.terminal == SHOWDOWN)
+        # chips player 0 wins at each terminal (per unit of matched weight); player 1 wins the negative
+        folder = tree.folder[self.folds]
+        self.fold_payoff = np.where(folder == 0, -1.0, 1.0) * tree.contributions[self.folds, folder]
+        self.showdown_payoff = tree.contributions[self.showdowns, 0]
+
+        # forward pass gather indices: for every player and node, the row of the flattened
+        # strategy taken at each depth on the path from the root, or the row of ones past
+        # the end of it where the path is shorter or the other player acted
+        ones = num_nodes * NUM_ACTIONS
+        self.paths = np.full((2, num_nodes, max(tree.depth.max(), 1)), ones)
+        for node in range(1, num_nodes):
+            child = node
+            while tree.parent[child] >= 0:
+                parent = tree.parent[child]
+                self.paths[tree.player[parent], node, tree.depth[parent]] = parent * NUM_ACTIONS + tree.parent_action[child]
+                child = parent
+
+        # backward pass: decision nodes level by level, deepest first, with which player acts
+        self.children = np.where(tree.legal, tree.children, num_nodes)
+        self.backward_levels = []
+        for level in reversed(tree.levels):
+            nodes = level[tree.terminal[level] == NOT_TERMINAL]
+            if len(nodes):
+                acting = np.stack([tree.player[nodes] == p for p in range(2)])[:, :, None, None]
+                self.backward_levels.append((nodes, acting))
+        self.decision_player = tree.player[self.decision]
+        self.legal = tree.legal[:, :, None]
+        self.num_legal = np.maximum(self.legal.sum(axis=1, keepdims=True), 1)
+
+    def current_strategy(self):
+        positive = np.maximum(self.regrets, 0.0)
+        totals = positive.sum(axis=1, keepdims=True)
+        return np.where(totals > 0, positive / np.where(totals > 0, totals, 1.0), self.legal / self.num_legal)
+
+    def iterate(self):
+        '''
+        One CFR+ iteration updating both players simultaneously
+        '''
+        tree = self.tree
+        strategy = self.current_strategy()
+
+        # forward pass: reach probabilities of every bucket at every node, as products along the paths
+        rows = np.concatenate([strategy.reshape(-1, NUM_BUCKETS), np.ones((1, NUM_BUCKETS))])
+        reach = rows[self.paths].prod(axis=2)
+
+        # terminal values: counterfactual value of every bucket for each player
+        values = np.zeros((2, tree.num_nodes + 1, NUM_BUCKETS)) # last row stays 0 for missing children
+        values[0, self.folds] = self.fold_payoff[:, None] * (reach[1, self.folds] @ self.N.T)
+        values[1, self.folds] = -self.fold_payoff[:, None] * (reach[0, self.folds] @ self.N)
+        values[0, self.showdowns] = self.showdown_payoff[:, None] * (reach[1, self.showdowns] @ self.S.T)
+        values[1, self.showdowns] = -self.showdown_payoff[:, None] * (reach[0, self.showdowns] @ self.S)
+
+        # backward pass over both players at once: the acting player weights children by its
+        # strategy, the other sums them
+        for nodes, acting in self.backward_levels:
+            weights = np.where(acting, strategy[nodes], self.legal[nodes])
+            values[:, nodes] = (weights * values[:, self.children[nodes]]).sum(axis=2)
+
+        # regrets of every decision node in one batch (the strategy was fixed before the pass)
+        decision = self.decision
+        child_values = values[self.decision_player[:, None], self.children[decision]]
+        regret = (child_values - values[self.decision_player, decision][:, None, :]) * self.legal[decision]
+        self.regrets[decision] = np.maximum(self.regrets[decision] + regret, 0.0)
+
+        # linearly weighted average strategy
+        self.iters += 1
+        acting_reach = reach[tree.player[self.decision], self.decision]
+        self.cumulative_strategy[self.decision] += self.iters * acting_reach[:, None, :] * strategy[self.decision]
+
+    def solve(self, time_budget, max_iters=1000):
+        '''
+        Runs CFR+ iterations until the time budget is spent, giving up after the first one if
+        MIN_ITERS of them would not fit in it
+
+        Returns:
+            average strategy at the root, shape (NUM_ACTIONS, NUM_BUCKETS), or None if fewer
+            than MIN_ITERS iterations fit in the budget
+        '''
+        start = time.perf_counter()
+        deadline = start + time_budget
+        while self.iters < max_iters:
+            self.iterate()
+            now = time.perf_counter()
+            if now >= deadline or (self.iters == 1 and (now - start) * MIN_ITERS > time_budget):
+                break
+        if self.iters < MIN_ITERS:
+            return None
+        return self.average_strategy(0)
+
+    def average_strategy(self, node):
+        totals = self.cumulative_strategy[node].sum(axis=0, keepdims=True)
+        legal = self.tree.legal[node][:, None]
+        uniform = legal / max(legal.sum(), 1)
+        return np.where(totals > 0, self.cumulative_strategy[node] / np.where(totals > 0, totals, 1.0), uniform)
+
+    def bucket_of(self, player, hole):
+        '''
+        Returns:
+            bucket of the given hole cards in player's range
+        '''
+        return self.buckets[player][np.searchsorted(self.live, hole_combo_index(hole))]
@@ -0,0 +1,49 @@
+import random
+import numpy as np
+
+'''
+Reproducible, splittable random streams for training, simulation and solving
+'''
+
+class RngStream(random.Random):
+    '''
+    A random.Random (for sample, shuffle, choices, ...) paired with a NumPy Generator in
+    .numpy, both seeded from one numpy SeedSequence.
+
+    child(key) derives an independent stream from the same entropy and a key, so every
+    worker, iteration or estimator can get its own stream without any shared state, and
+    the same root seed replays exactly the same draws however the work is scheduled.
+
+    @param seed Root seed, or None to draw one from the OS (see .entropy to replay it)
+    @param spawn_key Path of child keys from the root stream
+    '''
+
+    def __init__(self, seed=None, spawn_key=()):
+        self.seed_sequence = np.random.SeedSequence(seed, spawn_key=tuple(spawn_key))
+        self.entropy = self.seed_sequence.entropy
+        self.spawn_key = self.seed_sequence.spawn_key
+        self.numpy = np.random.Generator(np.random.PCG64(self.seed_sequence))
+        super().__init__(int.from_bytes(self.seed_sequence.generate_state(4).tobytes(), 'little'))
+
+    def child(self, key):
+        '''
+        Returns:
+            independent stream identified by a non-negative int key
+        '''
+        return RngStream(self.entropy, self.spawn_key + (key,))
+
+    def spawn(self, n):
+        '''
+        Returns:
+            list of n independent child streams (keys 0 to n-1)
+        '''
+        return [self.child(key) for key in range(n)]
+
+    def __reduce__(self):
+        # random.Random only pickles its own state, so keep the identity and the NumPy state too
+        return self.__class__, (self.entropy, self.spawn_key), (self.getstate(), self.numpy.bit_generator.state)
+
+    def __setstate__(self, state):
+        python_state, numpy_state = state
+        self.setstate(python_state)
+        self.numpy.bit_generator.state = numpy_state
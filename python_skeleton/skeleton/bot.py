@@ -36,6 +36,23 @@ class Bot():
         '''
         raise NotImplementedError('handle_round_over')
 
+    def handle_action(self, game_state, round_state, action, actor, active):
+        '''
+        Called for every action in the round history (yours and your opponent's),
+        before it is applied to round_state. Optional.
+
+        Arguments:
+        game_state: the GameState object.
+        round_state: the RoundState object the action was taken in.
+        action: the action taken.
+        actor: index of the player who took the action.
+        active: your player's index.
+
+        Returns:
+        Nothing.
+        '''
+        pass
+
     def get_action(self, game_state, round_state, active):
         '''
         Where the magic happens - your code should implement this function.
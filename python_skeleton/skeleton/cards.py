@@ -0,0 +1,62 @@
+'''
+Integer card representation. A card is 4 * rank + suit (its index in eval7.Deck().cards),
+a bounty is a rank, and a set of cards is a 52 bit mask. Strings like 'Ah' only appear
+on the wire: the Runner parses them once and everything after it works with ints.
+'''
+
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+NUM_CARDS = 52
+NO_RANK = -1 # bounty that is hidden from us
+
+CARD_STRINGS = [rank + suit for rank in RANKS for suit in SUITS] # card -> 'Ah'
+CARD_FROM_STRING = {string: card for card, string in enumerate(CARD_STRINGS)}
+CARD_FROM_BYTES = {string.encode(): card for card, string in enumerate(CARD_STRINGS)}
+RANK_FROM_BYTES = {rank.encode(): index for index, rank in enumerate(RANKS)}
+
+def parse_cards(strings):
+    '''
+    Converts wire format cards (['Ah', 'Kd']) into ints
+    '''
+    return [CARD_FROM_STRING[string] for string in strings]
+
+def parse_rank(string):
+    '''
+    Converts a wire format bounty rank ('A') into an int, NO_RANK if it isn't a rank
+    '''
+    index = RANKS.find(string)
+    return index if len(string) == 1 and index >= 0 else NO_RANK
+
+def parse_wire_cards(payload):
+    '''
+    Converts a comma separated bytes clause payload (b'Ah,Kd') into ints
+    '''
+    return [CARD_FROM_BYTES[string] for string in payload.split(b',')]
+
+def parse_wire_rank(payload):
+    '''
+    Converts a bytes bounty rank (b'A') into an int, NO_RANK if it isn't a rank
+    '''
+    return RANK_FROM_BYTES.get(payload, NO_RANK)
+
+def card_rank(card):
+    return card >> 2
+
+def card_suit(card):
+    return card & 3
+
+def card_mask(cards):
+    '''
+    Returns:
+        52 bit mask with a bit set for every card
+    '''
+    mask = 0
+    for card in cards:
+        mask |= 1 << card
+    return mask
+
+def format_cards(cards):
+    '''
+    Converts ints back to wire format strings, for logging
+    '''
+    return [CARD_STRINGS[card] for card in cards]
@@ -0,0 +1,110 @@
+'''
+Opt-in timing of the pokerbot callbacks, used by the runner.
+'''
+import cProfile
+import heapq
+import io
+import pstats
+import sys
+import time
+
+# upper edges of the histogram buckets, in seconds (the last bucket is open-ended)
+BUCKET_EDGES = [0.0001, 0.0003, 0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0]
+PROFILE_LINES = 15
+
+
+class CallbackProfiler():
+    '''
+    Records wall and CPU time histograms for every bot callback, and optionally keeps
+    cProfile statistics for the slowest get_action calls.
+    '''
+
+    def __init__(self, slowest=0, output=None):
+        '''
+        Arguments:
+        slowest: how many of the slowest get_action calls to keep cProfile stats for (0 disables cProfile).
+        output: path of the summary file, or None to print the summary to stdout.
+        '''
+        self.slowest = slowest
+        self.output = output
+        self.wall = {}
+        self.cpu = {}
+        self.profiles = []  # min-heap of (wall seconds, get_action call number, pstats text)
+
+    def call(self, name, callback, *args):
+        '''
+        Runs callback(*args), recording its timing under name, and returns its result.
+        '''
+        profile = None
+        if self.slowest > 0 and name == 'get_action':
+            profile = cProfile.Profile()
+            profile.enable()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            return callback(*args)
+        finally:
+            cpu_time = time.process_time() - cpu_start
+            wall_time = time.perf_counter() - wall_start
+            if profile is not None:
+                profile.disable()
+            self.wall.setdefault(name, []).append(wall_time)
+            self.cpu.setdefault(name, []).append(cpu_time)
+            if profile is not None:
+                self.keep_profile(wall_time, profile)
+
+    def keep_profile(self, wall_time, profile):
+        '''
+        Keeps the profile if it is one of the slowest seen so far.
+        '''
+        if len(self.profiles) >= self.slowest and wall_time <= self.profiles[0][0]:
+            return
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        entry = (wall_time, len(self.wall['get_action']), text.getvalue())
+        if len(self.profiles) < self.slowest:
+            heapq.heappush(self.profiles, entry)
+        else:
+            heapq.heapreplace(self.profiles, entry)
+
+    @staticmethod
+    def histogram(times):
+        '''
+        Returns the number of times falling into each bucket of BUCKET_EDGES.
+        '''
+        counts = [0] * (len(BUCKET_EDGES) + 1)
+        for value in times:
+            index = 0
+            while index < len(BUCKET_EDGES) and value >= BUCKET_EDGES[index]:
+                index += 1
+            counts[index] += 1
+        return counts
+
+    def summary(self):
+        '''
+        Returns the timing summary as a string.
+        '''
+        labels = ['<{:g}ms'.format(1000 * edge) for edge in BUCKET_EDGES] + ['>={:g}ms'.format(1000 * BUCKET_EDGES[-1])]
+        lines = ['Callback timing summary']
+        for name in sorted(self.wall):
+            for kind, times in (('wall', self.wall[name]), ('cpu', self.cpu[name])):
+                lines.append('{} {}: {} calls, {:.3f}s total, mean {:.3f}ms, max {:.3f}ms'.format(
+                    name, kind, len(times), sum(times), 1000 * sum(times) / len(times), 1000 * max(times)))
+                lines.append('    ' + '  '.join('{} {}'.format(label, count)
+                                                for label, count in zip(labels, self.histogram(times)) if count))
+        for wall_time, call_num, text in sorted(self.profiles, reverse=True):
+            lines.append('')
+            lines.append('get_action call #{} took {:.3f}ms'.format(call_num, 1000 * wall_time))
+            lines.append(text)
+        return '\n'.join(lines) + '\n'
+
+    def write_summary(self):
+        '''
+        Writes the summary to the output file, or stdout if no file was given.
+        '''
+        if self.output is None:
+            sys.stdout.write(self.summary())
+            sys.stdout.flush()
+            return
+        with open(self.output, 'w') as summary_file:
+            summary_file.write(self.summary())
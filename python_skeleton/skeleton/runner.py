@@ -7,23 +7,54 @@ from .actions import FoldAction, CallAction, CheckAction, RaiseAction
 from .states import GameState, TerminalState, RoundState
 from .states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from .bot import Bot
+from .cards import NO_RANK, parse_wire_cards, parse_wire_rank
+
+
+ACTION_CODES = {FoldAction: b'F\n', CallAction: b'C\n', CheckAction: b'K\n'}
+FOLD, CALL, CHECK = FoldAction(), CallAction(), CheckAction()
 
 
 class Runner():
     '''
     Interacts with the engine.
+
+    Packets are read as bytes and every clause is handed to the handler of its first byte.
+    Between bot callbacks the runner keeps the game in mutable fields and only builds the
+    GameState and RoundState the bot sees when it calls the bot.
     '''
 
-    def __init__(self, pokerbot, socketfile):
+    def __init__(self, pokerbot, socketfile, profiler=None):
         self.pokerbot = pokerbot
-        self.socketfile = socketfile
+        self.socketfile = socketfile # binary, e.g. sock.makefile('rwb')
+        self.profiler = profiler
+        self.handlers = {ord(code): handler for code, handler in (
+            ('T', self.on_time), ('P', self.on_seat), ('H', self.on_hand), ('G', self.on_bounty),
+            ('F', self.on_fold), ('C', self.on_call), ('K', self.on_check), ('R', self.on_raise),
+            ('B', self.on_board), ('O', self.on_opponent_hand), ('D', self.on_delta),
+            ('Y', self.on_bounty_hits), ('N', self.on_new_game), ('Q', self.on_quit),
+        )}
+        self.bankroll = 0
+        self.game_clock = 0.
+        self.round_num = 1
+        self.active = 0
+        self.round_state = None
+        self.board = None # board received since the bot last saw round_state
+        self.round_flag = True
+
+    def call(self, callback, *args):
+        '''
+        Invokes one of the pokerbot's callbacks, timing it if profiling is enabled.
+        '''
+        if self.profiler is None:
+            return getattr(self.pokerbot, callback)(*args)
+        return self.profiler.call(callback, getattr(self.pokerbot, callback), *args)
 
     def receive(self):
         '''
-        Generator for incoming messages from the engine.
+        Generator for incoming messages from the engine, as lists of bytes clauses.
         '''
         while True:
-            packet = self.socketfile.readline().strip().split(' ')
+            packet = self.socketfile.readline().split()
             if not packet:
                 break
             yield packet
@@ -32,89 +63,129 @@ class Runner():
         '''
         Encodes an action and sends it to the engine.
         '''
-        if isinstance(action, FoldAction):
-            code = 'F'
-        elif isinstance(action, CallAction):
-            code = 'C'
-        elif isinstance(action, CheckAction):
-            code = 'K'
-        else:  # isinstance(action, RaiseAction)
-            code = 'R' + str(action.amount)
-        self.socketfile.write(code + '\n')
+        code = ACTION_CODES.get(type(action))
+        if code is None:  # isinstance(action, RaiseAction)
+            code = ('R' + str(action.amount) + '\n').encode()
+        self.socketfile.write(code)
         self.socketfile.flush()
 
+    def game_state(self):
+        return GameState(self.bankroll, self.game_clock, self.round_num)
+
+    def current_round_state(self):
+        '''
+        Returns the RoundState the bot sees, with any board received since the last call.
+        '''
+        if self.board is not None:
+            rs = self.round_state
+            self.round_state = RoundState(rs.button, rs.street, rs.pips, rs.stacks, rs.hands, rs.bounties, self.board, rs.previous_state)
+            self.board = None
+        return self.round_state
+
+    def on_time(self, payload):
+        self.game_clock = float(payload)
+
+    def on_seat(self, payload):
+        self.active = int(payload)
+
+    def on_hand(self, payload):
+        hands = [[], []]
+        hands[self.active] = parse_wire_cards(payload)
+        pips = [SMALL_BLIND, BIG_BLIND]
+        stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+        self.round_state = RoundState(0, 0, pips, stacks, hands, None, [], None)
+        self.board = None
+
+    def on_bounty(self, payload):
+        bounties = [NO_RANK, NO_RANK]
+        bounties[self.active] = parse_wire_rank(payload)
+        self.round_state = self.round_state._replace(bounties=bounties)
+        if self.round_flag:
+            self.call('handle_new_round', self.game_state(), self.round_state, self.active)
+            self.round_flag = False
+
+    def on_action(self, action):
+        round_state = self.current_round_state()
+        self.call('handle_action', self.game_state(), round_state, action, round_state.button % 2, self.active)
+        self.round_state = round_state.proceed(action)
+
+    def on_fold(self, payload):
+        self.on_action(FOLD)
+
+    def on_call(self, payload):
+        self.on_action(CALL)
+
+    def on_check(self, payload):
+        self.on_action(CHECK)
+
+    def on_raise(self, payload):
+        self.on_action(RaiseAction(int(payload)))
+
+    def on_board(self, payload):
+        self.board = parse_wire_cards(payload)
+
+    def on_opponent_hand(self, payload):
+        # backtrack (a board received since then belongs to the state being replaced)
+        self.board = None
+        round_state = self.round_state.previous_state
+        revised_hands = list(round_state.hands)
+        revised_hands[1-self.active] = parse_wire_cards(payload)
+        # rebuild history
+        round_state = round_state._replace(hands=revised_hands)
+        self.round_state = TerminalState([0, 0], None, round_state)
+
+    def on_delta(self, payload):
+        assert isinstance(self.round_state, TerminalState)
+        delta = int(payload)
+        deltas = [-delta, -delta]
+        deltas[self.active] = delta
+        self.round_state = TerminalState(deltas, None, self.round_state.previous_state)
+        self.bankroll += delta
+
+    def on_bounty_hits(self, payload):
+        assert isinstance(self.round_state, TerminalState)
+        hero_hit_bounty, opponent_hit_bounty = (payload[0:1] == b'1'), (payload[1:2] == b'1')
+        if self.active == 1:
+            hero_hit_bounty, opponent_hit_bounty = opponent_hit_bounty, hero_hit_bounty
+        self.round_state = TerminalState(self.round_state.deltas, [hero_hit_bounty, opponent_hit_bounty], self.round_state.previous_state)
+        self.call('handle_round_over', self.game_state(), self.round_state, self.active)
+        self.round_num += 1
+        self.round_flag = True
+
+    def on_new_game(self, payload):
+        '''
+        Starts a new game in this process (persistent bots): the pokerbot is created again,
+        so it starts from a clean __init__, without paying for interpreter startup and imports.
+        '''
+        self.pokerbot = type(self.pokerbot)()
+        self.bankroll = 0
+        self.game_clock = 0.
+        self.round_num = 1
+        self.round_state = None
+        self.board = None
+        self.round_flag = True  # so the reset is acked
+
+    def on_quit(self, payload):
+        if self.profiler is not None:
+            self.profiler.write_summary()
+        return True
+
     def run(self):
         '''
         Reconstructs the game tree based on the action history received from the engine.
         '''
-        game_state = GameState(0, 0., 1)
-        round_state = None
-        active = 0
-        round_flag = True
+        handlers = self.handlers
         for packet in self.receive():
             for clause in packet:
-                if clause[0] == 'T':
-                    game_state = GameState(game_state.bankroll, float(clause[1:]), game_state.round_num)
-                elif clause[0] == 'P':
-                    active = int(float(clause[1:]))
-                elif clause[0] == 'H':
-                    hands = [[], []]
-
-                    hands[active] = clause[1:].split(',')
-                    pips = [SMALL_BLIND, BIG_BLIND]
-                    stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-                    round_state = RoundState(0, 0, pips, stacks, hands, None, [], None)
-                elif clause[0] == 'G':
-                    bounties = ['-1', '-1']
-                    bounties[active] = clause[1:]
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             round_state.hands, bounties, round_state.deck, round_state.previous_state)
-                    if round_flag:
-                        self.pokerbot.handle_new_round(game_state, round_state, active)
-                        round_flag = False
-                elif clause[0] == 'F':
-                    round_state = round_state.proceed(FoldAction())
-                elif clause[0] == 'C':
-                    round_state = round_state.proceed(CallAction())
-                elif clause[0] == 'K':
-                    round_state = round_state.proceed(CheckAction())
-                elif clause[0] == 'R':
-                    round_state = round_state.proceed(RaiseAction(int(float(clause[1:]))))
-                elif clause[0] == 'B':
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             round_state.hands, round_state.bounties, clause[1:].split(','), round_state.previous_state)
-                elif clause[0] == 'O':
-                    # backtrack
-                    round_state = round_state.previous_state
-                    revised_hands = list(round_state.hands)
-                    revised_hands[1-active] = clause[1:].split(',')
-                    # rebuild history
-                    round_state = RoundState(round_state.button, round_state.street, round_state.pips, round_state.stacks,
-                                             revised_hands, round_state.bounties, round_state.deck, round_state.previous_state)
-                    round_state = TerminalState([0, 0], None, round_state)
-                elif clause[0] == 'D':
-                    assert isinstance(round_state, TerminalState)
-                    delta = int(float(clause[1:]))
-                    deltas = [-delta, -delta]
-                    deltas[active] = delta
-                    round_state = TerminalState(deltas, None, round_state.previous_state)
-                    game_state = GameState(game_state.bankroll + delta, game_state.game_clock, game_state.round_num)
-                elif clause[0] == 'Y':
-                    assert isinstance(round_state, TerminalState)
-                    hero_hit_bounty, opponent_hit_bounty = (clause[1] == '1'), (clause[2] == '1')
-                    if active == 1:
-                        hero_hit_bounty, opponent_hit_bounty = opponent_hit_bounty, hero_hit_bounty
-                    round_state = TerminalState(round_state.deltas, [hero_hit_bounty, opponent_hit_bounty], round_state.previous_state)
-                    self.pokerbot.handle_round_over(game_state, round_state, active)
-                    game_state = GameState(game_state.bankroll, game_state.game_clock, game_state.round_num + 1)
-                    round_flag = True
-                elif clause[0] == 'Q':
+                handler = handlers.get(clause[0])
+                if handler is not None and handler(clause[1:]):
                     return
-            if round_flag:  # ack the engine
-                self.send(CheckAction())
+            if self.round_flag:  # ack the engine
+                self.send(CHECK)
             else:
-                assert active == round_state.button % 2
-                action = self.pokerbot.get_action(game_state, round_state, active)
+                round_state = self.current_round_state()
+                assert self.active == round_state.button % 2
+                action = self.call('get_action', self.game_state(), round_state, self.active)
                 self.send(action)
 
 
@@ -124,8 +195,32 @@ def parse_args():
     '''
     parser = argparse.ArgumentParser(prog='python3 player.py')
     parser.add_argument('--host', type=str, default='localhost', help='Host to connect to, defaults to localhost')
-    parser.add_argument('port', type=int, help='Port on host to connect to')
-    return parser.parse_args()
+    parser.add_argument('--unix', type=str, default=None, help='Path of a Unix domain socket to connect to instead of host:port')
+    parser.add_argument('--profile', action='store_true', help='Time every bot callback and write a summary when the game ends')
+    parser.add_argument('--profile-slowest', type=int, default=0, help='With --profile, keep cProfile stats for this many of the slowest get_action calls')
+    parser.add_argument('--profile-output', type=str, default='profile.txt', help='File the profiling summary is written to, or - for stdout')
+    parser.add_argument('port', type=int, nargs='?', help='Port on host to connect to')
+    args = parser.parse_args()
+    if args.unix is None and args.port is None:
+        parser.error('a port is required unless --unix is given')
+    return args
+
+def connect(args):
+    '''
+    Opens the socket to the engine over the transport chosen in args.
+    '''
+    if args.unix is not None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(args.unix)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    sock = socket.create_connection((args.host, args.port))
+    # actions are single short lines, so send them without waiting on Nagle
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
 
 def run_bot(pokerbot, args):
     '''
@@ -133,12 +228,19 @@ def run_bot(pokerbot, args):
     '''
     assert isinstance(pokerbot, Bot)
     try:
-        sock = socket.create_connection((args.host, args.port))
+        sock = connect(args)
     except OSError:
-        print('Could not connect to {}:{}'.format(args.host, args.port))
+        if args.unix is not None:
+            print('Could not connect to {}'.format(args.unix))
+        else:
+            print('Could not connect to {}:{}'.format(args.host, args.port))
         return
-    socketfile = sock.makefile('rw')
-    runner = Runner(pokerbot, socketfile)
+    socketfile = sock.makefile('rwb')
+    profiler = None
+    if args.profile:
+        from .profiler import CallbackProfiler # cProfile and pstats are only imported when profiling
+        profiler = CallbackProfiler(args.profile_slowest, None if args.profile_output == '-' else args.profile_output)
+    runner = Runner(pokerbot, socketfile, profiler)
     runner.run()
     socketfile.close()
     sock.close()
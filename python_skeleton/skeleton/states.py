@@ -33,8 +33,8 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'pips', 'stacks'
         '''
         cards0 = self.hands[0] + self.deck
         cards1 = self.hands[1] + self.deck
-        return (self.bounties[0] in [card[0] for card in cards0],
-                self.bounties[1] in [card[0] for card in cards1])
+        return (self.bounties[0] in [card >> 2 for card in cards0],
+                self.bounties[1] in [card >> 2 for card in cards1])
 
     def showdown(self):
         '''
@@ -0,0 +1,56 @@
+import argparse
+import json
+import subprocess
+import sys
+
+'''
+Checks that the bot starts up well inside the engine's CONNECT_TIMEOUT (10 s) and without
+the training stack. A fresh interpreter imports player.py and creates the Player, the work
+done before the bot connects, and reports the import and init times, the peak RSS and any
+training-only module that got imported. Run it from python_skeleton, where the bot runs:
+
+    python3 startup_check.py --budget 1.0
+'''
+
+DEFAULT_BUDGET = 1.0 # seconds, a tenth of CONNECT_TIMEOUT
+TRAINING_MODULES = ['pandas', 'tqdm', 'multiprocessing', 'eval7', 'cfr', 'best_response', 'distributed_cfr']
+
+MEASURE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import player
+imported = time.perf_counter()
+player.Player()
+created = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - start,
+    'init_seconds': created - imported,
+    'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024),
+    'training_modules': [name for name in %r if name in sys.modules],
+}))
+'''
+
+def measure():
+    """
+    Returns:
+        dict of startup measurements of a fresh interpreter running the bot
+    """
+    output = subprocess.run([sys.executable, '-c', MEASURE % TRAINING_MODULES], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1]) # the Player prints its seed first
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 startup_check.py')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help='Seconds the import and init may take together')
+    args = parser.parse_args()
+
+    result = measure()
+    total = result['import_seconds'] + result['init_seconds']
+    print(f"import {result['import_seconds']:.3f}s, init {result['init_seconds']:.3f}s, peak rss {result['peak_rss_bytes'] / 2**20:.1f} MiB")
+    failures = []
+    if total > args.budget:
+        failures.append(f'startup took {total:.3f}s, over the {args.budget:.3f}s budget')
+    if result['training_modules']:
+        failures.append('imported training modules: ' + ', '.join(result['training_modules']))
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,147 @@
+from functools import lru_cache
+import numpy as np
+
+'''
+Compact storage for CFR tables: rows of NUM_ACTIONS values in typed NumPy blocks instead of
+lists of Python floats, and an 8-bit quantized format for shipping average strategies.
+'''
+
+BLOCK_ROWS = 4096
+QUANTIZATION_LEVELS = 255 # a quantized probability is q / 255
+NUM_KEY_FLAGS = 8 # flags in str(InformationSet), each small enough for a uint8
+
+class ArrayTable():
+    '''
+    Dict-like table of info set string -> row of NUM_ACTIONS values stored as dtype.
+
+    Rows are views into fixed-size blocks that are never reallocated, so
+    table[key][action] += value updates the table in place, as with lists.
+
+    @param num_actions Length of every row
+    @param dtype NumPy dtype of the values (float32 halves the memory of float64 and is
+        about a tenth of a list of Python floats)
+    '''
+
+    def __init__(self, num_actions, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.num_actions = num_actions
+        self.index = {} # info set -> row number
+        self.blocks = []
+
+    def row(self, number):
+        return self.blocks[number // BLOCK_ROWS][number % BLOCK_ROWS]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __getitem__(self, key):
+        return self.row(self.index[key])
+
+    def __setitem__(self, key, values):
+        if key not in self.index:
+            if len(self.index) == len(self.blocks) * BLOCK_ROWS:
+                self.blocks.append(np.zeros((BLOCK_ROWS, self.num_actions), dtype=self.dtype))
+            self.index[key] = len(self.index)
+        self.row(self.index[key])[:] = values
+
+    def get(self, key, default=None):
+        return self[key] if key in self.index else default
+
+    def setdefault(self, key, default):
+        if key not in self.index:
+            self[key] = default
+        return self[key]
+
+    def keys(self):
+        return self.index.keys()
+
+    def values(self):
+        return (self.row(number) for number in self.index.values())
+
+    def items(self):
+        return ((key, self.row(number)) for key, number in self.index.items())
+
+    def update(self, rows):
+        for key, values in (rows.items() if hasattr(rows, 'items') else rows):
+            self[key] = values
+
+    def to_array(self):
+        '''
+        Returns:
+            (keys, (len(self), num_actions) copy of the values in key order)
+        '''
+        keys = list(self.index)
+        if not keys:
+            return keys, np.zeros((0, self.num_actions), dtype=self.dtype)
+        return keys, np.concatenate(self.blocks)[:len(keys)].copy()
+
+    @property
+    def nbytes(self):
+        return sum(block.nbytes for block in self.blocks)
+
+def quantize(probabilities):
+    '''
+    Rounds rows of probabilities to multiples of 1/255 that still sum to 1 (largest remainder)
+
+    Args:
+        probabilities: (rows, actions) array, rows summing to 1 or all zero
+
+    Returns:
+        uint8 array of the same shape
+    '''
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    totals = probabilities.sum(axis=1, keepdims=True)
+    scaled = probabilities / np.where(totals > 0, totals, 1.0) * QUANTIZATION_LEVELS
+    levels = np.floor(scaled).astype(np.int64)
+    missing = np.where(totals[:, 0] > 0, QUANTIZATION_LEVELS - levels.sum(axis=1), 0)
+    # hand the missing levels to the actions that lost the most to rounding
+    order = np.argsort(levels - scaled, axis=1, kind='stable')
+    bumps = np.arange(probabilities.shape[1])[None, :] < missing[:, None]
+    np.put_along_axis(levels, order, np.take_along_axis(levels, order, axis=1) + bumps, axis=1)
+    return levels.astype(np.uint8)
+
+def dequantize(levels):
+    return np.asarray(levels, dtype=np.float64) / QUANTIZATION_LEVELS
+
+def encode_keys(keys):
+    '''
+    Packs info set strings ('0|0|1|0|0|0|9|9') into a (len(keys), 8) uint8 array
+    '''
+    return np.array([[int(flag) for flag in key.split('|')] for key in keys], dtype=np.uint8).reshape(-1, NUM_KEY_FLAGS)
+
+def decode_keys(flags):
+    return ['|'.join(map(str, row)) for row in flags.tolist()]
+
+def save_strategy(filename, strategy):
+    '''
+    Saves an average strategy with 8-bit probabilities (about 15 bytes per info set, compressed)
+
+    Args:
+        filename: .npz file
+        strategy: dict of info set string -> action weights
+    '''
+    keys = list(strategy)
+    probabilities = np.array([list(strategy[key]) for key in keys], dtype=np.float64).reshape(len(keys), -1)
+    np.savez_compressed(filename, keys=encode_keys(keys), strategy=quantize(probabilities))
+    print(f'Saved data to {filename}.')
+
+def load_strategy(filename):
+    '''
+    Returns:
+        dict of info set string -> list of action probabilities, from save_strategy's format
+    '''
+    with np.load(filename) as data:
+        return dict(zip(decode_keys(data['keys']), dequantize(data['strategy']).tolist()))
+
+@lru_cache(maxsize=None)
+def cached_strategy(filename):
+    '''
+    Loads a strategy once per process, so a bot created again for a new game shares it
+    '''
+    return load_strategy(filename)
@@ -0,0 +1,181 @@
+from history import BOUNTY_RATIO, BOUNTY_CONSTANT
+from skeleton.cards import NUM_CARDS, RANKS
+from ranges import COMBOS, NUM_COMBOS, CARD_COMBOS
+from hand_eval import evaluate_batch
+
+import numpy as np
+
+'''
+Range-vs-range terminal payoffs in linear time. Combos are sorted by hand rank once per
+board, so showdown values are prefix sums over the sorted opponent reach, with per-card
+prefix sums subtracting the opponent combos that share a card (card removal).
+'''
+
+COMBO_CARD_A = np.array([a for a, _ in COMBOS])
+COMBO_CARD_B = np.array([b for _, b in COMBOS])
+CARD_COMBO_ARRAY = np.array(CARD_COMBOS) # (52, 51) combos holding each card
+COMBO_RANK_A = COMBO_CARD_A >> 2
+COMBO_RANK_B = COMBO_CARD_B >> 2
+
+def combo_ranks(board):
+    '''
+    Returns:
+        dense rank of every combo's hand with the 5 card board (higher is stronger),
+        -1 for combos that collide with the board
+    '''
+    live = ~np.isin(COMBO_CARD_A, board) & ~np.isin(COMBO_CARD_B, board)
+    hands = np.empty((live.sum(), 2 + len(board)), dtype=np.int64)
+    hands[:, 0] = COMBO_CARD_A[live]
+    hands[:, 1] = COMBO_CARD_B[live]
+    hands[:, 2:] = board
+    ranks = np.full(NUM_COMBOS, -1, dtype=np.int64)
+    ranks[live] = np.unique(evaluate_batch(hands), return_inverse=True)[1]
+    return ranks
+
+def blocker_sums(reach):
+    '''
+    Returns:
+        for every combo, the reach of opponent combos that share no card with it
+    '''
+    card_totals = np.bincount(COMBO_CARD_A, reach, NUM_CARDS) + np.bincount(COMBO_CARD_B, reach, NUM_CARDS)
+    return reach.sum() - card_totals[COMBO_CARD_A] - card_totals[COMBO_CARD_B] + reach
+
+class ShowdownIndex():
+    '''
+    Sort orders and prefix positions of a board's combo ranks. These depend only on the board,
+    so they are computed once and every kernel call is then just prefix sums and gathers.
+
+    @param ranks combo_ranks of the board
+    '''
+
+    def __init__(self, ranks):
+        self.live = (ranks >= 0).astype(float)
+        self.order = np.argsort(ranks, kind='stable')
+        sorted_ranks = ranks[self.order]
+        self.below = np.searchsorted(sorted_ranks, ranks, 'left')
+        self.not_above = np.searchsorted(sorted_ranks, ranks, 'right')
+
+        # the same positions within the 51 combos holding each card, to remove blockers
+        card_ranks = ranks[CARD_COMBO_ARRAY]
+        card_order = np.argsort(card_ranks, axis=1, kind='stable')
+        self.card_combos = np.take_along_axis(CARD_COMBO_ARRAY, card_order, axis=1)
+        card_sorted = np.take_along_axis(card_ranks, card_order, axis=1)
+        # search every row at once by offsetting each row past the previous one
+        offset = (np.arange(NUM_CARDS) * (ranks.max() + 2))[:, None]
+        flat = (card_sorted + offset).ravel()
+        width = CARD_COMBO_ARRAY.shape[1]
+        self.card_below = []
+        self.card_not_above = []
+        for cards in (COMBO_CARD_A, COMBO_CARD_B):
+            keys = ranks + offset[cards, 0]
+            self.card_below.append(np.searchsorted(flat, keys, 'left') - cards * width)
+            self.card_not_above.append(np.searchsorted(flat, keys, 'right') - cards * width)
+
+def showdown_components(index, reach):
+    '''
+    O(n) split of the opponent reach compatible with every combo i into the parts i beats,
+    ties and loses to.
+
+    Args:
+        index: ShowdownIndex of the board
+        reach: opponent reach of every combo (0 for combos blocked by the board)
+
+    Returns:
+        (win, tie, lose) arrays of length 1326, all 0 for combos blocked by the board
+    '''
+    prefix = np.zeros(NUM_COMBOS + 1)
+    np.cumsum(reach[index.order], out=prefix[1:])
+    win = prefix[index.below]
+    lose = prefix[-1] - prefix[index.not_above]
+
+    # one cumsum over the flattened rows, then take off what the earlier rows added
+    card_sums = np.cumsum(reach[index.card_combos].ravel()).reshape(index.card_combos.shape)
+    card_prefix = np.zeros((NUM_CARDS, CARD_COMBO_ARRAY.shape[1] + 1))
+    card_prefix[:, 1:] = card_sums
+    card_prefix[1:, :] -= card_sums[:-1, -1:]
+    for cards, below, not_above in zip((COMBO_CARD_A, COMBO_CARD_B), index.card_below, index.card_not_above):
+        win -= card_prefix[cards, below]
+        lose -= card_prefix[cards, -1] - card_prefix[cards, not_above]
+    win *= index.live
+    lose *= index.live
+    tie = (blocker_sums(reach) - win - lose) * index.live
+    return win, tie, lose
+
+def showdown_kernel(index, reach):
+    '''
+    O(n) showdown values without bounties: for every combo i, the opponent reach over
+    compatible combos i beats minus the reach over those i loses to.
+    '''
+    win, _, lose = showdown_components(index, reach)
+    return win - lose
+
+def bounty_hit_probs(board, bounty):
+    '''
+    Args:
+        board: cards of the board
+        bounty: bounty rank, or NO_RANK if the bounty is hidden
+
+    Returns:
+        probability that the holder of every combo hits their bounty with this board,
+        0/1 for a known bounty and the fraction of the 13 ranks covered otherwise
+    '''
+    board_ranks = {card >> 2 for card in board}
+    if bounty >= 0:
+        if bounty in board_ranks:
+            return np.ones(NUM_COMBOS)
+        return ((COMBO_RANK_A == bounty) | (COMBO_RANK_B == bounty)).astype(float)
+    covered = np.full(NUM_COMBOS, float(len(board_ranks)))
+    covered += ~np.isin(COMBO_RANK_A, list(board_ranks))
+    covered += (COMBO_RANK_B != COMBO_RANK_A) & ~np.isin(COMBO_RANK_B, list(board_ranks))
+    return covered / len(RANKS)
+
+def showdown_utility(index, contribution, reach, hits, opp_hits):
+    '''
+    O(n) bounty-aware showdown values of every combo against the opponent's range, using
+    the payoffs of RoundState.get_delta. The opponent reach is split into the part that hit
+    its bounty and the part that missed, and each is run through showdown_components.
+
+    Args:
+        index: ShowdownIndex of the board
+        contribution: chips each player put in the pot
+        reach: opponent reach of every combo
+        hits: probability that each of our combos hit our bounty
+        opp_hits: probability that each opponent combo hit theirs
+
+    Returns:
+        counterfactual value of every combo (0 for combos blocked by the board)
+    '''
+    hit_reach = reach * opp_hits
+    win_hit, tie_hit, lose_hit = showdown_components(index, hit_reach)
+    win_miss, tie_miss, lose_miss = showdown_components(index, reach - hit_reach)
+
+    win_payoff = contribution * (1 + (BOUNTY_RATIO - 1) * hits) + BOUNTY_CONSTANT * hits
+    split_payoff = contribution * (BOUNTY_RATIO - 1) / 2 + BOUNTY_CONSTANT
+    values = (win_hit + win_miss) * win_payoff
+    values -= lose_hit * (contribution * BOUNTY_RATIO + BOUNTY_CONSTANT) + lose_miss * contribution
+    # a split pays out only when exactly one player hit
+    values += split_payoff * (hits * tie_miss - (1 - hits) * tie_hit)
+    return values
+
+def fold_utility(contributions, folder, player, reach, hits, opp_hits, live):
+    '''
+    O(n) bounty-aware values of every combo of player when folder gave up the pot
+
+    Args:
+        contributions: chips each player put in the pot
+        folder: index of the player who folded
+        player: index of the player whose values are returned
+        reach: opponent reach of every combo
+        hits: probability that each of player's combos hit their bounty
+        opp_hits: probability that each opponent combo hit theirs
+        live: 0/1 mask of player's combos compatible with the board
+    '''
+    compatible = blocker_sums(reach)
+    if folder == player:
+        compatible_hit = blocker_sums(reach * opp_hits)
+        contribution = contributions[player]
+        values = -(contribution * compatible + ((BOUNTY_RATIO - 1) * contribution + BOUNTY_CONSTANT) * compatible_hit)
+    else:
+        contribution = contributions[1-player]
+        values = compatible * (contribution * (1 + (BOUNTY_RATIO - 1) * hits) + BOUNTY_CONSTANT * hits)
+    return values * live
@@ -0,0 +1,66 @@
+from skeleton.states import NUM_ROUNDS
+
+'''
+Splits the remaining game clock into per-decision budgets for the equity estimator
+'''
+
+RESERVE_SECONDS = 2.0 # never plan to spend the last few seconds of the clock
+MAX_DECISION_SECONDS = 0.25 # cap on any single estimate
+PRIOR_ROUNDS = 10 # pseudo-counts used before we have seen enough rounds
+PRIOR_CALLS_PER_ROUND = 1.0
+PRIOR_OVERHEAD = 0.005 # sec per round spent outside the estimator (comms, bucketing, ...)
+
+class TimeBudget():
+    '''
+    Allocates compute per equity estimate from the game clock and the rounds left.
+
+    The budget for one estimate is the spendable clock divided by the estimates we still
+    expect to make, where both the number of estimates per round and the time each round
+    costs outside the estimator are running averages over the match so far.
+    '''
+
+    def __init__(self, num_rounds=NUM_ROUNDS, reserve=RESERVE_SECONDS, max_decision=MAX_DECISION_SECONDS):
+        self.num_rounds = num_rounds
+        self.reserve = reserve
+        self.max_decision = max_decision
+
+        self.rounds = 0
+        self.calls = 0
+        self.overhead = 0.0 # total sec spent outside the estimator in finished rounds
+        self.round_start_clock = None
+        self.round_estimator_seconds = 0.0
+
+    def start_round(self, game_clock):
+        '''
+        Called at the start of every round with the current game clock
+        '''
+        if self.round_start_clock is not None:
+            spent = self.round_start_clock - game_clock
+            self.overhead += max(0.0, spent - self.round_estimator_seconds)
+            self.rounds += 1
+        self.round_start_clock = game_clock
+        self.round_estimator_seconds = 0.0
+
+    def calls_per_round(self):
+        return (self.calls + PRIOR_CALLS_PER_ROUND * PRIOR_ROUNDS) / (self.rounds + PRIOR_ROUNDS)
+
+    def overhead_per_round(self):
+        return (self.overhead + PRIOR_OVERHEAD * PRIOR_ROUNDS) / (self.rounds + PRIOR_ROUNDS)
+
+    def allocate(self, game_clock, round_num):
+        '''
+        Returns:
+            seconds the next estimate may take
+        '''
+        rounds_left = max(1, self.num_rounds - round_num + 1)
+        spendable = game_clock - self.reserve - rounds_left * self.overhead_per_round()
+        self.calls += 1
+        if spendable <= 0:
+            return 0.0
+        return min(self.max_decision, spendable / (rounds_left * self.calls_per_round()))
+
+    def record(self, seconds):
+        '''
+        Called after every estimate with the time it actually took
+        '''
+        self.round_estimator_seconds += seconds
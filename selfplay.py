@@ -0,0 +1,190 @@
+'''
+Batched bot-vs-bot self-play for generating training data.
+
+Many tables play at once from one engine process: every table is its own pair of pokerbot
+processes (PLAYER_1_PATH vs PLAYER_2_PATH from config.py) playing matches of NUM_ROUNDS
+rounds, and an asyncio event loop drives all of their connections, so while one table waits
+on a bot the others keep playing. Every finished round is streamed to disk as one JSON line.
+
+    python3 selfplay.py --tables 8 --rounds 100000 --output hands.jsonl.gz
+
+A pokerbot keeps per-round state of its own, so a connection only ever carries one round at
+a time; rounds are multiplexed over many connections rather than over one. Pokerbots that
+are persistent ("persistent": true in commands.json) keep running between the matches of
+their table and are reset instead of restarted.
+'''
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import time
+
+from engine import Game, Player
+from engine import FoldAction, CallAction, CheckAction
+from config import *
+
+LOG_DIRECTORY = 'selfplay_logs'
+FLUSH_EVERY = 1000 # records between flushes of the output file
+
+
+def action_code(action):
+    '''
+    Encodes an action like the engine's socket protocol does.
+    '''
+    if isinstance(action, FoldAction):
+        return 'F'
+    if isinstance(action, CallAction):
+        return 'C'
+    if isinstance(action, CheckAction):
+        return 'K'
+    return 'R' + str(action.amount)
+
+
+class HandRecorder():
+    '''
+    Streams hand records to a JSON lines file (gzip compressed if it ends in .gz).
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = gzip.open(filename, 'wt') if filename.endswith('.gz') else open(filename, 'w')
+        self.records = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.records += 1
+        if self.records % FLUSH_EVERY == 0:
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Table(Game):
+    '''
+    One pair of pokerbot processes playing matches, with the rules and round logic of Game.
+
+    Args:
+        index (int): Number of the table, used in log filenames and hand records.
+        seed: Root seed of the cards and bounties, None for a fresh game every run.
+        recorder (HandRecorder): Where finished rounds are written.
+        log_directory (str): Directory the pokerbots' output is written to.
+    '''
+
+    def __init__(self, index, seed, recorder, log_directory=LOG_DIRECTORY):
+        super().__init__()
+        self.index = index
+        self.recorder = recorder
+        self.log_directory = log_directory
+        self.deck_rng = random.Random(None if seed is None else f'{seed}/{index}/deck')
+        self.bounty_rng = random.Random(None if seed is None else f'{seed}/{index}/bounty')
+        self.matches = 0
+        self.players = None # kept between matches, so persistent pokerbots are only reset
+        self.round_state = None # state the next logged action is taken in
+        self.actions = []
+
+    def new_players(self):
+        return [
+            Player(name, path, os.path.join(self.log_directory, '{}_table{}.txt'.format(name, self.index)))
+            for name, path in ((PLAYER_1_NAME, PLAYER_1_PATH), (PLAYER_2_NAME, PLAYER_2_PATH))
+        ]
+
+    def log_round_state(self, players, round_state):
+        super().log_round_state(players, round_state)
+        self.round_state = round_state
+
+    def log_action(self, name, action, bet_override):
+        super().log_action(name, action, bet_override)
+        self.actions.append([self.round_state.street, self.round_state.button % 2, action_code(action)])
+
+    async def run_round(self, players, bounties):
+        '''
+        Runs one round of poker with Game's rules and returns its hand record.
+        '''
+        self.actions = []
+        round_state = await super().run_round(players, bounties)
+        previous_state = round_state.previous_state
+        return {
+            'table': self.index,
+            'match': self.matches,
+            'players': [player.name for player in players],
+            'hands': [[str(card) for card in hand] for hand in previous_state.hands],
+            'board': [str(card) for card in previous_state.deck.peek(previous_state.street)],
+            'bounties': list(bounties),
+            'actions': self.actions,
+            'deltas': round_state.deltas,
+            'bounty_hits': list(round_state.bounty_hits),
+        }
+
+    async def run_match(self, num_rounds):
+        '''
+        Gets the table's pair of pokerbots ready for a new game and plays num_rounds rounds between them.
+        '''
+        if self.players is None:
+            self.players = self.new_players()
+        players = self.players
+        await self.start_players(players)
+        bounties = [-1, -1]
+        for round_num in range(1, num_rounds + 1):
+            self.log = [] # the hand records replace the game log
+            if round_num % ROUNDS_PER_BOUNTY == 1:
+                cardNames = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
+                bounties = [cardNames[self.bounty_rng.randint(0, 12)], cardNames[self.bounty_rng.randint(0, 12)]]
+            record = await self.run_round(players, bounties)
+            record['round'] = round_num
+            self.recorder.write(record)
+            players = players[::-1]
+            bounties = bounties[::-1]
+        await asyncio.gather(*(player.finish(stop=False) for player in players))
+        self.matches += 1
+
+    async def close(self):
+        '''
+        Stops the table's pokerbots.
+        '''
+        if self.players is not None:
+            await asyncio.gather(*(player.finish() for player in self.players if player.bot_subprocess is not None))
+
+
+async def run_selfplay(num_tables, num_rounds, output, seed=None, match_rounds=NUM_ROUNDS, log_directory=LOG_DIRECTORY):
+    '''
+    Plays num_rounds rounds in total over num_tables concurrent tables.
+
+    Returns:
+        int: The number of hand records written to output.
+    '''
+    os.makedirs(log_directory, exist_ok=True)
+    recorder = HandRecorder(output)
+    remaining = [num_rounds]
+    share = -(-num_rounds // num_tables) # so every table gets work even when num_rounds < match_rounds
+
+    async def play(table):
+        while remaining[0] > 0:
+            rounds = min(match_rounds, share, remaining[0])
+            remaining[0] -= rounds
+            await table.run_match(rounds)
+        await table.close()
+
+    try:
+        await asyncio.gather(*(play(Table(index, seed, recorder, log_directory)) for index in range(num_tables)))
+    finally:
+        recorder.close()
+    return recorder.records
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python3 selfplay.py')
+    parser.add_argument('--tables', type=int, default=os.cpu_count(), help='Tables (pairs of pokerbot processes) playing at once')
+    parser.add_argument('--rounds', type=int, default=NUM_ROUNDS, help='Rounds to play in total')
+    parser.add_argument('--match-rounds', type=int, default=NUM_ROUNDS, help='Rounds per match before a table restarts (or resets, if persistent) its pokerbots')
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED, help='Root seed of the cards and bounties')
+    parser.add_argument('--output', default='selfplay.jsonl.gz', help='JSON lines file the hand records are streamed to')
+    parser.add_argument('--log-directory', default=LOG_DIRECTORY, help='Directory the pokerbot logs are written to')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = asyncio.run(run_selfplay(args.tables, args.rounds, args.output, args.seed, args.match_rounds, args.log_directory))
+    elapsed = time.perf_counter() - start
+    print('Wrote {} hand records to {} in {:.1f}s ({:.1f} rounds/s)'.format(records, args.output, elapsed, records / elapsed))